@@ -4,11 +4,25 @@ import json
 from bs4 import BeautifulSoup
 try:
     from CourseDependencyGraph.parsers.requisite_parser import RequisiteParseTree
+    from CourseDependencyGraph.parsers.parse_lazy import LazyRequisiteTrees
+    from CourseDependencyGraph.parsers.parse_block_content import BlockContentExtractor
+    from CourseDependencyGraph.parsers.parse_normalize import RequisiteTextNormalizer
 except ModuleNotFoundError:
     from requisite_parser import RequisiteParseTree
+    from parse_lazy import LazyRequisiteTrees
+    from parse_block_content import BlockContentExtractor
+    from parse_normalize import RequisiteTextNormalizer
 
 
 class RequisitesHTMLParser():
+    """
+    Extracts the title, notes and requisite sections of a course page, and
+    parses the requisites.
+
+    block_content_html is the HTML of the page's td.block_content, or for a
+    page scrapy has parsed already its Selector (or lxml element), which
+    the lxml backend reads without parsing the page a second time.
+    """
     ignore_keys = [
         'Print-Friendly Page',
         'Undergraduate Calendar',
@@ -24,29 +38,32 @@ class RequisitesHTMLParser():
         'Corequisite(s):',
         'Cross-list(s):'
     )
+    # clean_text and split_on_requisites, with the prefixes matched by one
+    # precompiled pattern
+    text_normalizer = RequisiteTextNormalizer(requisite_prefixes)
 
-    def __init__(self, block_content_html, course_id):
+    html_backends = ('soup', 'lxml')
+    # Backend used when none is given (see extract_block)
+    html_backend = 'lxml'
+
+    def __init__(self, block_content_html, course_id, parse_cache=None, subject_index=None, lazy=False,
+                 html_backend=None):
         self.html = block_content_html
         self.course_id = course_id
+        # Optional RequisiteParseCache shared across courses
+        self.parse_cache = parse_cache
+        # Optional SubjectIndex of the subjects seen in earlier crawls
+        self.subject_index = subject_index
+        # Parse each section on first access instead of in extract_info,
+        # json_data then has no requisites_dict_processed
+        self.lazy = lazy
+        if html_backend is not None:
+            if html_backend not in RequisitesHTMLParser.html_backends:
+                raise ValueError('Unknown HTML backend: %s' % html_backend)
+            self.html_backend = html_backend
 
     def clean_text(self, text):
-        if len(text) <= 1:
-            return ''
-        
-        # text_split = text.split(' ')
-        # print(text_split)
-        # text = ' '.join(re.split(r'[\n]{2,}|[\t]+| ', text))
-
-        # split() without arguments is as good as magic.
-        text = ' '.join(text.split())
-        # text = text.strip(' ')
-        text = text.replace('\n', ' ')
-        text = text.replace('\xa0', '')
-        text = text.replace('\t', ' ')
-        text = text.replace('"', '')
-        # text = text.replace('[br]', '\n')
-
-        return text.strip(' ')
+        return RequisitesHTMLParser.text_normalizer.clean(text)
 
     def ignore_text(self, text):
         return any(key in text for key in RequisitesHTMLParser.ignore_keys)
@@ -59,20 +76,45 @@ class RequisitesHTMLParser():
     #     return requisites, requisite_type
 
     def split_on_requisites(self, text):
-        # split = text.split('\n')
-        split = text.split('[br]')
-        # print(split)
-
-        requisites_dict_raw = {}
-        for potential_requisite in split:
-            potential_requisite = potential_requisite.strip()
-            for prefix in RequisitesHTMLParser.requisite_prefixes:
-                p = len(prefix)
-                # print(potential_requisite[:p], prefix, potential_requisite[:p] == prefix)
-                if potential_requisite[:p] == prefix:
-                    requisites_dict_raw[prefix] = potential_requisite[p:]
+        # Sections are found as offsets, only those with a prefix are sliced
+        return RequisitesHTMLParser.text_normalizer.split(text)
+
+    def extract_block(self):
+        """
+        (title text or None, serialized <em>s, text of the block with <br> as
+        '[br]' and without the <em>s) of td.block_content, with the
+        html_backend ('soup': BeautifulSoup, 'lxml': BlockContentExtractor,
+        same results in one pass and no tree).
+        """
+        html = self.html
+        element = None
+        if html is not None and not isinstance(html, str):
+            # Parsed already: a scrapy Selector, or its lxml root
+            element = getattr(html, 'root', html)
+
+        if self.html_backend == 'lxml':
+            if element is not None:
+                title, em_data, block_text = BlockContentExtractor().extract_element(element)
+            else:
+                title, em_data, block_text = BlockContentExtractor().extract(html)
+            if block_text is None:
+                raise AttributeError('No td.block_content in the page of course id: %s' % self.course_id)
+            return title, em_data, block_text
+
+        if element is not None:
+            html = BlockContentExtractor.to_html(element)
+        # TODO: Remove text in <em>
+        root = BeautifulSoup(html, features="lxml").find('td', {'class': 'block_content'},
+                                                        recursive=True)
+        for br in root.find_all('br'):
+            br.replace_with('[br]')
+        # Remove <em> tags and their contents
+        em_data = [str(s.extract()) for s in root('em')]
 
-        return requisites_dict_raw
+        title = root.find('h1', {'id': 'course_preview_title'}, recursive=True)
+        if title is not None:
+            title = title.getText()
+        return title, em_data, root.getText()
 
     def extract_info(self):
         print('Extracting info for course id:', self.course_id)
@@ -88,21 +130,13 @@ class RequisitesHTMLParser():
         error_msg = ''
         success = True
 
-        # try:
-        # TODO: Remove text in <em>
-        root = BeautifulSoup(self.html, features="lxml").find('td', {'class': 'block_content'},
-                                                        recursive=True)
-        for br in root.find_all('br'):
-            br.replace_with('[br]')
-        # Remove <em> tags and their contents
-        em_data = [str(s.extract()) for s in root('em')]
+        title, em_data, block_text = self.extract_block()
 
         course_code = 'Unknown'
         course_name = 'XXXX'
         try:
-            title = root.find('h1', {'id': 'course_preview_title'}, recursive=True)
-            # print('title:', title.getText())
-            course_info = title.getText().split('-')
+            # print('title:', title)
+            course_info = title.split('-')
             course_code, course_name = course_info[0], course_info[1]
             course_code = course_code.strip()
             course_name = course_name.strip()
@@ -114,7 +148,7 @@ class RequisitesHTMLParser():
             print('Course id:', self.course_id)
         # sys.exit()
 
-        raw_text = self.clean_text(root.getText())
+        raw_text = self.clean_text(block_text)
         # print(raw_text)
         requisites_dict_raw = self.split_on_requisites(raw_text)
         # with open('html_data.html', 'w') as f:
@@ -124,16 +158,16 @@ class RequisitesHTMLParser():
         
         # print(requisites_dict_raw)
         # requisite_types.insert(0, 'Default:')
-        rpts = {}
-        requisites_dict_processed = {}
-        for requisite_type, requisite in requisites_dict_raw.items():
-            # print(requisite_type, requisite)
-            if requisite_type in requisites_dict_raw:
-                # print('Current requisite:', requisite_type, requisite)
-                rpt = RequisiteParseTree(requisite, verbose=False, course_code=course_code)
-                rpts[requisite_type] = rpt
-                requisite_processed = rpt.process()
-                requisites_dict_processed[requisite_type] = requisite_processed
+        rpts = LazyRequisiteTrees(requisites_dict_raw, RequisiteParseTree, course_code=course_code,
+                                  parse_cache=self.parse_cache, subject_index=self.subject_index)
+        requisites_dict_processed = None
+        if not self.lazy:
+            requisites_dict_processed = rpts.processed()
+            timed_out = rpts.timed_out()
+            if timed_out:
+                # Kept as notes, not parsed
+                success = False
+                error_msg = 'parse time budget exceeded: ' + ', '.join(timed_out)
         # except AssertionError as ae:
         #     print('Assertion Error:', ae)
         #     error_msg = str('assertion error:') + str(ae)
@@ -159,6 +193,8 @@ class RequisitesHTMLParser():
             },
             'rpts': rpts
         }
+        if requisites_dict_processed is None:
+            del course_info['json_data']['requisites_dict_processed']
 
         # success_text = 'success' if success else 'failed'
         # with open('json/processed_data_%s_%s.json' % (self.course_id, success_text), 'w') as f:
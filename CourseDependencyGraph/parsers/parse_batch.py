@@ -0,0 +1,106 @@
+import os
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+try:
+    from CourseDependencyGraph.parsers.requisite_parser import RequisiteParseTree
+    from CourseDependencyGraph.parsers.parse_profile import RequisiteParseProfiler
+except ModuleNotFoundError:
+    from requisite_parser import RequisiteParseTree
+    from parse_profile import RequisiteParseProfiler
+
+
+# tree is None and error is set when the item failed to parse
+ParseResult = namedtuple('ParseResult', ['course_code', 'requisites', 'requisite_type',
+                                         'tree', 'processed', 'error'])
+
+
+def parse_one(tree_class, course_code, requisites, requisite_type, subject_index=None):
+    rpt = tree_class(requisites, verbose=False, course_code=course_code, requisite_type=requisite_type,
+                     subject_index=subject_index)
+    try:
+        processed = rpt.process()
+    except Exception as e:
+        # e.g. ValueError('TODO: mixed contents in bracket ...'): only this item fails
+        return ParseResult(course_code, requisites, requisite_type, None, None,
+                           '%s: %s' % (type(e).__name__, e))
+    return ParseResult(course_code, requisites, requisite_type, rpt, processed, None)
+
+
+def parse_chunk(tree_class, chunk, subject_index=None):
+    return [parse_one(tree_class, course_code, requisites, requisite_type, subject_index)
+            for course_code, requisites, requisite_type in chunk]
+
+
+def parse_chunk_profiled(tree_class, chunk, subject_index=None):
+    # parse_chunk with its own RequisiteParseProfiler, returned with the results
+    profiler = RequisiteParseProfiler()
+    with profiler:
+        results = parse_chunk(tree_class, chunk, subject_index)
+    return results, profiler
+
+
+def chunked(items, chunk_size):
+    items = iter(items)
+    while True:
+        chunk = list(islice(items, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def submit_bounded(submit, chunks, in_flight):
+    """
+    Yields the result of submit(chunk) (a Future) for every chunk, in order,
+    with at most in_flight chunks submitted and not yet yielded, so a long
+    input is neither read nor held in memory all at once.
+    """
+    chunks = iter(chunks)
+    pending = [submit(chunk) for chunk in islice(chunks, in_flight)]
+    while pending:
+        result = pending.pop(0).result()
+        for chunk in islice(chunks, 1):
+            pending.append(submit(chunk))
+        yield result
+
+
+def parse_many(items, tree_class=RequisiteParseTree, workers=None, chunk_size=32, subject_index=None,
+               profiler=None):
+    """
+    Parses (course_code, requisites, requisite_type) triples and yields a
+    ParseResult for each, in input order, as soon as its chunk is done.
+
+    Chunks are spread over a ProcessPoolExecutor with workers processes
+    (os.cpu_count() by default); workers=1 parses in this process. A failing
+    item is reported through ParseResult.error and does not stop the batch.
+    subject_index (a SubjectIndex) is handed to every tree. With a
+    RequisiteParseProfiler as profiler, the profile of every chunk is added
+    to it (enabled around each chunk, not while the caller holds results).
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+
+    if workers <= 1:
+        for chunk in chunked(items, chunk_size):
+            if profiler is not None:
+                with profiler:
+                    results = parse_chunk(tree_class, chunk, subject_index)
+            else:
+                results = parse_chunk(tree_class, chunk, subject_index)
+            for result in results:
+                yield result
+        return
+
+    if profiler is not None:
+        parse = parse_chunk_profiled
+    else:
+        parse = parse_chunk
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for results in submit_bounded(lambda chunk: executor.submit(parse, tree_class, chunk, subject_index),
+                                      chunked(items, chunk_size), workers * 2):
+            if profiler is not None:
+                results, chunk_profiler = results
+                profiler.merge(chunk_profiler)
+            for result in results:
+                yield result
@@ -0,0 +1,313 @@
+from urllib.parse import quote
+
+from lxml import etree
+
+
+class BlockContentExtractor():
+    """
+    What RequisitesHTMLParser.extract_info takes from a course page, in one
+    pass of lxml's HTML parser and without building a tree:
+
+    - title: text of h1#course_preview_title, None if there is none
+    - em_data: every <em> of the block serialized, in document order
+    - text: text of the block with each <br> as '[br]' and without the <em>s
+
+    of the first td.block_content. This is an lxml parser target: lxml calls
+    start/end/data/comment/pi as it parses, the same calls BeautifulSoup's
+    lxml builder gets, and this keeps only what the soup backend would
+    find in the tree it builds. So the results are the same as with
+    BeautifulSoup, including its rules for strings (whitespace-only strings
+    become ' ' or '\\n' outside <pre>/<textarea>, strings in <script>,
+    <style>, <template>, <rt> and <rp> are not text) and for serializing
+    (attributes sorted, minimal entities, <img/>).
+
+        title, em_data, text = BlockContentExtractor().extract(html)
+
+    extract_element does the same for a page lxml has already parsed (e.g.
+    the root of a scrapy Selector), by replaying its tree as target calls.
+    """
+    ascii_spaces = '\x20\x0a\x09\x0c\x0d'
+    preserve_whitespace_tags = {'pre', 'textarea'}
+    # Tags whose strings are not NavigableStrings, so not text
+    string_containers = {'rt', 'rp', 'style', 'script', 'template'}
+    # Serialized without entity substitution
+    cdata_containing_tags = {'script', 'style'}
+    # Written as <tag/> when empty
+    void_elements = {
+        'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'keygen', 'link', 'menuitem', 'meta', 'param',
+        'source', 'track', 'wbr', 'basefont', 'bgsound', 'command', 'frame', 'image', 'isindex', 'nextid', 'spacer',
+    }
+    # Whitespace-separated attributes, written with single spaces
+    cdata_list_attributes = {
+        '*': {'class', 'accesskey', 'dropzone'},
+        'a': {'rel', 'rev'},
+        'link': {'rel', 'rev'},
+        'td': {'headers'},
+        'th': {'headers'},
+        'form': {'accept-charset'},
+        'object': {'archive'},
+        'area': {'rel'},
+        'icon': {'sizes'},
+        'iframe': {'sandbox'},
+        'output': {'for'},
+    }
+    # What libxml2's HTML serializer changes in attribute values, so
+    # extract_element sees them as the HTML of the element would give them:
+    # these are written without a value, and these are URI-escaped
+    boolean_attributes = {
+        'checked', 'compact', 'declare', 'defer', 'disabled', 'ismap', 'multiple', 'nohref', 'noresize', 'noshade',
+        'nowrap', 'readonly', 'selected',
+    }
+    uri_attributes = {'href', 'action', 'src'}
+    uri_safe = "!*'()\"#$%&+,/:;<=>?@[\\]^`{|}\r"
+
+    def extract(self, html):
+        self.reset()
+        if html and html[0] == '\N{BYTE ORDER MARK}':
+            html = html[1:]
+        parser = etree.HTMLParser(target=self, recover=True)
+        parser.feed(html)
+        parser.close()
+        return self.result()
+
+    def extract_element(self, element):
+        """
+        extract for an lxml element, without serializing or parsing it again.
+        The tail of element is not part of it, as in the HTML a Selector
+        extracts.
+        """
+        self.reset()
+        self.serialized = True
+        for event, node in etree.iterwalk(element, events=('start', 'end', 'comment', 'pi')):
+            if event == 'start':
+                self.start(node.tag, node.attrib)
+                if node.text:
+                    self.data(node.text)
+                continue
+            if event == 'end':
+                # Tags always close in order in a tree
+                self.flush()
+                self.stack.pop()
+                self.close_tag(node.tag, len(self.stack))
+            elif event == 'comment':
+                self.comment(node.text or '')
+            else:
+                self.pi(node.target, node.text or '')
+            if node.tail and node is not element:
+                self.data(node.tail)
+        self.close()
+        return self.result()
+
+    def serialized_value(self, tag, key, value):
+        if key in self.boolean_attributes:
+            return ''
+        if key in self.uri_attributes or (key == 'name' and tag == 'a'):
+            return quote(value.lstrip(' \t\n'), safe=self.uri_safe)
+        return value
+
+    @staticmethod
+    def to_html(element):
+        # The HTML a scrapy Selector extracts for element
+        return etree.tostring(element, method='html', encoding='unicode', with_tail=False)
+
+    def result(self):
+        return self.title, self.em_data, ''.join(self.text) if self.text is not None else None
+
+    def reset(self):
+        # Open tags, and how many of them are <pre>/<textarea> and string containers
+        self.stack = []
+        self.preserving = 0
+        self.containers = 0
+        self.pending_data = []
+        # Attribute values as in the HTML of the element (extract_element)
+        self.serialized = False
+
+        # Depth of the block's td in stack, None until it opens, -1 once closed
+        self.block_depth = None
+        self.text = None
+        # Depth of the <br> whose subtree is skipped
+        self.br_depth = None
+        # Depth of the title h1, and its text so far
+        self.title_depth = None
+        self.title_pieces = None
+        self.title = None
+        # [depth, index in em_data, pieces] for every open <em>
+        self.ems = []
+        self.em_data = []
+        # Start tag not yet written: its element may turn out to be empty
+        self.pending_tag = None
+
+    def close(self):
+        self.flush()
+        self.end_title()
+
+    ### --------------------------------- Target methods
+
+    def start(self, tag, attrib):
+        self.flush()
+        depth = len(self.stack)
+        self.stack.append(tag)
+        if tag in self.preserve_whitespace_tags:
+            self.preserving += 1
+        if tag in self.string_containers:
+            self.containers += 1
+
+        if self.block_depth is None:
+            if tag == 'td' and self.is_block(attrib):
+                self.block_depth = depth
+                self.text = []
+            return
+        if not self.in_block() or self.br_depth is not None:
+            return
+
+        if tag == 'br':
+            self.br_depth = depth
+            self.add_string('[br]', True)
+            return
+        if tag == 'em':
+            self.write_pending()
+            self.em_data.append(None)
+            self.ems.append([depth, len(self.em_data) - 1, []])
+        elif (self.title_pieces is None and self.title is None and not self.ems and tag == 'h1'
+              and attrib.get('id') == 'course_preview_title'):
+            self.title_depth = depth
+            self.title_pieces = []
+        self.write_pending()
+        if self.ems:
+            self.pending_tag = (tag, self.format_attributes(tag, attrib))
+
+    def end(self, tag):
+        self.flush()
+        if tag not in self.stack:
+            return
+        while self.stack:
+            name = self.stack.pop()
+            self.close_tag(name, len(self.stack))
+            if name == tag:
+                break
+
+    def data(self, data):
+        self.pending_data.append(data)
+
+    def comment(self, text):
+        self.flush()
+        self.add_other(self.whitespace(text), '<!--', '-->')
+
+    def pi(self, target, data):
+        self.flush()
+        self.add_other(self.whitespace(target + ' ' + data), '<?', '>')
+
+    ### --------------------------------- End target methods
+
+    def is_block(self, attrib):
+        value = attrib.get('class')
+        return value is not None and (value == 'block_content' or 'block_content' in value.split())
+
+    def in_block(self):
+        return self.block_depth is not None and self.block_depth >= 0
+
+    def close_tag(self, name, depth):
+        if name in self.preserve_whitespace_tags:
+            self.preserving -= 1
+        if name in self.string_containers:
+            self.containers -= 1
+        if not self.in_block():
+            return
+        if depth == self.block_depth:
+            self.block_depth = -1
+            self.end_title()
+            return
+        if self.br_depth is not None:
+            if depth == self.br_depth:
+                self.br_depth = None
+            return
+
+        if self.ems:
+            if self.pending_tag is not None:
+                pending_name, attributes = self.pending_tag
+                self.pending_tag = None
+                if pending_name in self.void_elements:
+                    self.add_markup('<%s%s/>' % (pending_name, attributes))
+                else:
+                    self.add_markup('<%s%s></%s>' % (pending_name, attributes, pending_name))
+            else:
+                self.add_markup('</%s>' % name)
+            if depth == self.ems[-1][0]:
+                _, index, pieces = self.ems.pop()
+                self.em_data[index] = ''.join(pieces)
+        if depth == self.title_depth:
+            self.end_title()
+
+    def end_title(self):
+        if self.title_pieces is not None:
+            self.title = ''.join(self.title_pieces)
+            self.title_pieces = None
+            self.title_depth = None
+
+    def whitespace(self, string):
+        # BeautifulSoup keeps a string of nothing but ASCII spaces as one
+        if self.preserving:
+            return string
+        for c in string:
+            if c not in self.ascii_spaces:
+                return string
+        return '\n' if '\n' in string else ' '
+
+    def flush(self):
+        if not self.pending_data:
+            return
+        string = self.whitespace(''.join(self.pending_data))
+        self.pending_data = []
+        if self.in_block() and self.br_depth is None:
+            self.add_string(string, not self.containers)
+
+    def add_string(self, string, is_text):
+        if self.ems:
+            self.write_pending()
+            if self.stack[-1] not in self.cdata_containing_tags:
+                self.add_markup(self.substitute(string))
+            else:
+                self.add_markup(string)
+        elif is_text:
+            self.text.append(string)
+            if self.title_pieces is not None:
+                self.title_pieces.append(string)
+
+    def add_other(self, string, prefix, suffix):
+        # Comments and processing instructions: only written out in an <em>
+        if self.in_block() and self.br_depth is None and self.ems:
+            self.write_pending()
+            self.add_markup(prefix + string + suffix)
+
+    def add_markup(self, markup):
+        for em in self.ems:
+            em[2].append(markup)
+
+    def write_pending(self):
+        if self.pending_tag is not None:
+            name, attributes = self.pending_tag
+            self.pending_tag = None
+            self.add_markup('<%s%s>' % (name, attributes))
+
+    @staticmethod
+    def substitute(string):
+        return string.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
+
+    def format_attributes(self, tag, attrib):
+        lists = self.cdata_list_attributes['*'] | self.cdata_list_attributes.get(tag, set())
+        attributes = []
+        for key, value in sorted(attrib.items()):
+            if self.serialized:
+                value = self.serialized_value(tag, key, value)
+            if key in lists:
+                value = ' '.join(value.split())
+            value = self.substitute(value)
+            if '"' in value:
+                if "'" in value:
+                    value = '"%s"' % value.replace('"', '&quot;')
+                else:
+                    value = "'%s'" % value
+            else:
+                value = '"%s"' % value
+            attributes.append(' %s=%s' % (key, value))
+        return ''.join(attributes)
@@ -0,0 +1,174 @@
+import os
+import glob
+import pickle
+import sqlite3
+import hashlib
+from collections import OrderedDict
+
+
+def parser_rules_version():
+    """
+    Hash of the requisite parser sources (every requisite_*.py next to this
+    file). Any edit to the parsing rules changes it, which retires every
+    cached tree without having to remember to bump a number.
+    """
+    digest = hashlib.sha1()
+    for filename in sorted(glob.glob(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'requisite_*.py'))):
+        with open(filename, 'rb') as f:
+            digest.update(os.path.basename(filename).encode())
+            digest.update(f.read())
+    return digest.hexdigest()[:16]
+
+
+class RequisiteParseCache():
+    """
+    Content-addressed cache of processed requisite trees.
+
+    The key is a hash of the tree class, the parser rules version, the
+    subject index version (see SubjectIndex) and the requisite text, so
+    cross-listed courses and A/B sections that share a requisite string are
+    parsed once. Trees are stored pickled (as the
+    pipeline stores them) in two tiers:
+
+    - an in-memory LRU of memory_size entries
+    - an SQLite table, evicted least-recently-used first once the stored
+      trees take more than max_disk_bytes
+
+    Trees whose parse ran out of time (RequisiteParseTree.timed_out) are
+    not stored. Pass db_path=None for a memory-only cache.
+    """
+    def __init__(self, db_path='db/requisite_parse_cache.db', memory_size=4096,
+                 max_disk_bytes=64 * 1024 * 1024, version=None):
+        self.memory_size = memory_size
+        self.max_disk_bytes = max_disk_bytes
+        self.version = version if version is not None else parser_rules_version()
+        self.memory = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+        self.conn = None
+        self.disk_bytes = 0
+        if db_path is not None:
+            directory = os.path.dirname(db_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self.conn = sqlite3.connect(db_path)
+            self.conn.execute(
+                '''
+                CREATE TABLE IF NOT EXISTS requisite_parse_cache
+                (
+                    key TEXT PRIMARY KEY,
+                    tree BLOB,
+                    size INTEGER,
+                    last_used INTEGER
+                )
+                '''
+            )
+            self.conn.execute(
+                '''CREATE INDEX IF NOT EXISTS requisite_parse_cache_last_used ON requisite_parse_cache(last_used)'''
+            )
+            self.conn.commit()
+            row = self.conn.execute('''SELECT COALESCE(SUM(size), 0), COALESCE(MAX(last_used), 0) FROM requisite_parse_cache''').fetchone()
+            self.disk_bytes, self.clock = row
+        else:
+            self.clock = 0
+
+    def key(self, tree_class, requisites, subject_index=None):
+        digest = hashlib.sha1()
+        digest.update(('%s\0%s\0' % (tree_class.__name__, self.version)).encode())
+        if subject_index is not None and subject_index.version:
+            digest.update(('%s\0' % subject_index.version).encode())
+        digest.update(requisites.encode('utf-8', 'surrogatepass'))
+        return digest.hexdigest()
+
+    def process(self, tree_class, requisites, course_code=None, requisite_type='p', subject_index=None):
+        """
+        Cached equivalent of tree_class(requisites, ...).process().
+        Returns (tree, processed string).
+        """
+        key = self.key(tree_class, requisites, subject_index)
+        data = self.get(key)
+        if data is not None:
+            self.hits += 1
+            rpt = pickle.loads(data)
+            rpt.course_code = course_code
+            rpt.requisite_type = requisite_type
+            if subject_index is not None:
+                rpt.subject_index = subject_index
+        else:
+            self.misses += 1
+            rpt = tree_class(requisites, verbose=False, course_code=course_code, requisite_type=requisite_type,
+                             subject_index=subject_index)
+            rpt.process()
+            # A parse that ran out of time may parse next time: kept out of
+            # the cache, as the note would otherwise stay for good
+            if not rpt.timed_out:
+                self.put(key, pickle.dumps(rpt, pickle.HIGHEST_PROTOCOL))
+
+        return rpt, str(rpt.root)
+
+    def get(self, key):
+        data = self.memory.get(key)
+        if data is not None:
+            self.memory.move_to_end(key)
+            return data
+
+        if self.conn is None:
+            return None
+        row = self.conn.execute('''SELECT tree FROM requisite_parse_cache WHERE key = ?''', (key,)).fetchone()
+        if row is None:
+            return None
+
+        data = bytes(row[0])
+        self.clock += 1
+        self.conn.execute('''UPDATE requisite_parse_cache SET last_used = ? WHERE key = ?''', (self.clock, key))
+        self.remember(key, data)
+        return data
+
+    def put(self, key, data):
+        self.remember(key, data)
+        if self.conn is None:
+            return
+
+        self.clock += 1
+        row = self.conn.execute('''SELECT size FROM requisite_parse_cache WHERE key = ?''', (key,)).fetchone()
+        if row is not None:
+            self.disk_bytes -= row[0]
+        self.conn.execute(
+            '''
+            INSERT OR REPLACE INTO requisite_parse_cache(key, tree, size, last_used)
+            VALUES (?, ?, ?, ?)
+            ''',
+            (key, sqlite3.Binary(data), len(data), self.clock)
+        )
+        self.disk_bytes += len(data)
+        if self.disk_bytes > self.max_disk_bytes:
+            self.evict()
+        self.conn.commit()
+
+    def remember(self, key, data):
+        self.memory[key] = data
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.memory_size:
+            self.memory.popitem(last=False)
+
+    def evict(self):
+        """
+        Drops least recently used trees until the table is back under 90%
+        of max_disk_bytes, so eviction does not run on every insert.
+        """
+        target = self.max_disk_bytes * 0.9
+        rows = self.conn.execute('''SELECT key, size FROM requisite_parse_cache ORDER BY last_used''')
+        evicted = []
+        for key, size in rows:
+            if self.disk_bytes <= target:
+                break
+            evicted.append((key,))
+            self.disk_bytes -= size
+        self.conn.executemany('''DELETE FROM requisite_parse_cache WHERE key = ?''', evicted)
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.commit()
+            self.conn.close()
+            self.conn = None
@@ -0,0 +1,131 @@
+import os
+import time
+import zlib
+import sqlite3
+import hashlib
+
+
+class CourseHTMLArchive():
+    """
+    The td.block_content HTML of every course page crawled, zlib-compressed
+    in an SQLite table keyed by (course_id, content hash), so extraction and
+    parsing can be run again on the pages without crawling them again (see
+    reextract.py).
+
+    A page seen again unchanged only has its last_seen time updated; a
+    changed page is stored next to its earlier versions. latest() gives the
+    version of each course seen last.
+
+        archive = CourseHTMLArchive('db/course_html_archive.db')
+        archive.put('177126', html)
+        for course_id, content_hash, html in archive.latest():
+            ...
+    """
+    def __init__(self, db_path='db/course_html_archive.db', compress_level=6):
+        self.compress_level = compress_level
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.conn = sqlite3.connect(db_path)
+        self.conn.execute(
+            '''
+            CREATE TABLE IF NOT EXISTS course_html_archive
+            (
+                course_id TEXT,
+                content_hash TEXT,
+                html BLOB,
+                size INTEGER,
+                first_seen REAL,
+                last_seen REAL,
+                PRIMARY KEY (course_id, content_hash)
+            )
+            '''
+        )
+        self.conn.commit()
+
+    @staticmethod
+    def content_hash(html):
+        return hashlib.sha1(html.encode('utf-8', 'surrogatepass')).hexdigest()
+
+    def put(self, course_id, html, seen=None, commit=True):
+        """
+        Archives html as the page of course_id, returns its content hash.
+        With commit=False it is written by the next commit().
+        """
+        content_hash = self.content_hash(html)
+        seen = time.time() if seen is None else seen
+        updated = self.conn.execute(
+            '''UPDATE course_html_archive SET last_seen = ? WHERE course_id = ? AND content_hash = ?''',
+            (seen, course_id, content_hash)
+        ).rowcount
+        if not updated:
+            data = html.encode('utf-8', 'surrogatepass')
+            self.conn.execute(
+                '''
+                INSERT INTO course_html_archive(course_id, content_hash, html, size, first_seen, last_seen)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ''',
+                (course_id, content_hash, sqlite3.Binary(zlib.compress(data, self.compress_level)), len(data),
+                 seen, seen)
+            )
+        if commit:
+            self.conn.commit()
+        return content_hash
+
+    def get(self, course_id, content_hash=None):
+        """
+        The HTML of course_id with content_hash (by default the version seen
+        last), None if it is not archived.
+        """
+        if content_hash is None:
+            row = self.conn.execute(
+                '''SELECT html FROM course_html_archive WHERE course_id = ? ORDER BY last_seen DESC LIMIT 1''',
+                (course_id,)
+            ).fetchone()
+        else:
+            row = self.conn.execute(
+                '''SELECT html FROM course_html_archive WHERE course_id = ? AND content_hash = ?''',
+                (course_id, content_hash)
+            ).fetchone()
+        if row is None:
+            return None
+        return self.decompress(row[0])
+
+    def latest(self, compressed=False):
+        """
+        Yields (course_id, content_hash, html) for the version of every course
+        seen last, by course_id. With compressed=True html is the stored zlib
+        data, for workers to decompress.
+        """
+        rows = self.conn.execute(
+            '''
+            SELECT course_id, content_hash, html FROM course_html_archive AS a
+            WHERE last_seen = (SELECT MAX(last_seen) FROM course_html_archive WHERE course_id = a.course_id)
+            GROUP BY course_id
+            ORDER BY course_id
+            '''
+        )
+        for course_id, content_hash, data in rows:
+            yield course_id, content_hash, bytes(data) if compressed else self.decompress(data)
+
+    @staticmethod
+    def decompress(data):
+        return zlib.decompress(data).decode('utf-8', 'surrogatepass')
+
+    def stats(self):
+        """
+        (courses, versions, HTML bytes, stored bytes)
+        """
+        return self.conn.execute(
+            '''SELECT COUNT(DISTINCT course_id), COUNT(*), COALESCE(SUM(size), 0), COALESCE(SUM(LENGTH(html)), 0)
+               FROM course_html_archive'''
+        ).fetchone()
+
+    def commit(self):
+        self.conn.commit()
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.commit()
+            self.conn.close()
+            self.conn = None
@@ -0,0 +1,91 @@
+from collections.abc import Mapping
+
+
+class LazyRequisiteTrees(Mapping):
+    """
+    The requisite trees of one course by section ('Prerequisite(s):',
+    'Antirequisite(s):', ...), as RequisitesHTMLParser.extract_info stores
+    them in course_info['rpts'].
+
+    Only the raw text of each section is kept until a section is looked up:
+    it is then parsed (through parse_cache, if any) and the tree kept, so
+    the crawl stores raw text and each section is parsed once, by the first
+    consumer that asks for it (json_generator only asks for prerequisites).
+    A missing section raises KeyError, as the plain dict of trees did.
+
+    Pickles with the trees parsed so far and the raw text of the others,
+    without the parse cache and the subject index, which are shared by
+    every course of a crawl: attach() them again after unpickling, or the
+    sections left are parsed without either.
+
+        rpts = LazyRequisiteTrees({'Prerequisite(s):': 'MATH 1A03'}, RequisiteParseTree, course_code='MATH 1B03')
+        rpts['Prerequisite(s):'].root    # parsed now
+    """
+    parse_cache = None
+    subject_index = None
+
+    def __init__(self, requisites_raw, tree_class, course_code=None, parse_cache=None, subject_index=None):
+        self.requisites_raw = dict(requisites_raw)
+        self.tree_class = tree_class
+        self.course_code = course_code
+        self.parse_cache = parse_cache
+        self.subject_index = subject_index
+        self.trees = {}
+
+    def __getitem__(self, requisite_type):
+        rpt = self.trees.get(requisite_type)
+        if rpt is None:
+            rpt = self.trees[requisite_type] = self.parse(self.requisites_raw[requisite_type])
+        return rpt
+
+    def __iter__(self):
+        return iter(self.requisites_raw)
+
+    def __len__(self):
+        return len(self.requisites_raw)
+
+    def __repr__(self):
+        return 'LazyRequisiteTrees(%s)' % ', '.join(
+            '%s %s' % (requisite_type, 'parsed' if requisite_type in self.trees else 'raw')
+            for requisite_type in self.requisites_raw)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state.pop('parse_cache', None)
+        state.pop('subject_index', None)
+        return state
+
+    def attach(self, subject_index=None, parse_cache=None):
+        """
+        Sets the subject index and parse cache the sections not parsed yet
+        are parsed with, e.g. after unpickling.
+        """
+        self.subject_index = subject_index
+        self.parse_cache = parse_cache
+        return self
+
+    def parse(self, requisite):
+        if self.parse_cache is not None:
+            rpt, _ = self.parse_cache.process(self.tree_class, requisite, course_code=self.course_code,
+                                              subject_index=self.subject_index)
+        else:
+            rpt = self.tree_class(requisite, verbose=False, course_code=self.course_code,
+                                  subject_index=self.subject_index)
+            rpt.process()
+        return rpt
+
+    def is_parsed(self, requisite_type):
+        return requisite_type in self.trees
+
+    def timed_out(self):
+        """
+        The sections parsed so far whose parse ran out of time and were kept
+        as notes (see RequisiteParseTree.time_budget).
+        """
+        return [requisite_type for requisite_type, rpt in self.trees.items() if rpt.timed_out]
+
+    def processed(self):
+        """
+        The processed string of every section, parsing them all.
+        """
+        return {requisite_type: str(self[requisite_type].root) for requisite_type in self}
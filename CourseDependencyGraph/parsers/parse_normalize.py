@@ -0,0 +1,65 @@
+import re
+
+
+class RequisiteTextNormalizer():
+    """
+    The text of a course page block, as RequisitesHTMLParser cleans it and
+    splits it into requisite sections.
+
+    - clean: whitespace runs (any Unicode whitespace, \\xa0 included) as one
+      space, double quotes dropped, stripped of spaces
+    - sections: (prefix, start, end) for every '[br]'-separated section of
+      a clean text that starts with one of the prefixes, text[start:end]
+      being the section after its prefix, without trailing whitespace
+
+    Sections are found by searching the text for a separator followed by a
+    prefix with one precompiled pattern (the regex engine looks for the
+    literal '[br]'), instead of splitting the text and comparing every
+    segment to every prefix, and only the sections found are sliced out.
+
+        normalizer = RequisiteTextNormalizer(('Prerequisite(s):', 'Antirequisite(s):'))
+        text = normalizer.clean(block_text)
+        for prefix, start, end in normalizer.sections(text):
+            print(prefix, text[start:end])
+    """
+    separator = '[br]'
+
+    def __init__(self, prefixes):
+        self.prefixes = tuple(prefixes)
+        prefix_pattern = '|'.join(re.escape(prefix) for prefix in self.prefixes)
+        # A prefix after any whitespace (a section is stripped before its
+        # prefix is compared), at the start of the text or after a separator
+        self.first_matcher = re.compile(r'\s*(%s)' % prefix_pattern)
+        self.matcher = re.compile(r'%s\s*(%s)' % (re.escape(self.separator), prefix_pattern))
+
+    def clean(self, text):
+        if len(text) <= 1:
+            return ''
+        # split() already takes every whitespace character, \n, \t and \xa0
+        # included, so what is left to do is deleting the quotes
+        return ' '.join(text.split()).replace('"', '').strip(' ')
+
+    def sections(self, text):
+        sections = []
+        found = self.first_matcher.match(text)
+        pos = 0
+        while True:
+            if found is None:
+                found = self.matcher.search(text, pos)
+                if found is None:
+                    return sections
+            start = found.end()
+            end = text.find(self.separator, start)
+            if end < 0:
+                end = len(text)
+            pos = end
+            while end > start and text[end - 1].isspace():
+                end -= 1
+            sections.append((found.group(1), start, end))
+            found = None
+
+    def split(self, text):
+        """
+        {prefix: section} of text, the last section of each prefix.
+        """
+        return {prefix: text[start:end] for prefix, start, end in self.sections(text)}
@@ -0,0 +1,183 @@
+import os
+import time
+import sqlite3
+import hashlib
+try:
+    from CourseDependencyGraph.parsers.Parsers import RequisitesHTMLParser
+    from CourseDependencyGraph.parsers.parse_html_archive import CourseHTMLArchive
+except ModuleNotFoundError:
+    from Parsers import RequisitesHTMLParser
+    from parse_html_archive import CourseHTMLArchive
+
+
+class CoursePageChanges():
+    """
+    Content hashes of the course pages stored in courses_v3, so the spider
+    can skip the pages that did not change since the crawl that stored them.
+
+    The pipeline writes the hash of each page's td.block_content HTML, with
+    the version of the parser that extracted it, to course_page_hashes in
+    the same transaction as the course (a page whose parse failed or ran
+    out of time has its hash removed instead, so the next crawl extracts it
+    again). A page is unchanged when both match: the spider then neither
+    extracts nor parses it and the pipeline only updates its last_seen
+    time. Any change to the parsing rules (see parser_rules_version) or to
+    the parse settings gives a new version, so every page is extracted
+    again; changes to the HTML extraction itself are not seen, run
+    reextract.py after them (it leaves the hashes alone, so the next crawl
+    still extracts the pages whose version changed).
+
+    Also counts the pages extracted and skipped, and the time spent on
+    each, for report() when the crawl ends.
+
+        page_changes = CoursePageChanges.from_db('db/course_db_example.db', version)
+        if page_changes.is_unchanged(course_id, content_hash):
+            ...
+    """
+    def __init__(self, hashes=None, version=''):
+        # {course_id: (content_hash, version)}
+        self.hashes = hashes if hashes is not None else {}
+        self.version = version
+        self.extracted = 0
+        self.skipped = 0
+        self.extracted_seconds = 0.0
+        self.skipped_seconds = 0.0
+
+    @classmethod
+    def from_db(cls, db_path='db/course_db_example.db', version=''):
+        """
+        The hashes stored by earlier crawls, none if there is no database yet.
+        """
+        if not os.path.exists(db_path):
+            return cls(version=version)
+        conn = sqlite3.connect(db_path)
+        try:
+            rows = conn.execute('''SELECT course_id, content_hash, version FROM course_page_hashes''').fetchall()
+        except sqlite3.OperationalError as e:
+            print('No course page hashes yet:', e)
+            rows = []
+        finally:
+            conn.close()
+        return cls({course_id: (content_hash, page_version) for course_id, content_hash, page_version in rows},
+                   version)
+
+    @staticmethod
+    def parse_version(rules_version, lazy, subject_index=None):
+        # Everything the stored course depends on besides the page
+        digest = hashlib.sha1()
+        digest.update(('%s\0%s\0' % (rules_version, bool(lazy))).encode())
+        if subject_index is not None:
+            digest.update(subject_index.version.encode())
+        return digest.hexdigest()[:16]
+
+    def __len__(self):
+        return len(self.hashes)
+
+    def __repr__(self):
+        return 'CoursePageChanges(%d pages)' % len(self.hashes)
+
+    def is_unchanged(self, course_id, content_hash):
+        return self.hashes.get(course_id) == (content_hash, self.version)
+
+    def count(self, skipped, seconds, pages=1):
+        if skipped:
+            self.skipped += pages
+            self.skipped_seconds += seconds
+        else:
+            self.extracted += pages
+            self.extracted_seconds += seconds
+
+    def report(self):
+        """
+        Pages extracted and skipped, and the time skipping saved: what the
+        skipped pages would have taken at the mean time of an extracted page
+        (extraction, parsing and storing), less the time spent on them.
+        """
+        lines = ['Course pages: %d extracted, %d unchanged and skipped' % (self.extracted, self.skipped)]
+        if self.extracted:
+            per_page = self.extracted_seconds / self.extracted
+            saved = self.skipped * per_page - self.skipped_seconds
+            lines.append('%.2f ms per extracted page, %.2f ms per skipped page: about %.1f s saved'
+                         % (per_page * 1e3, self.skipped_seconds / self.skipped * 1e3 if self.skipped else 0,
+                            saved))
+        return '\n'.join(lines)
+
+    ### --------------------------------- Pipeline side
+
+    @staticmethod
+    def create_table(c):
+        c.execute(
+            '''
+            CREATE TABLE IF NOT EXISTS course_page_hashes
+            (
+                course_id TEXT PRIMARY KEY,
+                content_hash TEXT,
+                version TEXT,
+                last_seen REAL
+            )
+            '''
+        )
+
+    @staticmethod
+    def store(c, course_id, content_hash, version, seen):
+        c.execute(
+            '''
+            INSERT OR REPLACE INTO course_page_hashes(course_id, content_hash, version, last_seen)
+            VALUES (?, ?, ?, ?)
+            ''',
+            (course_id, content_hash, version, seen)
+        )
+
+    @staticmethod
+    def touch(c, course_id, seen):
+        c.execute('''UPDATE course_page_hashes SET last_seen = ? WHERE course_id = ?''', (seen, course_id))
+
+    @staticmethod
+    def forget(c, course_id):
+        # The next crawl extracts the page again, whatever its hash
+        c.execute('''DELETE FROM course_page_hashes WHERE course_id = ?''', (course_id,))
+
+
+def extract_course_page(page, course_id, page_changes=None, keep_html=False, **parser_options):
+    """
+    The item AcademicCalenderSpider.parse yields for a course page (its
+    scrapy response, or a parsel Selector of it).
+
+    With page_changes, a page whose td.block_content is unchanged gives only
+    {'course_id', 'unchanged': True, 'block_content_html'}, for the pipeline
+    to update its last_seen time. Any other page is extracted by a
+    RequisitesHTMLParser made with parser_options, with its content_hash and
+    parse_version for the pipeline to store. With keep_html the item has the
+    block_content_html for the pipeline to archive (see reextract.py).
+    """
+    t = time.perf_counter()
+    # The Selector, not its HTML: the lxml backend reads the page scrapy
+    # has parsed instead of parsing it again
+    block_content = page.css('td.block_content')
+    block_content = block_content[0] if block_content else None
+
+    block_content_html = None
+    content_hash = None
+    if block_content is not None and (page_changes is not None or keep_html):
+        # For its hash, and for the pipeline to archive
+        block_content_html = block_content.get()
+    if page_changes is not None and block_content_html is not None:
+        content_hash = CourseHTMLArchive.content_hash(block_content_html)
+        if page_changes.is_unchanged(course_id, content_hash):
+            # Stored already, the pipeline only updates last_seen
+            page_changes.count(True, time.perf_counter() - t)
+            return {
+                'course_id': course_id,
+                'unchanged': True,
+                'block_content_html': block_content_html,
+            }
+
+    acp = RequisitesHTMLParser(block_content, course_id, **parser_options)
+    course_info = acp.extract_info()
+    course_info['course_id'] = course_id
+    course_info['block_content_html'] = block_content_html
+    if page_changes is not None:
+        course_info['content_hash'] = content_hash
+        course_info['parse_version'] = page_changes.version
+        page_changes.count(False, time.perf_counter() - t)
+    return course_info
@@ -0,0 +1,269 @@
+import time
+from collections import Counter, defaultdict
+try:
+    from CourseDependencyGraph.parsers.requisite_parser import RequisiteParseTree
+    from CourseDependencyGraph.parsers.requisite_patterns import PatternRegistry, requisite_patterns
+except ModuleNotFoundError:
+    from requisite_parser import RequisiteParseTree
+    from requisite_patterns import PatternRegistry, requisite_patterns
+
+
+class RequisiteParseProfiler():
+    """
+    Opt-in profile of where the requisite parser spends its time, and of
+    which of its rules fire, aggregated over every tree parsed while it is
+    enabled (a whole crawl, or a batch reparse).
+
+    enable() wraps the stage methods and rule lookups of the tree classes,
+    the replace_dict rewriter and the regex lookups of requisite_patterns,
+    disable() puts the originals back, so a parse costs nothing extra
+    unless a profiler is enabled. Only one profiler can be enabled at a
+    time.
+
+    Per stage (process, preprocess, each level, postprocess, flatten,
+    infer_subjects), keyed by tree class:
+    - calls
+    - cumulative time, counting a stage once while it recurses into itself
+    - own time, less the stages it called
+    - histogram of input lengths (of the requisite text for flatten and
+      infer_subjects) in power-of-two buckets
+
+    Per rule: how often each prefix, suffix, prefix and suffix pair and
+    logical operator was the match a lookup returned, and how often each
+    replace_dict rule was applied (a longer key added by
+    RequisiteRewriter.complete stands for the chain of rules it applies).
+    Per regex of requisite_patterns: how often the parser looked it up.
+
+        profiler = RequisiteParseProfiler()
+        with profiler:
+            for requisites in corpus:
+                RequisiteParseTree(requisites).process()
+        print(profiler.report())
+    """
+    stages = [
+        'process',
+        'preprocess',
+        'top_level_split',
+        'second_level_split',
+        'third_level_split',
+        'fourth_level_split',
+        'fifth_level_split',
+        'sixth_level_split',
+        'seventh_level_split',
+        'seventh_level_v2_split',
+        'eighth_level_split',
+        'ninth_level_split',
+        'postprocess',
+        'flatten',
+        'infer_subjects',
+    ]
+    # Lookup method -> kind of rule it returns
+    rule_lookups = {
+        'find_prefix': 'prefixes',
+        'find_suffix': 'suffixes',
+        'find_prefix_and_suffix': 'prefix_and_suffixes',
+        'find_prefix_logical_operator': 'logical_operators',
+    }
+    enabled = None
+
+    def __init__(self, tree_classes=(RequisiteParseTree,)):
+        self.tree_classes = tree_classes
+        # (tree class name, stage) -> ...
+        self.calls = Counter()
+        self.cumulative = defaultdict(float)
+        self.own = defaultdict(float)
+        self.lengths = defaultdict(Counter)
+        # kind of rule -> rule -> times fired
+        self.rules = defaultdict(Counter)
+        # pattern name -> lookups
+        self.pattern_lookups = Counter()
+        # (class, name, original) of what enable() replaced
+        self._wrapped = []
+        # Time spent in the stages called by each running stage
+        self._stack = []
+        self._depth = Counter()
+
+    def __getstate__(self):
+        # Only the counts travel, e.g. back from a parse_many worker
+        return {'calls': self.calls, 'cumulative': self.cumulative, 'own': self.own,
+                'lengths': self.lengths, 'rules': self.rules, 'pattern_lookups': self.pattern_lookups}
+
+    def __setstate__(self, state):
+        self.__init__()
+        self.__dict__.update(state)
+
+    def __enter__(self):
+        self.enable()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.disable()
+
+    def enable(self):
+        if RequisiteParseProfiler.enabled is not None:
+            raise RuntimeError('Another RequisiteParseProfiler is already enabled')
+        RequisiteParseProfiler.enabled = self
+
+        wrapped = set()
+        for tree_class in self.tree_classes:
+            for klass in tree_class.__mro__:
+                for name, function in list(vars(klass).items()):
+                    if (klass, name) in wrapped:
+                        continue
+                    if name in RequisiteParseProfiler.stages:
+                        setattr(klass, name, self.profiled_stage(name, function))
+                    elif name in RequisiteParseProfiler.rule_lookups:
+                        setattr(klass, name, self.profiled_lookup(RequisiteParseProfiler.rule_lookups[name], function))
+                    else:
+                        continue
+                    wrapped.add((klass, name))
+                    self._wrapped.append((klass, name, function))
+
+        lookup = PatternRegistry.__getitem__
+        PatternRegistry.__getitem__ = self.profiled_pattern_lookup(lookup)
+        self._wrapped.append((PatternRegistry, '__getitem__', lookup))
+
+        rewriter = RequisiteParseTree.replace_rewriter
+        fired = self.rules['replace_dict']
+        rewriter.rewrite = lambda text: rewriter.rewrite_counted(text, fired)
+
+    def disable(self):
+        if RequisiteParseProfiler.enabled is not self:
+            return
+        for klass, name, function in reversed(self._wrapped):
+            setattr(klass, name, function)
+        self._wrapped = []
+        del RequisiteParseTree.replace_rewriter.rewrite
+        RequisiteParseProfiler.enabled = None
+
+    def profiled_stage(self, name, function):
+        profiler = self
+
+        def profiled(tree, *args, **kwargs):
+            key = (type(tree).__name__, name)
+            profiler.calls[key] += 1
+            profiler.lengths[key][profiler.length_bucket(args[0] if args else tree.requisites)] += 1
+
+            stack = profiler._stack
+            depth = profiler._depth
+            depth[key] += 1
+            stack.append(0.0)
+            start = time.perf_counter()
+            try:
+                return function(tree, *args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - start
+                profiler.own[key] += elapsed - stack.pop()
+                if stack:
+                    stack[-1] += elapsed
+                depth[key] -= 1
+                if not depth[key]:
+                    profiler.cumulative[key] += elapsed
+
+        profiled.__wrapped__ = function
+        return profiled
+
+    def profiled_lookup(self, kind, function):
+        rules = self.rules
+
+        def profiled(tree, *args, **kwargs):
+            result = function(tree, *args, **kwargs)
+            if isinstance(result[0], tuple):
+                # ((prefix, p), (suffix, s))
+                if result[0][0] is not None:
+                    rules[kind]['%s ... %s' % (result[0][0], result[1][0])] += 1
+            elif result[0] is not None:
+                rules[kind][result[0]] += 1
+            return result
+
+        profiled.__wrapped__ = function
+        return profiled
+
+    def profiled_pattern_lookup(self, function):
+        lookups = self.pattern_lookups
+
+        def profiled(registry, name):
+            lookups[name] += 1
+            return function(registry, name)
+
+        profiled.__wrapped__ = function
+        return profiled
+
+    @staticmethod
+    def length_bucket(requisite):
+        """
+        Bucket of the length of a string or list: n for lengths from
+        2**(n-1) to 2**n - 1, 0 for empty.
+        """
+        return len(requisite).bit_length()
+
+    @staticmethod
+    def bucket_label(bucket):
+        if bucket == 0:
+            return '0'
+        return '%d-%d' % (1 << (bucket - 1), (1 << bucket) - 1)
+
+    def merge(self, other):
+        """
+        Adds the counts of other (e.g. from a worker process) to these.
+        """
+        self.calls.update(other.calls)
+        for key, seconds in other.cumulative.items():
+            self.cumulative[key] += seconds
+        for key, seconds in other.own.items():
+            self.own[key] += seconds
+        for key, lengths in other.lengths.items():
+            self.lengths[key].update(lengths)
+        for kind, fired in other.rules.items():
+            self.rules[kind].update(fired)
+        self.pattern_lookups.update(other.pattern_lookups)
+        return self
+
+    def all_rules(self, kind):
+        if kind == 'prefix_and_suffixes':
+            return ['%s ... %s' % pair for pair in RequisiteParseTree.prefix_and_suffixes]
+        if kind == 'replace_dict':
+            return list(RequisiteParseTree.replace_dict)
+        return list(getattr(RequisiteParseTree, kind))
+
+    def report(self):
+        """
+        Stages by cumulative time, then rules by times fired, with the
+        rules that never fired.
+        """
+        lines = ['%-52s %9s %12s %12s  %s' % ('stage', 'calls', 'cumulative s', 'own s', 'input lengths')]
+        for key in sorted(self.calls, key=lambda key: (-self.cumulative[key], key)):
+            lengths = self.lengths[key]
+            lines.append('%-52s %9d %12.4f %12.4f  %s' % (
+                '%s.%s' % key, self.calls[key], self.cumulative[key], self.own[key],
+                ' '.join('%s:%d' % (self.bucket_label(bucket), lengths[bucket]) for bucket in sorted(lengths))))
+
+        for kind in ('prefixes', 'suffixes', 'prefix_and_suffixes', 'logical_operators', 'replace_dict'):
+            fired = self.rules.get(kind, Counter())
+            lines.append('')
+            lines.append('%s fired %d times' % (kind, sum(fired.values())))
+            for rule, count in sorted(fired.items(), key=lambda item: (-item[1], item[0])):
+                lines.append('  %9d  %r' % (count, rule))
+            never = [rule for rule in self.all_rules(kind) if rule not in fired]
+            if never:
+                lines.append('  never fired: %s' % ', '.join(repr(rule) for rule in never))
+
+        lines.append('')
+        lines.append('patterns looked up %d times' % sum(self.pattern_lookups.values()))
+        for name, count in sorted(self.pattern_lookups.items(), key=lambda item: (-item[1], item[0])):
+            lines.append('  %9d  %s' % (count, name))
+        never = [name for name in sorted(requisite_patterns.patterns) if name not in self.pattern_lookups]
+        if never:
+            lines.append('  never looked up: %s' % ', '.join(never))
+        return '\n'.join(lines)
+
+    def dump(self, path=None):
+        """
+        Prints the report, or writes it to path.
+        """
+        report = self.report()
+        if path is None:
+            print(report)
+        else:
+            with open(path, 'w') as f:
+                f.write(report + '\n')
@@ -0,0 +1,138 @@
+import json
+
+
+class RequisiteNodeTable():
+    """
+    Hash-consing table for processed requisite trees.
+
+    intern() replaces every subtree with the one structurally equal subtree
+    already in the table, so a branch such as "one of MATH 1A03, 1LS3, 1X03,
+    1ZA3" that recurs across courses is a single node shared by all of them
+    and the catalog becomes a DAG. Two nodes are equal when they have the
+    same class, the same slot values (course, note, flags) and the same
+    interned children, which makes the structural key of a node cheap to
+    build from its children's identities.
+
+    Interned nodes are shared: only intern trees that have been processed
+    (flattened and subject-inferred), and do not modify them afterwards.
+
+    The table also exports graphs the way json_generator writes them for
+    the browser: each distinct AND/OR branch is stored once in branches,
+    and graphs refer to it by its index (see generate_graph).
+    """
+    def __init__(self):
+        # structural key -> interned node
+        self.nodes = {}
+        # id(interned node) -> exported branch, so each is exported once
+        self.exported = {}
+        self.branches = []
+        self.branch_index = {}
+
+        self.visited = 0
+        self.shared = 0
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def key(self, node, children):
+        values = tuple(getattr(node, name) for name in node.state_slots() if name != 'children')
+        return (type(node), values, tuple(id(child) for child in children))
+
+    def intern(self, root):
+        """
+        Returns the interned equivalent of the tree under root.
+        """
+        interned = {}
+        stack = [(root, False)]
+        while stack:
+            node, children_done = stack.pop()
+            if id(node) in interned:
+                continue
+            if not children_done:
+                stack.append((node, True))
+                stack.extend((child, False) for child in node.children)
+                continue
+
+            children = [interned[id(child)] for child in node.children]
+            key = self.key(node, children)
+            self.visited += 1
+            existing = self.nodes.get(key)
+            if existing is None:
+                node.children = children
+                self.nodes[key] = existing = node
+            elif existing is not node:
+                self.shared += 1
+            interned[id(node)] = existing
+
+        return interned[id(root)]
+
+    def intern_tree(self, rpt):
+        rpt.root = self.intern(rpt.root)
+        return rpt
+
+    ### --------------------------------- Export
+
+    def generate_graph(self, rpt):
+        """
+        RequisiteParseTree.generate_graph, except that AND/OR branches are
+        replaced by their index in branches. rpt must be interned.
+        """
+        return {
+            getattr(rpt, 'requisite_type', 'p'): self.export(rpt.root)
+        }
+
+    def export(self, node):
+        branch = self.exported.get(id(node))
+        if branch is None:
+            branch = self.exported[id(node)] = self.reference(node._generate_graph())
+        return branch
+
+    def reference(self, branch):
+        """
+        Stores an AND/OR branch (and its subbranches) in branches and
+        returns its index. Courses and empty branches are returned as is.
+        Subbranches are stored first, left to right.
+        """
+        if not isinstance(branch, dict) or 't' not in branch:
+            return branch
+
+        # id(branch) -> index
+        indices = {}
+        stack = [(branch, False)]
+        while stack:
+            current, subbranches_done = stack.pop()
+            if id(current) in indices:
+                continue
+            if not subbranches_done:
+                stack.append((current, True))
+                stack.extend((subbranch, False) for subbranch in reversed(current.get('s', ()))
+                             if isinstance(subbranch, dict) and 't' in subbranch)
+                continue
+
+            stored = dict(current)
+            if 's' in stored:
+                stored['s'] = [indices.get(id(subbranch), subbranch) for subbranch in stored['s']]
+            key = json.dumps(stored, sort_keys=True)
+            index = self.branch_index.get(key)
+            if index is None:
+                index = self.branch_index[key] = len(self.branches)
+                self.branches.append(stored)
+            indices[id(current)] = index
+        return indices[id(branch)]
+
+    def expand(self, branch):
+        """
+        Inverse of reference: the nested graph with branches inlined.
+        """
+        if not isinstance(branch, int):
+            return branch
+
+        root = dict(self.branches[branch])
+        stack = [root]
+        while stack:
+            current = stack.pop()
+            if 's' in current:
+                current['s'] = [dict(self.branches[subbranch]) if isinstance(subbranch, int) else subbranch
+                                for subbranch in current['s']]
+                stack.extend(subbranch for subbranch in current['s'] if isinstance(subbranch, dict))
+        return root
@@ -0,0 +1,178 @@
+try:
+    from CourseDependencyGraph.parsers.requisite_parser import (
+        RequisiteParseNode, RequisiteParseNodeOR, RequisiteParseNodeAND, RequisiteParseNodeCourse,
+        RequisiteParseNodeNote, RequisiteParseNodeUNKNOWN
+    )
+except ModuleNotFoundError:
+    from requisite_parser import (
+        RequisiteParseNode, RequisiteParseNodeOR, RequisiteParseNodeAND, RequisiteParseNodeCourse,
+        RequisiteParseNodeNote, RequisiteParseNodeUNKNOWN
+    )
+
+
+class RequisiteTreeSimplifier():
+    """
+    Boolean simplification of processed requisite trees, for the export.
+
+    simplify() rewrites every AND/OR node bottom-up into a canonical form:
+
+    - same-type children are merged (associativity) and single-child nodes
+      collapsed, as in RequisiteParseNode.flatten
+    - children equal to a sibling are dropped (idempotence):
+      OR[A, A] -> A
+    - children implied by a sibling are dropped (absorption):
+      OR[A, AND[A, B]] -> A and AND[A, OR[A, B]] -> A
+    - children are sorted (commutativity), courses first, so equivalent
+      branches such as OR[B, A] and OR[A, B] come out identical and are
+      written once by RequisiteNodeTable
+
+    Branches flagged as corequisite or recommended are kept whole: their
+    flag would not survive being merged into or absorbed by their parent,
+    nor being replaced by their only child. Inside them children are only
+    sorted, never merged, deduplicated or absorbed, so a flagged node keeps
+    every child it had. Other nodes (notes, UNKNOWN) keep their children in
+    order.
+
+    One simplifier can be used for the whole catalog; its counters add up
+    what it removed, see report().
+    """
+    node_ranks = {
+        RequisiteParseNodeCourse: 0,
+        RequisiteParseNodeAND: 1,
+        RequisiteParseNodeOR: 2,
+        RequisiteParseNodeUNKNOWN: 3,
+        RequisiteParseNodeNote: 4,
+        RequisiteParseNode: 5,
+    }
+
+    def __init__(self):
+        # Canonical structure -> number, so equal branches compare by number
+        self.structures = {}
+
+        self.trees = 0
+        self.nodes_before = 0
+        self.nodes_after = 0
+        self.merged = 0
+        self.duplicates = 0
+        self.absorbed = 0
+        self.collapsed = 0
+
+    def simplify_tree(self, rpt):
+        rpt.root = self.simplify(rpt.root)
+        return rpt
+
+    def simplify(self, root):
+        """
+        Returns the simplified tree under root. Nodes are reused and their
+        children replaced, so the original tree should not be used after.
+        """
+        # id(node) -> simplified node
+        results = {}
+        # id(simplified node) -> (structure number, sort key)
+        keys = {}
+        nodes = 0
+        stack = [(root, False)]
+        while stack:
+            node, children_done = stack.pop()
+            if not children_done:
+                nodes += 1
+                stack.append((node, True))
+                stack.extend((child, False) for child in node.children)
+                continue
+
+            children = [results[id(child)] for child in node.children]
+            if isinstance(node, (RequisiteParseNodeOR, RequisiteParseNodeAND)):
+                if self.is_flagged(node):
+                    children = sorted(children, key=lambda child: keys[id(child)][1])
+                else:
+                    children = self.simplify_children(node, children, keys)
+                if len(children) == 1 and not self.is_flagged(node):
+                    self.collapsed += 1
+                    results[id(node)] = children[0]
+                    continue
+            node.children = children
+            keys[id(node)] = self.key(node, keys)
+            results[id(node)] = node
+
+        root = results[id(root)]
+        self.trees += 1
+        self.nodes_before += nodes
+        self.nodes_after += self.count_nodes(root)
+        return root
+
+    def simplify_children(self, node, children, keys):
+        merged = []
+        for child in children:
+            if self.can_merge(node, child):
+                self.merged += 1
+                merged.extend(child.children)
+            else:
+                merged.append(child)
+
+        unique = {}
+        for child in merged:
+            if keys[id(child)][0] in unique:
+                self.duplicates += 1
+            else:
+                unique[keys[id(child)][0]] = child
+
+        # Absorption: in an OR, drop an AND child whose terms include all the
+        # terms of another child; in an AND, the same for OR children.
+        terms = {number: self.terms(node, child, keys) for number, child in unique.items()}
+        kept = []
+        for number, child in unique.items():
+            if len(terms[number]) > 1 and any(other != number and terms[other] < terms[number] for other in terms):
+                self.absorbed += 1
+                continue
+            kept.append(child)
+
+        kept.sort(key=lambda child: keys[id(child)][1])
+        return kept
+
+    def terms(self, node, child, keys):
+        # The children of an unflagged child of the opposite type, else the child itself
+        if (isinstance(child, (RequisiteParseNodeOR, RequisiteParseNodeAND)) and type(child) is not type(node)
+                and not self.is_flagged(child)):
+            return frozenset(keys[id(grandchild)][0] for grandchild in child.children)
+        return frozenset((keys[id(child)][0],))
+
+    @staticmethod
+    def is_flagged(node):
+        return node.corequisite or node.recommended
+
+    def can_merge(self, node, child):
+        return type(child) is type(node) and not self.is_flagged(child) and not self.is_flagged(node)
+
+    def key(self, node, keys):
+        """
+        (structure number, sort key) of a node whose children are simplified.
+        """
+        if isinstance(node, RequisiteParseNodeCourse):
+            value = node.course
+        elif isinstance(node, RequisiteParseNodeNote):
+            value = node.note
+        elif isinstance(node, RequisiteParseNodeUNKNOWN):
+            value = node.identifier or ''
+        else:
+            value = ''
+
+        rank = self.node_ranks.get(type(node), len(self.node_ranks))
+        child_keys = [keys[id(child)] for child in node.children]
+        structure = (rank, node.corequisite, node.recommended, value, tuple(number for number, _ in child_keys))
+        number = self.structures.setdefault(structure, len(self.structures))
+        sort_key = (rank, node.corequisite, node.recommended, value, tuple(sort_key for _, sort_key in child_keys))
+        return number, sort_key
+
+    def count_nodes(self, root):
+        count = 0
+        stack = [root]
+        while stack:
+            node = stack.pop()
+            count += 1
+            stack.extend(node.children)
+        return count
+
+    def report(self):
+        return ('Simplified %d trees: %d -> %d nodes (%d removed); %d merged, %d duplicates, %d absorbed, %d collapsed'
+                % (self.trees, self.nodes_before, self.nodes_after, self.nodes_before - self.nodes_after,
+                   self.merged, self.duplicates, self.absorbed, self.collapsed))
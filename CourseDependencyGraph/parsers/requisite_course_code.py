@@ -0,0 +1,128 @@
+from collections import namedtuple
+try:
+    from CourseDependencyGraph.parsers.requisite_patterns import requisite_patterns
+except ModuleNotFoundError:
+    from requisite_patterns import requisite_patterns
+
+
+# (start, end) spans index into the text the grammar was matched against,
+# suffix and its span are None when there is no suffix, subject likewise.
+CourseCode = namedtuple('CourseCode', ['subject', 'code', 'suffix', 'subject_span', 'code_span', 'suffix_span'])
+
+
+class CourseCodeRecognizer():
+    """
+    The course-code grammar shared by the requisite parsers:
+
+        [SUBJECT ] CODE [ SUFFIX]
+
+    CODE is a word starting with a digit (1A03, 2MM3, 3W04), SUBJECT is the
+    word before it (MATH, ELECENG) and SUFFIX a trailing word, e.g. A/B, or
+    A/B S after a bare code. Words are separated by single spaces. The
+    grammar is as permissive as the split-based heuristics it replaces
+    (likely_is_course and friends) and accepts what they did, except that a
+    code must start with a decimal digit (not e.g. a superscript) and that
+    strings they failed on with an IndexError (empty words from double
+    spaces) now get an answer.
+
+    Every query is memoized per string: the cascade asks about the same
+    substrings from several levels.
+
+        course_codes.match('MATH 1A03 A/B').subject    # 'MATH'
+        course_codes.is_course('2M03 (or 2MM3)')       # True
+    """
+    cache_size = 65536
+
+    requisite_patterns.register('course_code', r'(?:(?P<subject>[^ ]+) (?P<code>\d[^ ]*)(?: (?P<suffix>[^ ]*))?'
+                                               r'|(?P<bare_code>\d[^ ]*)(?: (?P<bare_suffix>A/B(?: [^ ]*)?))?)\Z')
+    requisite_patterns.register('course_subject', r' *([^ 0-9][^ ]*) ')
+    requisite_patterns.register('course_code_start', r'[0-9]|[^ ]* [0-9]')
+    # Words of 4 or 5 characters, candidates for a code such as 1A03 or 2MM3
+    requisite_patterns.register('course_code_word', r'(?<![^ ])[^ ]{4,5}(?![^ ])')
+    word_punctuation = str.maketrans('', '', '.,();')
+
+    def __init__(self):
+        self.matches = {}
+        self.courses = {}
+        self.subjects = {}
+        self.code_starts = {}
+        self.code_words = {}
+
+    def remember(self, cache, text, result):
+        if len(cache) >= self.cache_size:
+            cache.clear()
+        cache[text] = result
+        return result
+
+    def match(self, text):
+        """
+        CourseCode for text if it is a course code as a whole, else None.
+        """
+        if text in self.matches:
+            return self.matches[text]
+
+        m = requisite_patterns['course_code'].match(text)
+        if m is None:
+            return self.remember(self.matches, text, None)
+        if m.group('code') is not None:
+            course_code = CourseCode(m.group('subject'), m.group('code'), m.group('suffix'),
+                                     m.span('subject'), m.span('code'),
+                                     m.span('suffix') if m.group('suffix') is not None else None)
+        else:
+            course_code = CourseCode(None, m.group('bare_code'), m.group('bare_suffix'),
+                                     None, m.span('bare_code'),
+                                     m.span('bare_suffix') if m.group('bare_suffix') is not None else None)
+        return self.remember(self.matches, text, course_code)
+
+    def is_course(self, requisite):
+        """
+        Whether requisite is a course, ignoring text in brackets.
+        """
+        result = self.courses.get(requisite)
+        if result is None:
+            requisite_cleaned = requisite_patterns['brackets'].sub('', requisite).strip()
+            result = self.remember(self.courses, requisite, self.match(requisite_cleaned) is not None)
+        return result
+
+    def subject(self, course):
+        """
+        The subject course starts with (its first word, if that is not a
+        code and is followed by more), else None. Leading spaces are
+        skipped.
+        """
+        if course in self.subjects:
+            return self.subjects[course]
+
+        m = requisite_patterns['course_subject'].match(course)
+        return self.remember(self.subjects, course, m.group(1) if m is not None else None)
+
+    def has_subject(self, course):
+        return self.subject(course) is not None
+
+    def has_course_code(self, course):
+        """
+        Whether the first or second word of course starts with a digit.
+        """
+        result = self.code_starts.get(course)
+        if result is None:
+            result = self.remember(self.code_starts, course, requisite_patterns['course_code_start'].match(course) is not None)
+        return result
+
+    def contains_course_code(self, requisite):
+        """
+        Whether any word of requisite, punctuation aside, looks like a code:
+        digit, capital letter, any character, digit (and an optional digit).
+        """
+        result = self.code_words.get(requisite)
+        if result is None:
+            result = False
+            for m in requisite_patterns['course_code_word'].finditer(requisite.translate(self.word_punctuation)):
+                word = m.group()
+                if word[0].isdigit() and word[1].isupper() and word[3].isdigit() and (len(word) == 4 or word[4].isdigit()):
+                    result = True
+                    break
+            self.remember(self.code_words, requisite, result)
+        return result
+
+
+course_codes = CourseCodeRecognizer()
@@ -0,0 +1,177 @@
+class OrListRecognizer():
+    """
+    Finds the first "one of A, B, C or D" list in a requisite, giving the same
+    two pieces as the first findall() tuple of legacy_pattern:
+    ('one of A, B, C', 'D').
+
+    The regex nests optional and starred groups, so on long text that almost
+    matches it can backtrack exponentially. Here each position is looked at a
+    bounded number of times: runs of letters and subjects are measured once
+    from the right, and the "where can the course list end" question is
+    answered once per position (memoized), in the same order the regex
+    engine would try the alternatives.
+    """
+    legacy_pattern = r'([credit or registration in ]*one of (([A-Z]+ )?[1-5][A-Z][A-Z0-9][0-9]+( A/B)?, )*((([A-Z]+ )?)*[1-5][A-Z][A-Z0-9][0-9]+( A/B)?)*) or (([A-Z]+ )?[1-5][A-Z][A-Z0-9][0-9]+( A/B)?)'
+
+    lead_chars = frozenset('credit or registration in ')
+    one_of = 'one of '
+    upper = frozenset('ABCDEFGHIJKLMNOPQRSTUVWXYZ')
+    digits = frozenset('0123456789')
+    levels = frozenset('12345')
+    suffix_ab = ' A/B'
+
+    def __init__(self, text):
+        self.text = text
+        n = len(text)
+        upper = OrListRecognizer.upper
+        digits = OrListRecognizer.digits
+
+        # End of the run of capitals / digits starting at each position
+        self.upper_end = [0] * (n + 1)
+        self.digit_end = [0] * (n + 1)
+        # Where ([A-Z]+ )* starting at each position stops
+        self.subjects_end = [0] * (n + 1)
+        self.upper_end[n] = self.digit_end[n] = self.subjects_end[n] = n
+        for i in range(n - 1, -1, -1):
+            c = text[i]
+            self.upper_end[i] = self.upper_end[i+1] if c in upper else i
+            self.digit_end[i] = self.digit_end[i+1] if c in digits else i
+            e = self.upper_end[i]
+            if e > i and e < n and text[e] == ' ':
+                self.subjects_end[i] = self.subjects_end[e+1]
+            else:
+                self.subjects_end[i] = i
+
+        self.list_end = {}
+
+    @classmethod
+    def find(cls, text):
+        """
+        Returns (pattern_start, pattern_end) for the first match, or None.
+        """
+        return cls(text).first_match()
+
+    def first_match(self):
+        text = self.text
+        n = len(text)
+        lead_chars = OrListRecognizer.lead_chars
+        one_of = OrListRecognizer.one_of
+
+        i = 0
+        while i < n:
+            if text[i] not in lead_chars:
+                i += 1
+                continue
+            # The regex starts at the first character of a run and backs the
+            # greedy [...]* off to a "one of ". Since 'f' ends the run, the
+            # only candidate is the "one of " the run stops inside.
+            run_start = i
+            while i < n and text[i] in lead_chars:
+                i += 1
+            k = i - 5
+            if k >= run_start and text.startswith(one_of, k):
+                match = self.match_after(k + len(one_of))
+                if match is not None:
+                    group_end, or_end = match
+                    return text[run_start:group_end], text[group_end+4:or_end]
+
+        return None
+
+    def match_after(self, position):
+        """
+        (course ', ')* (subject* course)* ' or ' course, from position.
+        Returns (end of the list, end of the final course).
+        """
+        # Comma-separated items cannot end a match, so the greedy loop never
+        # has a reason to give one back.
+        while True:
+            item_end = self.course_end(self.optional_subject_end(position))
+            if item_end is None or not self.text.startswith(', ', item_end):
+                break
+            position = item_end + 2
+
+        group_end = self.list_end_from(position)
+        if group_end is None:
+            return None
+        return group_end, self.course_end(self.optional_subject_end(group_end + 4))
+
+    def list_end_from(self, position):
+        """
+        First position, in the regex's try order, where the run of
+        subject* course items starting at position can be followed by
+        ' or ' course. Each position is resolved once.
+        """
+        list_end = self.list_end
+        # [position, remaining item ends, item end waiting to be resolved]
+        stack = [[position, self.item_ends(position), None]]
+        while stack:
+            frame = stack[-1]
+            p, ends, pending = frame
+            result = None
+            if pending is not None:
+                result = list_end[pending]
+                frame[2] = None
+
+            descended = False
+            if result is None:
+                for q in ends:
+                    if q not in list_end:
+                        frame[2] = q
+                        stack.append([q, self.item_ends(q), None])
+                        descended = True
+                        break
+                    if list_end[q] is not None:
+                        result = list_end[q]
+                        break
+            if descended:
+                continue
+
+            if result is None and self.ends_with_or(p):
+                result = p
+            list_end[p] = result
+            stack.pop()
+
+        return list_end[position]
+
+    def item_ends(self, position):
+        """
+        Ends of ([A-Z]+ )* [1-5][A-Z][A-Z0-9][0-9]+( A/B)? at position,
+        greedy choices first.
+        """
+        text = self.text
+        c = self.subjects_end[position]
+        if not self.course_head(c):
+            return
+        digit_end = self.digit_end[c+3]
+        for end in range(digit_end, c + 3, -1):
+            if text.startswith(OrListRecognizer.suffix_ab, end):
+                yield end + len(OrListRecognizer.suffix_ab)
+            yield end
+
+    def course_head(self, c):
+        text = self.text
+        return c + 3 < len(text) and text[c] in OrListRecognizer.levels and \
+            text[c+1] in OrListRecognizer.upper and \
+            (text[c+2] in OrListRecognizer.upper or text[c+2] in OrListRecognizer.digits) and \
+            text[c+3] in OrListRecognizer.digits
+
+    def optional_subject_end(self, position):
+        e = self.upper_end[position]
+        if e > position and self.text.startswith(' ', e):
+            return e + 1
+        return position
+
+    def course_end(self, c):
+        """
+        End of [1-5][A-Z][A-Z0-9][0-9]+( A/B)? at c (greedy), or None.
+        """
+        if not self.course_head(c):
+            return None
+        end = self.digit_end[c+3]
+        if self.text.startswith(OrListRecognizer.suffix_ab, end):
+            end += len(OrListRecognizer.suffix_ab)
+        return end
+
+    def ends_with_or(self, position):
+        return self.text.startswith(' or ', position) and \
+            self.course_end(self.optional_subject_end(position + 4)) is not None
@@ -1,13 +1,71 @@
-import re
-import json
+import time
+try:
+    from CourseDependencyGraph.parsers.requisite_rewriter import RequisiteRewriter
+    from CourseDependencyGraph.parsers.requisite_patterns import requisite_patterns
+    from CourseDependencyGraph.parsers.requisite_or_list import OrListRecognizer
+    from CourseDependencyGraph.parsers.requisite_course_code import course_codes
+    from CourseDependencyGraph.parsers.requisite_subjects import known_subjects
+    from CourseDependencyGraph.parsers.requisite_visitor import RequisiteTreeVisitor, encode_tree, decode_tree
+except ModuleNotFoundError:
+    from requisite_rewriter import RequisiteRewriter
+    from requisite_patterns import requisite_patterns
+    from requisite_or_list import OrListRecognizer
+    from requisite_course_code import course_codes
+    from requisite_subjects import known_subjects
+    from requisite_visitor import RequisiteTreeVisitor, encode_tree, decode_tree
+
+
+class RequisiteParseTimeout(Exception):
+    """
+    Raised inside RequisiteParseTree.process when a requisite takes longer
+    than its time budget.
+    """
+    pass
 
 
 class RequisiteParseNode():
+    # Nodes are slotted: every tree is kept resident (and pickled into
+    # courses_v3) so the per-node __dict__ used to dominate memory.
+    __slots__ = ('children', 'corequisite', 'recommended')
+
+    # Layout of the tuple from __getstate__. Rows pickled before nodes were
+    # slotted carry a plain attribute dict instead, see __setstate__.
+    pickle_version = 1
+    _state_slots = {}
+
+    # Levels the recursive traversals below go down before handing what is
+    # under them to the explicit-stack visitors, so no tree is too deep
+    max_recursion_depth = 100
+
     def __init__(self):
         self.children = []
         self.corequisite = False
         self.recommended = False
 
+    @classmethod
+    def state_slots(cls):
+        names = RequisiteParseNode._state_slots.get(cls)
+        if names is None:
+            names = tuple(name for klass in reversed(cls.__mro__) for name in klass.__dict__.get('__slots__', ()))
+            RequisiteParseNode._state_slots[cls] = names
+        return names
+
+    def __getstate__(self):
+        return (RequisiteParseNode.pickle_version,) + tuple(getattr(self, name) for name in self.state_slots())
+
+    def __setstate__(self, state):
+        names = self.state_slots()
+        if isinstance(state, dict):
+            # Version 0: pickled from the old __dict__ based nodes
+            for name in names:
+                if name in state:
+                    setattr(self, name, state[name])
+        elif state[0] == 1:
+            for name, value in zip(names, state[1:]):
+                setattr(self, name, value)
+        else:
+            raise ValueError('Unknown RequisiteParseNode pickle version:', state[0])
+
     @classmethod
     def from_unknown(cls, unknown_node, assert_unknown=True):
         if assert_unknown:
@@ -34,61 +92,129 @@ class RequisiteParseNode():
         return len(self.children) == 0
 
     def flatten(self):
-        root, _ = self._flatten()
-        root, _ = self._flatten() # Hack to call it twice, but it works
-        if isinstance(root, RequisiteParseNodeNote):
-            return RequisiteParseNode()
-        
-        return root
+        """
+        Normalizes the tree under this node in one iterative, bottom-up pass
+        and returns its new root:
 
-    def _flatten(self):
-        if self.has_single_child():
-            deepest_child, has_useful_info = self.children[0]._flatten()
-            return deepest_child, has_useful_info
+        - nodes with a single child are replaced by the child
+        - notes, and AND/OR nodes left without courses, are dropped
+        - AND/OR children of an AND/OR node of the same type (and flags) are
+          merged into it: AND[A, AND[B, C]] -> AND[A, B, C]
+        - children equal to an earlier sibling are dropped
 
-        # # Should not be happening - but empty string appears when scraping
-        # if isinstance(self, RequisiteParseNodeCourse) and not self.course:
-        #     return self, False
+        Runs after infer_subject, so that duplicate courses are compared
+        with their subjects.
+        """
+        # id(node) -> (deepest node, has useful info)
+        results = {}
+        # id(node) -> the children to normalize it from, see mergeable_children
+        node_children = {}
+        # id(deepest node) -> number identifying its structure, to find duplicate siblings
+        keys = {}
+        structures = {}
+        stack = [(self, False)]
+        while stack:
+            node, children_done = stack.pop()
+            if id(node) in results:
+                continue
 
-        # Don't ignore notes
-        # if isinstance(self, RequisiteParseNodeNote) and not self.note:
-        #     return self, False
+            is_operator = isinstance(node, (RequisiteParseNodeOR, RequisiteParseNodeAND, RequisiteParseNodeUNKNOWN))
+            if not children_done:
+                if node.has_single_child():
+                    stack.append((node, True))
+                    stack.append((node.children[0], False))
+                    continue
+                if is_operator and node.children:
+                    children = node_children[id(node)] = self.mergeable_children(node)
+                    stack.append((node, True))
+                    stack.extend((child, False) for child in children)
+                    continue
+
+            if node.has_single_child():
+                results[id(node)] = results[id(node.children[0])]
+            # Ignore notes
+            elif isinstance(node, RequisiteParseNodeNote):
+                results[id(node)] = (node, False)
+            elif not is_operator:
+                structure = (type(node), node.corequisite, node.recommended,
+                             node.course if isinstance(node, RequisiteParseNodeCourse) else id(node))
+                keys[id(node)] = structures.setdefault(structure, len(structures))
+                results[id(node)] = (node, True)
+            elif not node.children:
+                results[id(node)] = (node, False)
+            else:
+                children = []
+                child_keys = set()
+                for child in node_children.pop(id(node)):
+                    deepest_child, has_useful_info = results[id(child)]
+                    if not has_useful_info:
+                        continue
+                    if self.can_merge(node, deepest_child):
+                        merged = deepest_child.children
+                    else:
+                        merged = [deepest_child]
+                    for child in merged:
+                        if keys[id(child)] not in child_keys:
+                            child_keys.add(keys[id(child)])
+                            children.append(child)
+
+                node.children = children
+                if not children:
+                    results[id(node)] = (node, False)
+                elif len(children) == 1:
+                    results[id(node)] = (children[0], True)
+                else:
+                    structure = (type(node), node.corequisite, node.recommended,
+                                 tuple(keys[id(child)] for child in children))
+                    keys[id(node)] = structures.setdefault(structure, len(structures))
+                    results[id(node)] = (node, True)
 
-        # Ignore notes
-        if isinstance(self, RequisiteParseNodeNote):
-            return self, False
-        
-        if not isinstance(self, (RequisiteParseNodeOR, RequisiteParseNodeAND, RequisiteParseNodeUNKNOWN)):
-            return self, True
+        root, _ = results[id(self)]
+        if isinstance(root, RequisiteParseNodeNote):
+            return RequisiteParseNode()
         
-        if not self.children:
-            return self, False
+        return root
 
+    @staticmethod
+    def can_merge(node, child):
+        return (type(child) is type(node) and isinstance(node, (RequisiteParseNodeOR, RequisiteParseNodeAND))
+                and child.corequisite == node.corequisite and child.recommended == node.recommended)
+
+    def mergeable_children(self, node):
+        """
+        Children of node with single-child nodes replaced by their child and
+        same-type children spliced in, ahead of normalizing them. flatten
+        would collapse and merge them anyway, and doing it up front keeps a
+        long AND[A, AND[B, AND[C, ...]]] chain from being merged one level
+        at a time.
+        """
         children = []
-        for i, child in enumerate(self.children):
-            deepest_child, has_useful_info = child._flatten()
-            if has_useful_info:
-                children.append(deepest_child)
-        
-        self.children = children
-        if self.children:
-            return self, True
-        else:
-            return self, False
+        pending = list(reversed(node.children))
+        while pending:
+            child = pending.pop()
+            if child.has_single_child():
+                pending.append(child.children[0])
+            elif self.can_merge(node, child):
+                pending.extend(reversed(child.children))
+            else:
+                children.append(child)
+        return children
 
-    def infer_subject(self):
-        _ = self._infer_subject(None)
+    def infer_subject(self, subject_index=known_subjects):
+        _ = self._infer_subject(None, subject_index)
 
-    def _infer_subject(self, previous_subject):
+    def _infer_subject(self, previous_subject, subject_index, depth=0):
         # A node is a course iff it is a child, so second condition is redundant.
         if self.is_leaf() and isinstance(self, RequisiteParseNodeCourse):
             self.course = self.course.strip()
-            course = self.course
-            course_info = course.split(' ')
-            if self.has_subject():
-                subject = course_info[0]
-                if subject == 'ISCI': 
-                    # Exclude ISCI
+            subject = course_codes.subject(self.course)
+            if subject is not None:
+                if not subject_index.is_known(subject):
+                    # Not a subject the crawl has seen: the codes after it are
+                    # not of the subject before it either
+                    return None
+                if not subject_index.inherits(subject):
+                    # e.g. ISCI, followed by codes of the course's own subject
                     return previous_subject
                 return subject
             else:
@@ -97,38 +223,53 @@ class RequisiteParseNode():
                     self.insert_subject(previous_subject)
                 # else subjectless, likely something went wrong
                 return previous_subject
-        
+
         if self.is_leaf() and isinstance(self, RequisiteParseNodeNote):
             return previous_subject
 
         subject = previous_subject
+        if depth >= self.max_recursion_depth:
+            visitor = RequisiteSubjectVisitor(subject_index, subject)
+            for child in self.children:
+                visitor.preorder(child)
+            return visitor.previous_subject
         for child in self.children:
-            subject = child._infer_subject(subject)
-        
+            subject = child._infer_subject(subject, subject_index, depth + 1)
+
         return subject
-    
+
     def __repr__(self):
-        return str(self.children)
+        return '[%s]' % self._repr_children()
+
+    def _repr(self, depth):
+        return '[%s]' % self._repr_children(depth)
 
-    def _generate_graph(self):
+    def _repr_children(self, depth=0):
+        if depth >= self.max_recursion_depth:
+            return ', '.join(repr_visitor.postorder(child) for child in self.children)
+        return ', '.join(child._repr(depth + 1) for child in self.children)
+
+    def _generate_graph(self, depth=0):
         branch_dict = {}
 
         if self.corequisite:
             branch_dict['cr'] = 1
         if self.recommended:
             branch_dict['rc'] = 1
-        
+
         courses = []
         subbranches = []
         for child in self.children:
-            subbranch_dict = child._generate_graph()
             if isinstance(child, (RequisiteParseNodeOR, RequisiteParseNodeAND)):
                 if any(isinstance(subchild, (RequisiteParseNodeOR, RequisiteParseNodeAND, RequisiteParseNodeCourse))
-                    for subchild in child.children):
-                    subbranches.append(subbranch_dict)
+                       for subchild in child.children):
+                    if depth >= self.max_recursion_depth:
+                        subbranches.append(graph_visitor.postorder(child))
+                    else:
+                        subbranches.append(child._generate_graph(depth + 1))
             elif isinstance(child, RequisiteParseNodeCourse):
-                courses.append(subbranch_dict)
-        
+                courses.append(str(child.course))
+
         if courses:
             branch_dict['c'] = courses
         if subbranches:
@@ -137,14 +278,19 @@ class RequisiteParseNode():
         return branch_dict
 
 class RequisiteParseNodeOR(RequisiteParseNode):
+    __slots__ = ()
+
     def __init__(self):
         super().__init__()
 
     def __repr__(self):
-        return 'OR:%s' % (str(self.children),)
+        return 'OR:[%s]' % self._repr_children()
 
-    def _generate_graph(self):
-        branch_dict = super()._generate_graph()
+    def _repr(self, depth):
+        return 'OR:[%s]' % self._repr_children(depth)
+
+    def _generate_graph(self, depth=0):
+        branch_dict = super()._generate_graph(depth)
         if not branch_dict:
             # Avoid empty AND/OR nodes
             return {}
@@ -152,57 +298,57 @@ class RequisiteParseNodeOR(RequisiteParseNode):
 
         return branch_dict
 
+
 class RequisiteParseNodeAND(RequisiteParseNode):
+    __slots__ = ()
+
     def __init__(self):
         super().__init__()
 
     def __repr__(self):
-        return 'AND%s:%s' % ('' if not self.recommended else 'REC', str(self.children),)
+        return 'AND%s:[%s]' % ('' if not self.recommended else 'REC', self._repr_children())
+
+    def _repr(self, depth):
+        return 'AND%s:[%s]' % ('' if not self.recommended else 'REC', self._repr_children(depth))
 
-    def _generate_graph(self):
-        branch_dict = super()._generate_graph()
+    def _generate_graph(self, depth=0):
+        branch_dict = super()._generate_graph(depth)
         if not branch_dict:
             return {}
         branch_dict['t'] = 'AND'
 
         return branch_dict
 
+
 class RequisiteParseNodeCourse(RequisiteParseNode):
+    __slots__ = ('course',)
+
     def __init__(self, course):
         super().__init__()
         self.course = course
 
     def has_subject(self):
-        course_info = self.course.split(' ')
-
-        # Length 1: must be code
-        if len(course_info) == 1:
-            return False
-        
-        # First digit is a number: must be code
-        # print('RequisiteParseNodeCourse', self.course, course_info)
-        if course_info[0][0] in '0123456789':
-            return False
-
-        return True
+        # A single word, or a first word starting with a digit, must be a code
+        return course_codes.has_subject(self.course)
 
     def has_course_code(self):
-        course_info = self.course.split(' ')
-        if len(course_info) == 1:
-            return course_info[0][0] in '0123456789'
-        else:
-            return course_info[0][0] in '0123456789' or course_info[1][0] in '0123456789'
+        return course_codes.has_course_code(self.course)
 
     def insert_subject(self, subject):
         self.course = '%s %s' % (subject, self.course)
 
     def __repr__(self):
         return str(self.course)
-    
-    def _generate_graph(self):
+
+    def _repr(self, depth):
+        return str(self.course)
+
+    def _generate_graph(self, depth=0):
         return str(self.course)
 
 class RequisiteParseNodeNote(RequisiteParseNode):
+    __slots__ = ('note',)
+
     def __init__(self, note):
         super().__init__()
         self.note = note
@@ -210,13 +356,202 @@ class RequisiteParseNodeNote(RequisiteParseNode):
     def __repr__(self):
         return '"%s"' % str(self.note)
 
+    def _repr(self, depth):
+        return '"%s"' % str(self.note)
+
 class RequisiteParseNodeUNKNOWN(RequisiteParseNode):
+    __slots__ = ('identifier',)
+
     def __init__(self):
         super().__init__()
         self.identifier = None
 
     def __repr__(self):
-        return 'UNKNOWN:%s' % (str(self.children),)
+        return 'UNKNOWN:[%s]' % self._repr_children()
+
+    def _repr(self, depth):
+        return 'UNKNOWN:[%s]' % self._repr_children(depth)
+
+
+class RequisiteReprVisitor(RequisiteTreeVisitor):
+    """
+    str() of a tree, as the processed requisite string: OR:[...], AND:[...]
+    (ANDREC:[...] if recommended), UNKNOWN:[...], [...] for a base node, the
+    course code for a course and the quoted text for a note.
+    """
+    handlers = {
+        RequisiteParseNodeOR: 'visit_or',
+        RequisiteParseNodeAND: 'visit_and',
+        RequisiteParseNodeCourse: 'visit_course',
+        RequisiteParseNodeNote: 'visit_note',
+        RequisiteParseNodeUNKNOWN: 'visit_unknown',
+        RequisiteParseNode: 'visit_node',
+    }
+
+    def children(self, node):
+        if isinstance(node, (RequisiteParseNodeCourse, RequisiteParseNodeNote)):
+            return ()
+        return node.children
+
+    def visit_node(self, node, children, results):
+        return '[%s]' % ', '.join(results)
+
+    def visit_or(self, node, children, results):
+        return 'OR:[%s]' % ', '.join(results)
+
+    def visit_and(self, node, children, results):
+        return 'AND%s:[%s]' % ('' if not node.recommended else 'REC', ', '.join(results))
+
+    def visit_unknown(self, node, children, results):
+        return 'UNKNOWN:[%s]' % ', '.join(results)
+
+    def visit_course(self, node, children, results):
+        return str(node.course)
+
+    def visit_note(self, node, children, results):
+        return '"%s"' % str(node.note)
+
+
+class RequisiteGraphVisitor(RequisiteTreeVisitor):
+    """
+    The graph of a tree for graph.js: {'t': 'AND' | 'OR', 'c': [courses],
+    's': [subbranches], 'cr': 1, 'rc': 1} for a branch, the course code for
+    a course. Notes and UNKNOWN nodes are left out, and so are AND/OR nodes
+    without courses or subbranches under them.
+    """
+    handlers = {
+        RequisiteParseNodeOR: 'visit_or',
+        RequisiteParseNodeAND: 'visit_and',
+        RequisiteParseNodeCourse: 'visit_course',
+        RequisiteParseNode: 'visit_node',
+    }
+    exported = (RequisiteParseNodeOR, RequisiteParseNodeAND, RequisiteParseNodeCourse)
+
+    def children(self, node):
+        # Only these end up in the graph, nothing under other nodes is visited
+        if not node.children:
+            return node.children
+        exported = self.exported
+        return [child for child in node.children if isinstance(child, exported)]
+
+    def visit_node(self, node, children, results):
+        branch_dict = {}
+
+        if node.corequisite:
+            branch_dict['cr'] = 1
+        if node.recommended:
+            branch_dict['rc'] = 1
+
+        courses = []
+        subbranches = []
+        for child, subbranch_dict in zip(children, results):
+            if isinstance(child, RequisiteParseNodeCourse):
+                courses.append(subbranch_dict)
+            elif any(isinstance(subchild, self.exported) for subchild in child.children):
+                subbranches.append(subbranch_dict)
+
+        if courses:
+            branch_dict['c'] = courses
+        if subbranches:
+            branch_dict['s'] = subbranches
+
+        return branch_dict
+
+    def visit_or(self, node, children, results):
+        branch_dict = self.visit_node(node, children, results)
+        if not branch_dict:
+            # Avoid empty AND/OR nodes
+            return {}
+        branch_dict['t'] = 'OR'
+        return branch_dict
+
+    def visit_and(self, node, children, results):
+        branch_dict = self.visit_node(node, children, results)
+        if not branch_dict:
+            return {}
+        branch_dict['t'] = 'AND'
+        return branch_dict
+
+    def visit_course(self, node, children, results):
+        return str(node.course)
+
+
+class RequisiteSubjectVisitor(RequisiteTreeVisitor):
+    """
+    Subject inference: courses are visited left to right and a course
+    without a subject (1A03) takes the subject of the last course that had
+    one (MATH 1A03), unless that subject is not inherited (ISCI, see
+    SubjectIndex) or not known.
+    """
+    handlers = {
+        RequisiteParseNodeCourse: 'visit_course',
+        RequisiteParseNodeNote: 'visit_note',
+        RequisiteParseNode: 'visit_node',
+    }
+
+    def __init__(self, subject_index=known_subjects, previous_subject=None):
+        self.subject_index = subject_index
+        self.previous_subject = previous_subject
+
+    def visit_node(self, node):
+        return node.children
+
+    def visit_note(self, node):
+        return node.children
+
+    def visit_course(self, node):
+        # A node is a course iff it is a child, so this is always a leaf.
+        if not node.is_leaf():
+            return node.children
+
+        node.course = node.course.strip()
+        subject = course_codes.subject(node.course)
+        if subject is not None:
+            if not self.subject_index.is_known(subject):
+                # Not a subject the crawl has seen: the codes after it are not
+                # of the subject before it either
+                self.previous_subject = None
+            elif self.subject_index.inherits(subject):
+                self.previous_subject = subject
+            # else e.g. ISCI, followed by codes of the course's own subject
+        elif self.previous_subject is not None:
+            node.insert_subject(self.previous_subject)
+        # else subjectless, likely something went wrong
+
+
+class RequisiteUnknownVisitor(RequisiteTreeVisitor):
+    """
+    Replaces every UNKNOWN node that is not under another UNKNOWN node by a
+    node of replacement_node_type with its children.
+    """
+    handlers = {
+        RequisiteParseNode: 'visit_node',
+    }
+
+    def __init__(self, replacement_node_type):
+        self.replacement_node_type = replacement_node_type
+
+    def replace(self, root):
+        if isinstance(root, RequisiteParseNodeUNKNOWN):
+            return self.replacement_node_type.from_unknown(root)
+        self.preorder(root)
+        return root
+
+    def visit_node(self, node):
+        # Replaced nodes are not descended into
+        descend = []
+        children = node.children
+        for i, child in enumerate(children):
+            if isinstance(child, RequisiteParseNodeUNKNOWN):
+                children[i] = self.replacement_node_type.from_unknown(child)
+            else:
+                descend.append(child)
+        return descend
+
+
+repr_visitor = RequisiteReprVisitor()
+graph_visitor = RequisiteGraphVisitor()
+
 
 class RequisiteParseTree():
     
@@ -320,11 +655,59 @@ class RequisiteParseTree():
         # 'both ': 'one of ',
         # 'Both ': 'one of ',
     }
-    def __init__(self, requisites, verbose=False, course_code=None, requisite_type='p'):
+    # Applies replace_dict in one scan, compiled on first use
+    replace_rewriter = RequisiteRewriter(replace_dict)
+
+    # Every regex the parser uses, compiled once here (see requisite_patterns).
+    # Lookbehinds keep a pattern from being retried at every character of a
+    # long word or number; each one matches what the unanchored form did.
+    requisite_patterns.register('gpa_decimal', r'((?<!\d)\d+\.\d+|\.\d+)')
+    requisite_patterns.register('period', r'\.(?![^(]*\))')
+    requisite_patterns.register('comma', r',|\[comma\]')
+    requisite_patterns.register('and_or', r'( \band\b(?![^(]*\)) | \bor\b(?![^(]*\)) |\Aor\b(?![^(]*\))|\Aand\b(?![^(]*\)))')
+    requisite_patterns.register('infixes', '(' + '|'.join(infix for infix in infixes) + ')')
+    requisite_patterns.register('brackets', r'\(.*\)')
+    requisite_patterns.register('joined_subject', r'(?<![A-Z])([A-Z]+) ([A-Z]+)')
+    requisite_patterns.register('units_from', r'(?:(?<![A-Za-z0-9])|(?<=units from))[A-Za-z0-9]+ units from')
+    requisite_patterns.register('grade_in', r'[aA] grade of [at least ]?[a-dA-D][\+-]* in')
+    requisite_patterns.register('students_in', r'Students in (.*)at least [A-D][-+] in one of')
+
+    # Seconds process() may spend on one requisite before giving up and
+    # keeping the whole requisite as a note. The budget is wall-clock time,
+    # so whether it is hit depends on the machine's load: process() then
+    # sets timed_out, and the tree must not be taken for a parsed note.
+    time_budget = 2.0
+    timed_out = False
+    _deadline = None
+
+    # SubjectIndex of the subjects the crawl has seen; the default knows none
+    subject_index = known_subjects
+
+    def __init__(self, requisites, verbose=False, course_code=None, requisite_type='p', time_budget=None,
+                 subject_index=None):
         self.requisites = requisites
         self.verbose = verbose
         self.course_code = course_code
         self.requisite_type = requisite_type
+        if time_budget is not None:
+            self.time_budget = time_budget
+        if subject_index is not None:
+            self.subject_index = subject_index
+
+    def __getstate__(self):
+        # The index is shared by every tree of a crawl, not part of a tree
+        state = self.__dict__.copy()
+        state.pop('subject_index', None)
+        if 'root' in state:
+            # Flat, so that trees of any depth pickle
+            state['root'] = encode_tree(state['root'])
+        return state
+
+    def __setstate__(self, state):
+        if isinstance(state.get('root'), list):
+            state['root'] = decode_tree(state['root'])
+        # else pickled with the nodes nested
+        self.__dict__.update(state)
 
     def __repr__(self):
         return str('ROOT:[%s]' % (self.root))
@@ -421,12 +804,12 @@ class RequisiteParseTree():
 
     def split_on_period(self, requisite):
         # don't splt gpa (decimal)
-        requisite = re.sub(r'(\d*\.\d+)', r'(\1)', requisite)
-        split = re.split(r'\.(?![^(]*\))', requisite)
+        requisite = requisite_patterns['gpa_decimal'].sub(r'(\1)', requisite)
+        split = requisite_patterns['period'].split(requisite)
         return split
 
     def split_on_comma(self, requisite):
-        split = re.split(r',|\[comma\]', requisite)
+        split = requisite_patterns['comma'].split(requisite)
         return split
 
     def split_on_AND_OR_and_return_which(self, requisite):
@@ -434,7 +817,7 @@ class RequisiteParseTree():
         # Do not split on anything inside brackets?:
         # https://stackoverflow.com/questions/44425565/how-to-remove-all-characters-not-inside-parentheses-using-regex
         
-        split = re.split(r'( \band\b(?![^(]*\)) | \bor\b(?![^(]*\)) |\Aor\b(?![^(]*\))|\Aand\b(?![^(]*\)))', requisite)
+        split = requisite_patterns['and_or'].split(requisite)
         requisites_split, AND_OR_list = split[0::2], split[1::2]
         AND_OR_list = [operator.strip().lower() for operator in AND_OR_list]
 
@@ -442,7 +825,7 @@ class RequisiteParseTree():
         return requisites_split, AND_OR_list
 
     def split_on_infixes_and_return_which(self, requisite):
-        split = re.split('(' + '|'.join(infix for infix in RequisiteParseTree.infixes) + ')', requisite)
+        split = requisite_patterns['infixes'].split(requisite)
         requisites_split, infix_list = split[0::2], split[1::2]
 
         return requisites_split, infix_list
@@ -455,7 +838,67 @@ class RequisiteParseTree():
 
         This case is unfixable, actually. (or 2M06) will get associated with 2MM3, not both. The only way to deal with this is to write a custom parser for "both" keyword, but I am too lazy for that, and comes with a number of its own design issues as well.
         """
+        lower = requisite.lower()
+        if len(lower) != len(requisite):
+            # lower() changed some character's length, offsets don't line up
+            return self.replace_keyword_both_sequential(requisite)
+
+        # Each "both " takes the first "and" after it that an earlier "both "
+        # has not already taken. Neither word can overlap the other or
+        # "[comma] ", so both lists of offsets come from the original text.
+        boths = []
+        ands = []
+        and_from = 0
+        t = lower.find('both ')
+        while t != -1:
+            c = lower.find('and', max(t, and_from))
+            boths.append(t)
+            if c != -1:
+                ands.append(c)
+                and_from = c + 3
+            t = lower.find('both ', t + 5)
+
+        if not boths:
+            return requisite
+
+        pieces = []
+        tail = ''   # last 4 characters of the output so far, lowercased
+        i = 0
+        j = 0
+        for t in boths:
+            while j < len(ands) and ands[j] < t:
+                pieces.append(requisite[i:ands[j]])
+                pieces.append('[comma] ')
+                tail = '[comma] '[-4:]
+                i = ands[j] + 3
+                j += 1
+            pieces.append(requisite[i:t])
+            tail = (tail + lower[i:t])[-4:]
+            i = t + 5
+
+            # Removing "both " can join its neighbours into a new "both ",
+            # which the sequential version would go on to replace as well.
+            following = lower[i:i+4]
+            if j < len(ands):
+                following = following[:ands[j] - i]
+            if -1 < (tail + following).find('both ') < len(tail):
+                return self.replace_keyword_both_sequential(requisite)
+
+        for c in ands[j:]:
+            pieces.append(requisite[i:c])
+            pieces.append('[comma] ')
+            i = c + 3
+        pieces.append(requisite[i:])
+
+        return ''.join(pieces)
+
+    def replace_keyword_both_sequential(self, requisite):
+        """
+        What replace_keyword_both used to do: rescan from the start after
+        every replacement.
+        """
         while 'both ' in requisite.lower():
+            self.check_time_budget()
             t = requisite.lower().find('both ')
             for c in range(t, len(requisite)):
                 try:
@@ -470,30 +913,21 @@ class RequisiteParseTree():
         
         return requisite
 
-    def dfs_replace_unknown_identifier(self, requisite_node, replacement_node_type, identifier):
+    def dfs_replace_unknown_identifier(self, requisite_node, replacement_node_type, identifier, depth=0):
         if isinstance(requisite_node, RequisiteParseNodeUNKNOWN):
             return replacement_node_type.from_unknown(requisite_node)
 
+        if depth >= RequisiteParseNode.max_recursion_depth:
+            return RequisiteUnknownVisitor(replacement_node_type).replace(requisite_node)
         for i, child in enumerate(requisite_node.children):
-            requisite_node.children[i] = self.dfs_replace_unknown_identifier(child, replacement_node_type, identifier)
+            requisite_node.children[i] = self.dfs_replace_unknown_identifier(child, replacement_node_type, identifier,
+                                                                             depth + 1)
 
         return requisite_node
 
     def likely_is_course(self, requisite):
-        # Remove all text in brackets first
-        requisite_cleaned = re.sub(r'\(.*\)', '', requisite).strip()
-        # print('likely_is_course - requisite_cleaned:', requisite_cleaned)
-
-        requisites_split = requisite_cleaned.split(' ')
-        if len(requisites_split) > 3:
-            return False
-
-        if len(requisites_split) == 1:
-            return requisites_split[0][0].isdigit()
-        elif len(requisites_split) > 1:
-            return requisites_split[1][0].isdigit() or (requisites_split[0][0].isdigit() and requisites_split[1].strip() == 'A/B')
-        else:
-            return False
+        # Ignores all text in brackets
+        return course_codes.is_course(requisite)
 
     def likely_is_course_prefix_excluded(self, requisite):
         prefix, p = self.find_prefix(requisite)
@@ -502,41 +936,10 @@ class RequisiteParseTree():
         return self.likely_is_course(requisite_cleaned)
 
     def does_not_contain_courses(self, requisite):
-        requisites_split = requisite.split(' ')
-
-        for requisite in requisites_split:
-            # Length ignoring punctuation
-            requisite = requisite.replace('.', '')
-            requisite = requisite.replace(',', '')
-            requisite = requisite.replace(')', '')
-            requisite = requisite.replace('(', '')
-            requisite = requisite.replace(';', '')
-            if len(requisite) <= 3:
-                continue
-            
-            if len(requisite) == 4:
-                if requisite[0].isdigit() and requisite[3].isdigit() and requisite[1].isupper():
-                    return False
-
-            if len(requisite) == 5:
-                if requisite[0].isdigit() and requisite[3].isdigit() and requisite[4].isdigit() and requisite[1].isupper():
-                    return False
-              
-        return True
+        return not course_codes.contains_course_code(requisite)
 
     def has_subject(self, course):
-        course_info = course.split(' ')
-
-        # Length 1: must be code
-        if len(course_info) == 1:
-            return False
-        
-        # First digit is a number: must be code
-        # print('RequisiteParseNodeCourse', self.course, course_info)
-        if course_info[0][0] in '0123456789':
-            return False
-
-        return True
+        return course_codes.has_subject(course)
 
     ### --------------------------------- End Procesing Functions
 
@@ -548,18 +951,32 @@ class RequisiteParseTree():
         self.root = self.root.flatten()
 
     def infer_subjects(self):
-        self.root.infer_subject()
+        self.root.infer_subject(self.subject_index)
     
     ### --------------------------------- End Postprocesing Functions
 
+    def check_time_budget(self):
+        if self._deadline is not None and time.perf_counter() > self._deadline:
+            raise RequisiteParseTimeout('Exceeded %.2fs parsing: %.80s' % (self.time_budget, self.requisites))
+
     def process(self):
         if self.verbose: print('root original:', self.requisites)
-        self.root = self.preprocess(self.requisites)
-        if self.verbose: print('root preprocessed:', self.root)
-        self.flatten()
-        if self.verbose: print('root flattened:', self.root)
-        self.infer_subjects()
-        if self.verbose: print('root inferred:', self.root)
+        self._deadline = time.perf_counter() + self.time_budget
+        self.timed_out = False
+        try:
+            self.root = self.preprocess(self.requisites)
+            if self.verbose: print('root preprocessed:', self.root)
+            self.check_time_budget()
+            self.infer_subjects()
+            if self.verbose: print('root inferred:', self.root)
+            self.flatten()
+            if self.verbose: print('root flattened:', self.root)
+        except RequisiteParseTimeout as e:
+            if self.verbose: print('Parse time budget exceeded, keeping requisite as a note:', e)
+            self.root = RequisiteParseNodeNote(self.requisites)
+            self.timed_out = True
+        finally:
+            del self._deadline
         return str(self.root)
 
     def preprocess(self, requisite):
@@ -567,20 +984,18 @@ class RequisiteParseTree():
         # replace multiple spaces with one
         # doesn't fix parse problems w/ ENGPHYS 3W04 A/B and PHYSICS 3B06, or ENGPHYS 3BA3 ,  3BB3.
         # requisite_cleaned = ' '.join(requisite_cleaned.split()) 
-        requisite_cleaned = re.sub(r'([A-Z]+) ([A-Z]+)', r'\1\2', requisite_cleaned)
+        requisite_cleaned = self.subject_index.join_subjects(requisite_cleaned)
         # Treat a units obtained requirement as an OR requirement
-        requisite_cleaned = re.sub(r'[A-Za-z0-9]+ units from', 'one of', requisite_cleaned)
-        requisite_cleaned = re.sub(r'[aA] grade of [at least ]?[a-dA-D][\+-]* in', '', requisite_cleaned)
-        requisite_cleaned = re.sub(r'Students in (.*)at least [A-D][-+] in one of', 'one of', requisite_cleaned)
+        requisite_cleaned = requisite_patterns['units_from'].sub('one of', requisite_cleaned)
+        requisite_cleaned = requisite_patterns['grade_in'].sub('', requisite_cleaned)
+        requisite_cleaned = requisite_patterns['students_in'].sub('one of', requisite_cleaned)
         
         # One of A, B, C or D pattern to
         # One of A, B, C, D
-        or_list_pattern = re.compile(r'([credit or registration in ]*one of (([A-Z]+ )?[1-5][A-Z][A-Z0-9][0-9]+( A/B)?, )*((([A-Z]+ )?)*[1-5][A-Z][A-Z0-9][0-9]+( A/B)?)*) or (([A-Z]+ )?[1-5][A-Z][A-Z0-9][0-9]+( A/B)?)')
-        requisites_list = or_list_pattern.findall(requisite_cleaned)
-
-        for i, found_pattern in enumerate(requisites_list):
-            pattern_start = found_pattern[0]
-            pattern_end = found_pattern[8]
+        # Linear-time equivalent of OrListRecognizer.legacy_pattern
+        found_pattern = OrListRecognizer.find(requisite_cleaned)
+        if found_pattern is not None:
+            pattern_start, pattern_end = found_pattern
             requisite_pattern_cleaned = ','.join([pattern_start, pattern_end])
 
             ps = requisite_cleaned.find(pattern_start)
@@ -589,10 +1004,8 @@ class RequisiteParseTree():
             requisite_cleaned = requisite_cleaned[:ps] + requisite_pattern_cleaned + requisite_cleaned[pe:]
 
             print('requisite_pattern_cleaned', requisite_pattern_cleaned)
-            break # only allow once
 
-        for word, replacement in RequisiteParseTree.replace_dict.items():
-            requisite_cleaned = requisite_cleaned.replace(word, replacement)
+        requisite_cleaned = RequisiteParseTree.replace_rewriter.rewrite(requisite_cleaned)
 
         # print('preprocess - requisite_cleaned:', requisite_cleaned)
         requisite_cleaned = self.replace_keyword_both(requisite_cleaned)
@@ -625,6 +1038,7 @@ class RequisiteParseTree():
         """
         One of xxxx, yyyy is recommended.
         """
+        self.check_time_budget()
         second_level_node = None
 
         recommended = False
@@ -858,6 +1272,7 @@ class RequisiteParseTree():
         Split on and/or
         Also Needed for: COMPSCI 2C03 or 3DA3 or SFWRENG 2C03 or 3K04
         """
+        self.check_time_budget()
         requisite_cleaned = requisite_string
         # print('sixth level - requisite_string', requisite_string)
         seventh_level_node = None
@@ -1011,8 +1426,10 @@ class RequisiteParseTree():
                 if self.likely_is_course(requisite):
                     # print('seventh_level_split inference:', requisites_split_and_or, requisite, previous_subject)
                     if self.has_subject(requisite):
-                        course_info = requisite.split(' ')
-                        previous_subject = course_info[0]
+                        if self.subject_index.is_known(course_codes.subject(requisite)):
+                            previous_subject = course_codes.subject(requisite)
+                        else:
+                            previous_subject = None
                     else:
                         # Possible it is None, because contained in other split
                         # assert previous_subject is not None
@@ -1119,6 +1536,7 @@ class RequisiteParseTree():
         Handle and, or's
         """
         # print('ninth_level_split - requisite_string:', requisite_string)
+        self.check_time_budget()
         ninth_level_node = None
         requisite_cleaned = requisite_string
 
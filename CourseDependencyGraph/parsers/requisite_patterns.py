@@ -0,0 +1,33 @@
+import re
+
+
+class PatternRegistry():
+    """
+    Named regexes for the requisite parsers, compiled once when they are
+    registered. RequisiteParseProfiler counts the lookups of each pattern
+    while it is enabled.
+
+        requisite_patterns['period'].split(requisite)
+    """
+    def __init__(self):
+        self.patterns = {}
+
+    def register(self, name, pattern, flags=0):
+        if name in self.patterns:
+            compiled = self.patterns[name]
+            if compiled.pattern != pattern or compiled.flags & ~re.UNICODE != flags:
+                raise ValueError('Pattern already registered under a different regex:', name)
+            return compiled
+
+        compiled = re.compile(pattern, flags)
+        self.patterns[name] = compiled
+        return compiled
+
+    def __getitem__(self, name):
+        return self.patterns[name]
+
+    def __contains__(self, name):
+        return name in self.patterns
+
+
+requisite_patterns = PatternRegistry()
@@ -0,0 +1,204 @@
+import re
+from bisect import bisect_right
+
+
+class RequisiteRewriter():
+    """
+    Applies an ordered {word: replacement} table (RequisiteParseTree.replace_dict)
+    in a single scan of the text.
+
+    The table is compiled into one trie-shaped regex, so matching at a
+    position costs the length of the match instead of the number of rules.
+    At every position the longest rule wins, and since keys are unique that
+    also settles "earlier" vs "later" rules for the same text.
+
+    Applying the rules one after another with str.replace lets a later rule
+    match text produced by an earlier one (', credit or registration in' ->
+    ', credit | registration in' -> ' and credit | registration in'). Those
+    chains are found when the table is compiled, by checking every pair of
+    rules whose keys or outputs overlap, and added as longer rules whose
+    replacement is what the sequential replaces would have produced.
+
+    Completing the table takes time superlinear in the number of rules, so
+    it is done on first use (see compile) rather than when the parser is
+    imported by every process, most of which never rewrite anything.
+    """
+    completion_rounds = 2
+
+    def __init__(self, replace_dict):
+        self.rules = list(replace_dict.items())
+        self.table = None
+        self.pattern = None
+
+    def __len__(self):
+        self.compile()
+        return len(self.table)
+
+    def compile(self):
+        """
+        Builds the completed table and its regex, once.
+        """
+        if self.pattern is not None:
+            return self
+        self.table = dict(self.rules)
+        self.pattern = RequisiteRewriter.compile_table(self.table)
+        new_keys = set(self.table)
+        for _ in range(RequisiteRewriter.completion_rounds):
+            new_keys = self.complete(new_keys)
+            if not new_keys:
+                break
+        return self
+
+    def rewrite(self, text):
+        if self.pattern is None:
+            self.compile()
+        table = self.table
+        return self.pattern.sub(lambda match: table[match.group()], text)
+
+    def rewrite_counted(self, text, fired):
+        """
+        rewrite, adding one to fired[key] (a Counter) for every rule applied.
+        """
+        if self.pattern is None:
+            self.compile()
+        table = self.table
+
+        def replacement(match):
+            key = match.group()
+            fired[key] += 1
+            return table[key]
+        return self.pattern.sub(replacement, text)
+
+    def rewrite_sequential(self, text):
+        """
+        What preprocess used to do: one full pass of the text per rule.
+        """
+        for word, replacement in self.rules:
+            text = text.replace(word, replacement)
+        return text
+
+    def complete(self, new_keys):
+        """
+        Adds a rule for every overlap between two rules (at least one of them
+        from new_keys) where the single scan would disagree with the
+        sequential replaces. Returns the keys that were added.
+
+        Candidate pairs come from tries over the keys and the reversed keys,
+        so each rule only meets the rules it can actually overlap with.
+        """
+        added = {}
+        keys = list(self.table)
+        trie = RequisiteRewriter.build_index(keys)
+        reversed_trie = RequisiteRewriter.build_index([key[::-1] for key in keys])
+        joined = '\0'.join(keys)
+        starts = []
+        i = 0
+        for key in keys:
+            starts.append(i)
+            i += len(key) + 1
+
+        for a in keys:
+            output = self.table[a]
+            a_new = a in new_keys
+            # b inside a, or a's suffix is b's prefix
+            for b, m in RequisiteRewriter.prefix_matches(trie, a):
+                if a is not b and (a_new or b in new_keys):
+                    self.check(a + b[m:], added)
+            if not output:
+                continue
+            # b inside output, or output's suffix is b's prefix
+            for b, m in RequisiteRewriter.prefix_matches(trie, output):
+                if a != b and (a_new or b in new_keys):
+                    self.check(a + b[m:], added)
+            # output's prefix is b's suffix
+            for rb, m in RequisiteRewriter.prefix_matches(reversed_trie, output[::-1]):
+                b = rb[::-1]
+                if a != b and m < len(output) and m < len(b) and (a_new or b in new_keys):
+                    self.check(b[:-m] + a, added)
+            # b spans the whole output and more
+            i = joined.find(output)
+            while i != -1:
+                index = bisect_right(starts, i) - 1
+                b = keys[index]
+                if a != b and (a_new or b in new_keys):
+                    offset = i - starts[index]
+                    self.check(b[:offset] + a + b[offset+len(output):], added)
+                i = joined.find(output, i + 1)
+
+        if added:
+            self.table.update(added)
+            self.pattern = RequisiteRewriter.compile_table(self.table)
+        return set(added)
+
+    def check(self, source, added):
+        if source in self.table or source in added:
+            return
+        expected = self.rewrite_sequential(source)
+        # Not self.rewrite, which a profiler may be counting
+        table = self.table
+        if self.pattern.sub(lambda match: table[match.group()], source) != expected:
+            added[source] = expected
+
+    @staticmethod
+    def build_index(keys):
+        """
+        Trie over keys where every node lists the keys passing through it
+        (under None) and the key ending there (under '').
+        """
+        trie = {}
+        for key in keys:
+            node = trie
+            for c in key:
+                node = node.setdefault(c, {})
+                node.setdefault(None, []).append(key)
+            node[''] = key
+        return trie
+
+    @staticmethod
+    def prefix_matches(trie, text):
+        """
+        Yields (key, m) for keys that appear whole inside text (m == len(key))
+        and keys whose first m characters are a proper suffix of text.
+        """
+        for i in range(len(text)):
+            node = trie
+            for j in range(i, len(text)):
+                node = node.get(text[j])
+                if node is None:
+                    break
+                if '' in node:
+                    yield node[''], j - i + 1
+            else:
+                if i > 0:
+                    m = len(text) - i
+                    for key in node[None]:
+                        if len(key) > m:
+                            yield key, m
+
+    @staticmethod
+    def compile_table(table):
+        trie = {}
+        for word in table:
+            node = trie
+            for c in word:
+                node = node.setdefault(c, {})
+            node[''] = True
+        return re.compile(RequisiteRewriter.trie_to_regex(trie))
+
+    @staticmethod
+    def trie_to_regex(node):
+        """
+        Children are tried before ending the match, so the regex prefers the
+        longest rule at each position.
+        """
+        terminal = '' in node
+        branches = [re.escape(c) + RequisiteRewriter.trie_to_regex(child)
+                    for c, child in node.items() if c != '']
+        if not branches:
+            return ''
+        if len(branches) == 1 and not terminal:
+            return branches[0]
+        regex = '(?:%s)' % '|'.join(branches)
+        if terminal:
+            regex += '?'
+        return regex
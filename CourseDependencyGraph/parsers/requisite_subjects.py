@@ -0,0 +1,119 @@
+import os
+import json
+import sqlite3
+import hashlib
+try:
+    from CourseDependencyGraph.parsers.requisite_patterns import requisite_patterns
+    from CourseDependencyGraph.parsers.requisite_course_code import course_codes
+except ModuleNotFoundError:
+    from requisite_patterns import requisite_patterns
+    from requisite_course_code import course_codes
+
+
+class SubjectIndex():
+    """
+    The set of known subjects (MATH, ELECENG, ...), taken from the course
+    codes of crawled courses, for the parser to check subjects against
+    instead of guessing from the shape of the text:
+
+    - join_subjects: "ELEC ENG 2EI5" -> "ELECENG 2EI5" only when ELECENG is
+      a known subject, and "MATH PHYSICS" is left alone as both are
+    - is_known: whether the first word of a course is a subject, so that an
+      unknown word is neither carried to the next courses nor prefixed
+    - inherits: whether later subjectless codes take this subject (not for
+      ISCI, whose codes are followed by those of the course's own subject)
+
+    An empty index knows no subject and gives the parser's behaviour without
+    one: every pair of all-caps words is joined and every first word is a
+    subject. Build it once per crawl (from_db) so a run parses
+    deterministically; version identifies its contents for the parse cache.
+
+        subject_index = SubjectIndex.from_course_codes(['ELECENG 2EI5', 'MATH 1ZA3'])
+        subject_index.join_subjects('ELEC ENG 2EI5')    # 'ELECENG 2EI5'
+    """
+    not_inherited = frozenset(['ISCI'])
+
+    # A pair of all-caps words, the second in a lookahead so that it can be
+    # the first of the next pair when the two are not joined
+    requisite_patterns.register('subject_pair', r'(?<![A-Z])([A-Z]+) (?=([A-Z]+))')
+
+    def __init__(self, subjects=()):
+        self.subjects = frozenset(subjects)
+        digest = hashlib.sha1()
+        for subject in sorted(self.subjects):
+            digest.update(('%s\0' % subject).encode())
+        digest.update('\0'.join(sorted(self.not_inherited)).encode())
+        self.version = digest.hexdigest()[:16] if self.subjects else ''
+
+    @classmethod
+    def from_course_codes(cls, course_codes_seen):
+        subjects = set()
+        for course_code in course_codes_seen:
+            subject = course_codes.subject(course_code.strip())
+            if subject is not None and course_codes.has_course_code(course_code.strip()):
+                subjects.add(subject)
+        return cls(subjects)
+
+    @classmethod
+    def from_db(cls, db_path='db/course_db_example.db'):
+        """
+        Index of the subjects of every course stored by the pipeline, empty
+        if there is no database yet.
+        """
+        if not os.path.exists(db_path):
+            return cls()
+        conn = sqlite3.connect(db_path)
+        try:
+            rows = conn.execute('''SELECT coruse_info_json FROM courses_v3''').fetchall()
+        except sqlite3.OperationalError as e:
+            print('No courses to index subjects from:', e)
+            rows = []
+        finally:
+            conn.close()
+        return cls.from_course_codes(json.loads(course_info_json)['course_code'] for course_info_json, in rows)
+
+    def __len__(self):
+        return len(self.subjects)
+
+    def __contains__(self, subject):
+        return subject in self.subjects
+
+    def __repr__(self):
+        return 'SubjectIndex(%d subjects)' % len(self.subjects)
+
+    def is_known(self, subject):
+        return not self.subjects or subject in self.subjects
+
+    def inherits(self, subject):
+        return subject not in self.not_inherited
+
+    def can_join(self, first, second):
+        if first + second in self.subjects:
+            return True
+        # Unknown words are joined as without an index
+        return first not in self.subjects and second not in self.subjects
+
+    def join_subjects(self, text):
+        """
+        Joins subjects written as two all-caps words, e.g. ELEC ENG.
+        """
+        if not self.subjects:
+            return requisite_patterns['joined_subject'].sub(r'\1\2', text)
+
+        pieces = []
+        position = 0
+        for m in requisite_patterns['subject_pair'].finditer(text):
+            if m.start() < position:
+                # The first word was joined to the word before it
+                continue
+            first, second = m.group(1), m.group(2)
+            if self.can_join(first, second):
+                pieces.append(text[position:m.start()])
+                pieces.append(first + second)
+                position = m.end() + len(second)
+        pieces.append(text[position:])
+        return ''.join(pieces)
+
+
+# Knows no subject: the parser's default, see SubjectIndex
+known_subjects = SubjectIndex()
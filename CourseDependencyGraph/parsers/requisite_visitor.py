@@ -0,0 +1,144 @@
+class RequisiteTreeVisitor():
+    """
+    Explicit-stack traversals of requisite trees, so that no tree is too
+    deep to process (a long program requirement such as "A and B or C and
+    D or ..." nests one node per operator). The node methods recurse, which
+    is faster on the shallow trees of nearly every course, and only hand
+    what is deeper than RequisiteParseNode.max_recursion_depth to these.
+
+    A visitor maps node classes to handler methods in handlers, by name.
+    The handler for a node is the one of the first class of its MRO found
+    in handlers, so RequisiteParseNode can hold the default:
+
+        class CourseCounter(RequisiteTreeVisitor):
+            handlers = {RequisiteParseNodeCourse: 'visit_course', RequisiteParseNode: 'visit_node'}
+
+    preorder() calls handler(node) on nodes parent first, children left to
+    right, and descends into the children it returns. postorder() calls
+    handler(node, children, results) children first, where results holds
+    the handler results of children (self.children(node), all of them by
+    default) and returns the result for the root. Handlers are looked up
+    once per node type.
+    """
+    handlers = {}
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        # type(node) -> handler function, filled in as node types are met
+        cls._dispatch_table = {}
+
+    def dispatch(self, node):
+        handler = self._dispatch_table.get(type(node))
+        if handler is None:
+            for klass in type(node).__mro__:
+                if klass in self.handlers:
+                    handler = self._dispatch_table[type(node)] = getattr(type(self), self.handlers[klass])
+                    break
+            else:
+                raise TypeError('%s has no handler for %s' % (type(self).__name__, type(node).__name__))
+        return handler
+
+    def children(self, node):
+        return node.children
+
+    def preorder(self, root):
+        table = self._dispatch_table
+        stack = [root]
+        while stack:
+            node = stack.pop()
+            handler = table.get(type(node)) or self.dispatch(node)
+            children = handler(self, node)
+            if children:
+                stack.extend(reversed(children))
+
+    def postorder(self, root):
+        table = self._dispatch_table
+        children_of = self.children
+        children = children_of(root)
+        if not children:
+            return (table.get(type(root)) or self.dispatch(root))(self, root, children, [])
+
+        # Preorder with the children right to left, so that read backwards
+        # it visits children left to right and before their parent
+        order = [(root, children)]
+        stack = list(children)
+        while stack:
+            node = stack.pop()
+            children = children_of(node)
+            order.append((node, children))
+            stack.extend(children)
+
+        # The results of a node's children are the last ones on values
+        values = []
+        for node, children in reversed(order):
+            handler = table.get(type(node)) or self.dispatch(node)
+            if children:
+                results = values[-len(children):]
+                del values[-len(children):]
+            else:
+                results = []
+            values.append(handler(self, node, children, results))
+        return values[0]
+
+
+def encode_tree(root):
+    """
+    The tree under root as a flat preorder list, which pickles without
+    recursing once per level as pickling the nodes themselves does. Each
+    node is (class, slot values but children, number of children); a node
+    seen before is the int position of its first entry, so shared subtrees
+    stay shared. Anything else found among children (e.g. the '' an empty
+    fifth level leaves) is (None, value, 0).
+    """
+    encoded = []
+    positions = {}
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        if id(node) in positions:
+            encoded.append(positions[id(node)])
+            continue
+        positions[id(node)] = len(encoded)
+        if not hasattr(node, 'state_slots'):
+            encoded.append((None, node, 0))
+            continue
+        values = tuple(getattr(node, name) for name in node.state_slots() if name != 'children')
+        encoded.append((type(node), values, len(node.children)))
+        stack.extend(reversed(node.children))
+    return encoded
+
+
+def decode_tree(encoded):
+    """
+    Inverse of encode_tree, returns the root.
+    """
+    root = None
+    nodes = []
+    # [node, children still to attach]
+    stack = []
+    for entry in encoded:
+        count = 0
+        if isinstance(entry, int):
+            node = nodes[entry]
+        else:
+            node_class, values, count = entry
+            if node_class is None:
+                node = values
+            else:
+                node = node_class.__new__(node_class)
+                for name, value in zip((name for name in node_class.state_slots() if name != 'children'), values):
+                    setattr(node, name, value)
+                node.children = []
+        nodes.append(node)
+
+        if stack:
+            stack[-1][0].children.append(node)
+            stack[-1][1] -= 1
+        else:
+            root = node
+        if count:
+            stack.append([node, count])
+        else:
+            while stack and stack[-1][1] == 0:
+                stack.pop()
+    return root
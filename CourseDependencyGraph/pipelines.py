@@ -1,48 +1,135 @@
 # -*- coding: utf-8 -*-
 import json
+import time
 import sqlite3
 import pickle
 
+from CourseDependencyGraph.parsers.parse_html_archive import CourseHTMLArchive
+from CourseDependencyGraph.parsers.parse_page_changes import CoursePageChanges
+
 # Define your item pipelines here
 #
 # Don't forget to add your pipeline to the ITEM_PIPELINES setting
 # See: https://doc.scrapy.org/en/latest/topics/item-pipeline.html
 
 
+def create_courses_table(c):
+    c.execute(
+        '''
+        CREATE TABLE IF NOT EXISTS courses_v3
+        (
+            course_id STRING PRIMARY KEY,
+            course_info BLOB,
+            coruse_info_json TEXT
+        )
+        '''
+    )
+
+
+def course_row(course_info):
+    # (course_id, course_info, coruse_info_json) of courses_v3, plain bytes
+    # and strings so worker processes can send it back (see reextract.py)
+    course_info_pdata = pickle.dumps(course_info, pickle.HIGHEST_PROTOCOL)
+    return (course_info['json_data']['course_id'], course_info_pdata,
+            json.dumps(course_info['json_data'], indent=4))
+
+
+def store_courses(c, rows):
+    c.executemany(
+        '''
+        INSERT OR REPLACE INTO courses_v3(course_id, course_info, coruse_info_json)
+        VALUES (?, ?, ?)
+        ''',
+        rows
+    )
+
+
 class CoursedependencygraphPipeline(object):
+    html_archive = None
+    # Unchanged pages whose last_seen is written by the next flush_unchanged
+    unchanged = None
+    unchanged_batch_size = 256
+
+    def open_spider(self, spider):
+        # Pages are archived so reextract.py can run extraction again
+        # without a crawl (None disables the archive)
+        archive_path = spider.settings.get('REQUISITE_HTML_ARCHIVE')
+        if archive_path is not None:
+            self.html_archive = CourseHTMLArchive(archive_path)
+
+    def close_spider(self, spider):
+        self.flush_unchanged(spider)
+        if self.html_archive is not None:
+            self.html_archive.close()
+
     def process_item(self, course_info, spider):
+        t = time.perf_counter()
+        if course_info.get('unchanged'):
+            return self.process_unchanged(course_info, spider, t)
+
         course_id = course_info['json_data']['course_id']
         success_text = 'success' if course_info['json_data']['success'] else 'failed'
 
+        # Archived and hashed, not stored with the course
+        block_content_html = course_info.pop('block_content_html', None)
+        content_hash = course_info.pop('content_hash', None)
+        parse_version = course_info.pop('parse_version', None)
+        if self.html_archive is not None and block_content_html is not None:
+            self.html_archive.put(course_id, block_content_html)
+
         with open('samples/json/processed_data_%s_%s.json' % (course_id, success_text), 'w') as f:
             f.write(json.dumps(course_info['json_data'], indent=4))
-        
-        course_info_pdata = pickle.dumps(course_info, pickle.HIGHEST_PROTOCOL)
 
         conn = sqlite3.connect('db/course_db_example.db')
         c = conn.cursor()
 
-        c.execute(
-            '''
-            CREATE TABLE IF NOT EXISTS courses_v3
-            (
-                course_id STRING PRIMARY KEY,
-                course_info BLOB,
-                coruse_info_json TEXT
-            )
-            '''
-        )
-
-        c.execute(
-            '''
-            INSERT OR REPLACE INTO courses_v3(course_id, course_info, coruse_info_json)
-            VALUES (?, ?, ?)
-            ''',
-            (course_id, sqlite3.Binary(course_info_pdata), json.dumps(course_info['json_data'], indent=4))
-        )
+        create_courses_table(c)
+        store_courses(c, [course_row(course_info)])
+        if content_hash is not None:
+            # With the course, so a stored hash always has its course
+            CoursePageChanges.create_table(c)
+            rpts = course_info.get('rpts')
+            if course_info['json_data']['success'] and not (rpts is not None and rpts.timed_out()):
+                CoursePageChanges.store(c, course_id, content_hash, parse_version, time.time())
+            else:
+                # Degraded, not skipped by later crawls
+                CoursePageChanges.forget(c, course_id)
 
         conn.commit()
         conn.close()
 
+        self.count(spider, False, t)
+        return None
+
+    def process_unchanged(self, course_info, spider, t):
+        if self.unchanged is None:
+            self.unchanged = []
+        self.unchanged.append((course_info['course_id'], course_info.get('block_content_html'), time.time()))
+        self.count(spider, True, t)
+        if len(self.unchanged) >= self.unchanged_batch_size:
+            self.flush_unchanged(spider)
         return None
 
+    def flush_unchanged(self, spider):
+        # One transaction for many unchanged pages, not one each
+        if not self.unchanged:
+            return
+        t = time.perf_counter()
+        conn = sqlite3.connect('db/course_db_example.db')
+        c = conn.cursor()
+        for course_id, block_content_html, seen in self.unchanged:
+            CoursePageChanges.touch(c, course_id, seen)
+            if self.html_archive is not None and block_content_html is not None:
+                self.html_archive.put(course_id, block_content_html, seen=seen, commit=False)
+        conn.commit()
+        conn.close()
+        if self.html_archive is not None:
+            self.html_archive.commit()
+        self.unchanged = []
+        self.count(spider, True, t)
+
+    def count(self, spider, skipped, t):
+        # Adds the time of this step to the page it was counted for by the spider
+        page_changes = getattr(spider, 'page_changes', None)
+        if page_changes is not None:
+            page_changes.count(skipped, time.perf_counter() - t, pages=0)
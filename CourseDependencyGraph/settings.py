@@ -21,6 +21,39 @@ NEWSPIDER_MODULE = 'CourseDependencyGraph.spiders'
 # Obey robots.txt rules
 ROBOTSTXT_OBEY = True
 
+# SQLite file for parsed requisite trees, shared by courses with the same
+# requisite text and reused across crawls (None disables the cache)
+REQUISITE_PARSE_CACHE = 'db/requisite_parse_cache.db'
+
+# Database of earlier crawls whose course codes give the known subjects the
+# parser validates subjects against (None parses without a subject index)
+REQUISITE_SUBJECT_INDEX = 'db/course_db_example.db'
+
+# Store the raw requisite sections and parse each one when it is first
+# used (e.g. by json_generator) rather than during the crawl. The stored
+# json_data then has no requisites_dict_processed.
+REQUISITE_LAZY_PARSING = False
+
+# How the spider reads a course page: 'soup' (BeautifulSoup tree) or 'lxml'
+# (BlockContentExtractor, the same results in one streaming pass)
+REQUISITE_HTML_BACKEND = 'lxml'
+
+# Profile the requisite parser over the crawl (RequisiteParseProfiler) and
+# write the report to this file when the spider closes ('' prints it, None
+# does not profile)
+REQUISITE_PROFILE = None
+
+# SQLite file the pipeline archives the td.block_content HTML of every page
+# to (zlib-compressed), for reextract.py to extract and parse again without
+# a crawl (None does not archive)
+REQUISITE_HTML_ARCHIVE = 'db/course_html_archive.db'
+
+# Database of earlier crawls (the pipeline's) holding the hash of every
+# stored page: pages whose hash and parse settings are unchanged are not
+# extracted, parsed or stored again, only their last_seen time is updated
+# (None extracts every page)
+REQUISITE_SKIP_UNCHANGED = 'db/course_db_example.db'
+
 # Configure maximum concurrent requests performed by Scrapy (default: 16)
 #CONCURRENT_REQUESTS = 32
 
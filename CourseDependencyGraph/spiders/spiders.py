@@ -2,6 +2,11 @@ import scrapy
 import sqlite3
 import html2text
 from CourseDependencyGraph.parsers.Parsers import RequisitesHTMLParser
+from CourseDependencyGraph.parsers.parse_cache import RequisiteParseCache
+from CourseDependencyGraph.parsers.requisite_subjects import SubjectIndex
+from CourseDependencyGraph.parsers.parse_profile import RequisiteParseProfiler
+from CourseDependencyGraph.parsers.parse_cache import parser_rules_version
+from CourseDependencyGraph.parsers.parse_page_changes import CoursePageChanges, extract_course_page
 
 
 class AcademicCalenderSpider(scrapy.Spider):
@@ -13,6 +18,10 @@ class AcademicCalenderSpider(scrapy.Spider):
         'Co-requisite(s):',
         'Cross-list(s):'
     }
+    parse_cache = None
+    subject_index = None
+    profiler = None
+    page_changes = None
 
     def start_requests(self):
         # https://academiccalendars.romcmaster.ca/preview_course_nopop.php?catoid=32&coid=177126
@@ -53,14 +62,63 @@ class AcademicCalenderSpider(scrapy.Spider):
         for url in urls:
             yield scrapy.Request(url=url, callback=self.parse)
 
-    def parse(self, response):
+    def get_parse_cache(self):
+        cache_path = self.settings.get('REQUISITE_PARSE_CACHE')
+        if cache_path is None:
+            return None
+        if self.parse_cache is None:
+            self.parse_cache = RequisiteParseCache(cache_path)
+        return self.parse_cache
 
-        course_id = response.url.split('=')[-1]
-        
-        block_content_html = response.css('td.block_content').extract_first()
-        acp = RequisitesHTMLParser(block_content_html, course_id)
-        course_info = acp.extract_info()
-        course_info['course_id'] = course_id
+    def get_subject_index(self):
+        # Built once, from the courses stored by earlier crawls, so every
+        # course of this crawl is parsed against the same subjects
+        db_path = self.settings.get('REQUISITE_SUBJECT_INDEX')
+        if db_path is None:
+            return None
+        if self.subject_index is None:
+            self.subject_index = SubjectIndex.from_db(db_path)
+            print('Subject index:', self.subject_index)
+        return self.subject_index
+
+    def get_page_changes(self):
+        # Hashes of the pages stored by earlier crawls, loaded once
+        db_path = self.settings.get('REQUISITE_SKIP_UNCHANGED')
+        if db_path is None:
+            return None
+        if self.page_changes is None:
+            version = CoursePageChanges.parse_version(parser_rules_version(),
+                                                      self.settings.getbool('REQUISITE_LAZY_PARSING', False),
+                                                      self.get_subject_index())
+            self.page_changes = CoursePageChanges.from_db(db_path, version)
+            print('Course page hashes:', self.page_changes)
+        return self.page_changes
 
-        return course_info
+    def start_profiler(self):
+        # Profiles every requisite parsed until the spider closes
+        if self.settings.get('REQUISITE_PROFILE') is None:
+            return
+        if self.profiler is None:
+            self.profiler = RequisiteParseProfiler()
+            self.profiler.enable()
 
+    def closed(self, reason):
+        if self.parse_cache is not None:
+            self.parse_cache.close()
+        if self.profiler is not None:
+            self.profiler.disable()
+            self.profiler.dump(self.settings.get('REQUISITE_PROFILE') or None)
+        if self.page_changes is not None:
+            print(self.page_changes.report())
+
+    def parse(self, response):
+        course_id = response.url.split('=')[-1]
+        
+        self.start_profiler()
+        return extract_course_page(response, course_id, self.get_page_changes(),
+                                   keep_html=self.settings.get('REQUISITE_HTML_ARCHIVE') is not None,
+                                   parse_cache=self.get_parse_cache(),
+                                   subject_index=self.get_subject_index(),
+                                   lazy=self.settings.getbool('REQUISITE_LAZY_PARSING', False),
+                                   html_backend=self.settings.get('REQUISITE_HTML_BACKEND',
+                                                                  RequisitesHTMLParser.html_backend))
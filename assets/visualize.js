@@ -104,6 +104,14 @@ window.onload = function visualize(){
     }
 
     function create_branch(branch, parent_id){
+        // Branches shared between courses are stored once in master_branch_table
+        // and referred to by index; the index then identifies the branch.
+        let branch_key;
+        if (typeof branch === 'number') {
+            branch_key = 'b' + branch.toString();
+            branch = master_branch_table[branch];
+        }
+
         if (typeof branch === 'object') {
             let node_id = ++node_counter;
             let node_type = branch[sc_type];
@@ -122,14 +130,18 @@ window.onload = function visualize(){
                 //    leave here just as a safety measure.
             }
 
-            let node_name_hash = node_name.includes('AND') ? 'AND' : 'OR';
-            let courses_hash = typeof branch[sc_courses] === 'undefined' ? '{1}' : branch[sc_courses];
-            let subbranches_hash = typeof branch[sc_subbranches] === 'undefined' ? '{2}' : branch[sc_subbranches];
-            let branch_hash = new LogicalBranch(node_name_hash, courses_hash, subbranches_hash);
-            // console.log(branch_hash.toString(true));
+            if (typeof branch_key === 'undefined') {
+                // graph.js without a branch table: hash the branch contents
+                let node_name_hash = node_name.includes('AND') ? 'AND' : 'OR';
+                let courses_hash = typeof branch[sc_courses] === 'undefined' ? '{1}' : branch[sc_courses];
+                let subbranches_hash = typeof branch[sc_subbranches] === 'undefined' ? '{2}' : branch[sc_subbranches];
+                let branch_hash = new LogicalBranch(node_name_hash, courses_hash, subbranches_hash);
+                // console.log(branch_hash.toString(true));
+                branch_key = branch_hash.toString(d_hash_subbranch);
+            }
 
-            if (!(branch_hash.toString(d_hash_subbranch) in branch_table)) {
-                branch_table[branch_hash.toString(d_hash_subbranch)] = node_id;
+            if (!(branch_key in branch_table)) {
+                branch_table[branch_key] = node_id;
                 node_list.push({id: node_id, label: node_name, color: node_color});
 
                 edge_hash = new Edge(parent_id, node_id);
@@ -142,7 +154,7 @@ window.onload = function visualize(){
                 }
                 
             } else {
-                node_id = branch_table[branch_hash.toString(d_hash_subbranch)];
+                node_id = branch_table[branch_key];
 
                 edge_hash = new Edge(parent_id, node_id);
                 if (!(edge_hash.toString() in edge_table)) {
@@ -0,0 +1,173 @@
+"""
+course_codes (requisite_course_code.py) against the split-based
+heuristics it replaced, copied below as legacy_*.
+
+Every string the parser asks about while parsing the reference corpus is
+recorded, the answers of both are compared on those and on random
+strings, and the time to answer all of the recorded queries is reported
+for the legacy code, a cold recognizer and a warm one.
+
+    python -m benchmarks.bench_course_code
+"""
+import io
+import time
+import random
+import contextlib
+from collections import defaultdict
+
+from CourseDependencyGraph.parsers import requisite_course_code
+from CourseDependencyGraph.parsers.requisite_course_code import CourseCodeRecognizer
+from CourseDependencyGraph.parsers.requisite_patterns import requisite_patterns
+from CourseDependencyGraph.parsers.requisite_parser import RequisiteParseTree
+
+
+def legacy_likely_is_course(requisite):
+    requisite_cleaned = requisite_patterns['brackets'].sub('', requisite).strip()
+    requisites_split = requisite_cleaned.split(' ')
+    if len(requisites_split) > 3:
+        return False
+    if len(requisites_split) == 1:
+        return requisites_split[0][0].isdigit()
+    elif len(requisites_split) > 1:
+        return requisites_split[1][0].isdigit() or (requisites_split[0][0].isdigit() and requisites_split[1].strip() == 'A/B')
+    else:
+        return False
+
+
+def legacy_does_not_contain_courses(requisite):
+    for requisite in requisite.split(' '):
+        requisite = requisite.replace('.', '')
+        requisite = requisite.replace(',', '')
+        requisite = requisite.replace(')', '')
+        requisite = requisite.replace('(', '')
+        requisite = requisite.replace(';', '')
+        if len(requisite) <= 3:
+            continue
+        if len(requisite) == 4:
+            if requisite[0].isdigit() and requisite[3].isdigit() and requisite[1].isupper():
+                return False
+        if len(requisite) == 5:
+            if requisite[0].isdigit() and requisite[3].isdigit() and requisite[4].isdigit() and requisite[1].isupper():
+                return False
+    return True
+
+
+def legacy_has_subject(course):
+    course_info = course.split(' ')
+    if len(course_info) == 1:
+        return False
+    if course_info[0][0] in '0123456789':
+        return False
+    return True
+
+
+def legacy_has_course_code(course):
+    course_info = course.split(' ')
+    if len(course_info) == 1:
+        return course_info[0][0] in '0123456789'
+    else:
+        return course_info[0][0] in '0123456789' or course_info[1][0] in '0123456789'
+
+
+def answers(recognizer):
+    return {
+        'likely_is_course': recognizer.is_course,
+        'does_not_contain_courses': lambda requisite: not recognizer.contains_course_code(requisite),
+        'has_subject': recognizer.has_subject,
+        'has_course_code': recognizer.has_course_code,
+    }
+
+
+legacy_answers = {
+    'likely_is_course': legacy_likely_is_course,
+    'does_not_contain_courses': legacy_does_not_contain_courses,
+    'has_subject': legacy_has_subject,
+    'has_course_code': legacy_has_course_code,
+}
+
+
+def legacy_answer(name, text):
+    try:
+        return legacy_answers[name](text)
+    except IndexError:
+        return IndexError
+
+
+def record_queries(corpus):
+    """
+    Parses the corpus and records every (query, string) the parser makes.
+    """
+    queries = []
+    recognizer = requisite_course_code.course_codes
+    original = {name: getattr(recognizer, name) for name in ('is_course', 'contains_course_code', 'has_subject')}
+
+    def recording(name, query):
+        def record(text):
+            queries.append((name, text))
+            return original[query](text)
+        return record
+
+    recognizer.is_course = recording('likely_is_course', 'is_course')
+    recognizer.contains_course_code = recording('does_not_contain_courses', 'contains_course_code')
+    recognizer.has_subject = recording('has_subject', 'has_subject')
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            for requisites in corpus:
+                try:
+                    RequisiteParseTree(requisites).process()
+                except Exception:
+                    pass
+    finally:
+        for name in original:
+            delattr(recognizer, name)
+    return queries
+
+
+def random_strings(samples, seed=0):
+    rng = random.Random(seed)
+    pieces = ['MATH', '1A03', '2MM3', 'A/B', 'S', ' ', ' ', '  ', '(or 1B03)', '.', ',', ';', '(', ')',
+              '1', 'a', 'Z', '3W04', 'ISCI', 'one of', '²', '1ZZZ', '12345', 'É']
+    return [''.join(rng.choice(pieces) for _ in range(rng.randint(0, 6))) for _ in range(samples)]
+
+
+if __name__ == '__main__':
+    with open('samples/requisites_corpus.txt', 'r') as f:
+        corpus = [line.rstrip('\n') for line in f if line.strip()]
+    queries = record_queries(corpus)
+    by_name = defaultdict(set)
+    for name, text in queries:
+        by_name[name].add(text)
+    print('%d queries, %d distinct: %s' % (len(queries), len(set(queries)),
+                                           ', '.join('%s %d' % (name, len(texts)) for name, texts in sorted(by_name.items()))))
+
+    recognizer = CourseCodeRecognizer()
+    differences = defaultdict(list)
+    for text in random_strings(50000) + [text for _, text in queries]:
+        for name, answer in answers(recognizer).items():
+            expected = legacy_answer(name, text)
+            if answer(text) != expected:
+                differences[name].append((text, expected))
+    for name, cases in sorted(differences.items()):
+        # Only strings the legacy code could not answer, or with digits that
+        # are not decimal digits, may differ
+        assert all(expected is IndexError or any(c.isdigit() and not c.isdecimal() for c in text)
+                   for text, expected in cases), (name, cases[:5])
+        print('%-26s differs on %d strings (IndexError or non-decimal digits before), e.g. %r'
+              % (name, len(cases), cases[0][0]))
+
+    legacy = [(legacy_answers[name], text) for name, text in queries]
+    t = time.perf_counter()
+    for function, text in legacy:
+        try:
+            function(text)
+        except IndexError:
+            pass
+    legacy_ms = (time.perf_counter() - t) * 1e3
+
+    recognizer = CourseCodeRecognizer()
+    for repeat in ('cold', 'warm'):
+        current = [(answers(recognizer)[name], text) for name, text in queries]
+        t = time.perf_counter()
+        for function, text in current:
+            function(text)
+        print('%s recognizer: %.2f ms (legacy heuristics %.2f ms)' % (repeat, (time.perf_counter() - t) * 1e3, legacy_ms))
@@ -0,0 +1,153 @@
+"""
+RequisiteParseNode.flatten on random, corpus and generated deep trees.
+
+Checks flatten against a direct recursive statement of the normalization
+(collapsing, note pruning, AND/OR merging, duplicate removal) on random
+trees, reports how many nodes it leaves in the corpus trees, then
+flattens nested AND/OR chains far deeper than the recursion limit.
+
+    python -m benchmarks.bench_flatten
+"""
+import io
+import sys
+import copy
+import time
+import random
+import contextlib
+
+from CourseDependencyGraph.parsers.requisite_parser import (
+    RequisiteParseTree, RequisiteParseNode, RequisiteParseNodeAND, RequisiteParseNodeOR,
+    RequisiteParseNodeCourse, RequisiteParseNodeNote, RequisiteParseNodeUNKNOWN
+)
+from benchmarks.common import load_corpus
+
+
+def count_nodes(node):
+    count = 0
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        count += 1
+        stack.extend(node.children)
+    return count
+
+
+def reference_flatten(node):
+    if node.has_single_child():
+        return reference_flatten(node.children[0])
+    if isinstance(node, RequisiteParseNodeNote):
+        return node, False
+    if not isinstance(node, (RequisiteParseNodeOR, RequisiteParseNodeAND, RequisiteParseNodeUNKNOWN)):
+        return node, True
+    if not node.children:
+        return node, False
+
+    children = []
+    for child in node.children:
+        deepest_child, has_useful_info = reference_flatten(child)
+        if not has_useful_info:
+            continue
+        merged = deepest_child.children if RequisiteParseNode.can_merge(node, deepest_child) else [deepest_child]
+        for child in merged:
+            if structure(child) not in [structure(kept) for kept in children]:
+                children.append(child)
+    node.children = children
+    if len(children) == 1:
+        return children[0], True
+    return node, bool(children)
+
+
+def structure(node):
+    if isinstance(node, RequisiteParseNodeCourse):
+        return ('Course', node.corequisite, node.recommended, node.course)
+    if not isinstance(node, (RequisiteParseNodeOR, RequisiteParseNodeAND, RequisiteParseNodeUNKNOWN)):
+        return (type(node).__name__, id(node))
+    return (type(node).__name__, node.corequisite, node.recommended, tuple(structure(child) for child in node.children))
+
+
+def shape(node):
+    return (type(node).__name__, node.corequisite, node.recommended, getattr(node, 'course', None),
+            tuple(shape(child) for child in node.children))
+
+
+def random_tree(rng, depth=0):
+    roll = rng.random()
+    if depth > 4 or roll < 0.3:
+        return RequisiteParseNodeCourse('MATH %d' % rng.randint(0, 4))
+    if roll < 0.38:
+        return RequisiteParseNodeNote('note')
+    node = rng.choice([RequisiteParseNodeOR, RequisiteParseNodeOR, RequisiteParseNodeAND, RequisiteParseNodeAND,
+                       RequisiteParseNodeUNKNOWN, RequisiteParseNode])()
+    node.corequisite = rng.random() < 0.1
+    node.recommended = rng.random() < 0.1
+    node.extend(random_tree(rng, depth + 1) for _ in range(rng.choice([0, 1, 1, 2, 3, 4])))
+    return node
+
+
+def check_random_trees(samples=20000, seed=0):
+    rng = random.Random(seed)
+    for _ in range(samples):
+        root = random_tree(rng)
+        expected, _ = reference_flatten(copy.deepcopy(root))
+        if isinstance(expected, RequisiteParseNodeNote):
+            expected = RequisiteParseNode()
+        flattened = copy.deepcopy(root).flatten()
+        assert shape(flattened) == shape(expected), root
+
+
+def nested_chain(depth):
+    """
+    AND[MATH 1, OR[MATH 2, AND[MATH 3, OR[...]]]] with a note at each level:
+    nothing merges, so flatten has to walk the whole depth.
+    """
+    root = node = RequisiteParseNodeAND()
+    for level in range(depth):
+        child = RequisiteParseNodeOR() if isinstance(node, RequisiteParseNodeAND) else RequisiteParseNodeAND()
+        node.extend([RequisiteParseNodeCourse('MATH %d' % level), RequisiteParseNodeNote('note'), child])
+        node = child
+    node.extend([RequisiteParseNodeCourse('MATH A'), RequisiteParseNodeCourse('MATH B')])
+    return root
+
+
+def nested_same_type(depth):
+    """
+    AND[MATH 1, AND[MATH 2, AND[...]]], which merges into a single AND.
+    """
+    root = node = RequisiteParseNodeAND()
+    for level in range(depth):
+        child = RequisiteParseNodeAND()
+        node.extend([RequisiteParseNodeCourse('MATH %d' % level), child])
+        node = child
+    node.extend([RequisiteParseNodeCourse('MATH A'), RequisiteParseNodeCourse('MATH A')])
+    return root
+
+
+if __name__ == '__main__':
+    check_random_trees()
+    print('matches the recursive normalization on random trees')
+
+    before = after = 0
+    t = 0
+    with contextlib.redirect_stdout(io.StringIO()):
+        for requisites in load_corpus():
+            rpt = RequisiteParseTree(requisites)
+            try:
+                rpt.root = rpt.preprocess(requisites)
+            except Exception:
+                continue
+            rpt.infer_subjects()
+            before += count_nodes(rpt.root)
+            start = time.perf_counter()
+            rpt.flatten()
+            t += time.perf_counter() - start
+            after += count_nodes(rpt.root)
+    print('corpus nodes: %d -> %d, flatten %.2f ms total' % (before, after, t * 1e3))
+
+    depth = sys.getrecursionlimit() * 20
+    for build, expected in ((nested_chain, 2 * depth + 3), (nested_same_type, depth + 2)):
+        root = build(depth)
+        start = time.perf_counter()
+        root = root.flatten()
+        seconds = time.perf_counter() - start
+        assert count_nodes(root) == expected, (build.__name__, count_nodes(root))
+        print('%-18s depth %d: %d nodes after flatten, %.3f s' % (build.__name__, depth, count_nodes(root), seconds))
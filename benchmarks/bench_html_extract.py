@@ -0,0 +1,64 @@
+"""
+RequisitesHTMLParser.extract_info with the BeautifulSoup ('soup') and
+streaming lxml ('lxml') HTML backends.
+
+Course pages are generated in the layout of the calendar's
+td.block_content (title, description, <em> notes, <br>-separated
+requisite sections with the reference corpus as prerequisites, links,
+a nested table). Random tag soup is generated as well: entities,
+comments, <pre>, <script>, <template>, unclosed and stray tags, nested
+<em>s, titles inside <em>s, several blocks. Both backends must give the
+same json_data, or raise the same exception, for every page. Then the
+CPU time per page of each backend is compared.
+
+    python -m benchmarks.bench_html_extract
+"""
+import io
+import time
+import random
+import contextlib
+
+from CourseDependencyGraph.parsers.Parsers import RequisitesHTMLParser
+from benchmarks.common import load_corpus, course_page, tag_soup
+
+def extract(html, backend):
+    parser = RequisitesHTMLParser(html, 0, lazy=True, html_backend=backend)
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            course_info = parser.extract_info()
+    except Exception as e:
+        return type(e).__name__
+    return course_info['json_data']
+
+
+def cpu_per_page(pages, backend, repeat=3):
+    best = None
+    for _ in range(repeat):
+        t = time.process_time()
+        for html in pages:
+            RequisitesHTMLParser(html, 0, html_backend=backend).extract_block()
+        seconds = time.process_time() - t
+        best = seconds if best is None else min(best, seconds)
+    return best / len(pages)
+
+
+if __name__ == '__main__':
+    rng = random.Random(0)
+    corpus = load_corpus()
+    pages = [course_page(i, corpus[i % len(corpus)], rng) for i in range(len(corpus) * 4)]
+    pieces = [piece for requisites in corpus for piece in requisites.split(' ')]
+    soups = [tag_soup(rng, pieces) for _ in range(5000)]
+
+    for html in pages + soups:
+        expected = extract(html, 'soup')
+        assert extract(html, 'lxml') == expected, html
+    found = sum(1 for html in pages if extract(html, 'soup')['requisites_dict_raw'])
+    print('same json_data for %d course pages (%d with requisites) and %d random pages'
+          % (len(pages), found, len(soups)))
+
+    print('%-8s %16s' % ('backend', 'CPU us / page'))
+    results = {}
+    for backend in RequisitesHTMLParser.html_backends:
+        results[backend] = cpu_per_page(pages, backend)
+        print('%-8s %16.0f' % (backend, results[backend] * 1e6))
+    print('lxml backend: %.1fx less CPU per page' % (results['soup'] / results['lxml']))
@@ -0,0 +1,84 @@
+"""
+LazyRequisiteTrees (course_info['rpts']) for catalog-sized crawls.
+
+Courses are made of reference-corpus requisites as their prerequisite,
+antirequisite, co-requisite and cross-list sections. For each course,
+the crawl side (build and pickle course_info['rpts'] as the pipeline
+does) and the json_generator side (unpickle and use prerequisites) are
+timed, parsing every section during the crawl as before and lazily.
+Both must give the same prerequisite trees. The subject index must not
+be pickled with the sections, and attach() must give it back.
+
+    python -m benchmarks.bench_lazy_sections
+"""
+import io
+import time
+import pickle
+import contextlib
+
+from CourseDependencyGraph.parsers.requisite_parser import RequisiteParseTree
+from CourseDependencyGraph.parsers.parse_lazy import LazyRequisiteTrees
+from CourseDependencyGraph.parsers.requisite_subjects import SubjectIndex
+from benchmarks.common import load_graph_js, load_corpus
+
+sections = ('Prerequisite(s):', 'Antirequisite(s):', 'Co-requisite(s):', 'Cross-list(s):')
+
+
+def courses(corpus, count):
+    return [('COURSE %d' % i, {section: corpus[(i * len(sections) + j) % len(corpus)] for j, section in enumerate(sections)})
+            for i in range(count)]
+
+
+def parses(requisites):
+    try:
+        RequisiteParseTree(requisites).process()
+        return True
+    except Exception:
+        return False
+
+
+def crawl(catalog, lazy):
+    rows = []
+    for course_code, requisites_dict_raw in catalog:
+        rpts = LazyRequisiteTrees(requisites_dict_raw, RequisiteParseTree, course_code=course_code)
+        if not lazy:
+            rpts.processed()
+        rows.append(pickle.dumps({'rpts': rpts}, pickle.HIGHEST_PROTOCOL))
+    return rows
+
+
+def generate(rows):
+    return [str(pickle.loads(row)['rpts']['Prerequisite(s):'].root) for row in rows]
+
+
+if __name__ == '__main__':
+    with contextlib.redirect_stdout(io.StringIO()):
+        corpus = [requisites for requisites in load_corpus() if parses(requisites)]
+    catalog = courses(corpus, 2500)
+
+    results = {}
+    print('%-8s %12s %14s %14s' % ('', 'crawl (s)', 'generate (s)', 'stored (KB)'))
+    for lazy in (False, True):
+        with contextlib.redirect_stdout(io.StringIO()):
+            t = time.perf_counter()
+            rows = crawl(catalog, lazy)
+            crawl_seconds = time.perf_counter() - t
+            t = time.perf_counter()
+            results[lazy] = generate(rows)
+            generate_seconds = time.perf_counter() - t
+        print('%-8s %12.2f %14.2f %14.0f' % ('lazy' if lazy else 'eager', crawl_seconds, generate_seconds,
+                                             sum(len(row) for row in rows) / 1024))
+    assert results[True] == results[False]
+    print('same prerequisite trees')
+
+    subject_index = SubjectIndex.from_course_codes(load_graph_js())
+    course_code, requisites_dict_raw = catalog[0]
+    rpts = LazyRequisiteTrees(requisites_dict_raw, RequisiteParseTree, course_code=course_code)
+    indexed = LazyRequisiteTrees(requisites_dict_raw, RequisiteParseTree, course_code=course_code,
+                                 subject_index=subject_index)
+    row = pickle.dumps(indexed, pickle.HIGHEST_PROTOCOL)
+    assert len(row) == len(pickle.dumps(rpts, pickle.HIGHEST_PROTOCOL))
+    restored = pickle.loads(row)
+    assert restored.subject_index is None
+    assert restored.attach(subject_index).subject_index is subject_index
+    print('%r not pickled with the sections (%d bytes a row)' % (subject_index, len(row)))
@@ -0,0 +1,84 @@
+"""
+RequisitesHTMLParser.clean_text and split_on_requisites with
+RequisiteTextNormalizer, against the code they replace (split/join and
+four replace passes; every '[br]' segment stripped and compared to every
+prefix by slicing).
+
+Block texts are those of the generated course pages (common.course_page),
+and random strings of prefixes, separators, quotes
+and whitespace. Both must give the same clean text and the same
+sections, in the same order. Then the time per block of each is
+compared.
+
+    python -m benchmarks.bench_normalize
+"""
+import time
+import random
+
+from CourseDependencyGraph.parsers.Parsers import RequisitesHTMLParser
+from benchmarks.common import load_corpus, course_page
+
+
+def clean_text_before(text):
+    if len(text) <= 1:
+        return ''
+    text = ' '.join(text.split())
+    text = text.replace('\n', ' ')
+    text = text.replace('\xa0', '')
+    text = text.replace('\t', ' ')
+    text = text.replace('"', '')
+    return text.strip(' ')
+
+
+def split_on_requisites_before(text):
+    requisites_dict_raw = {}
+    for potential_requisite in text.split('[br]'):
+        potential_requisite = potential_requisite.strip()
+        for prefix in RequisitesHTMLParser.requisite_prefixes:
+            p = len(prefix)
+            if potential_requisite[:p] == prefix:
+                requisites_dict_raw[prefix] = potential_requisite[p:]
+    return requisites_dict_raw
+
+
+def random_text(rng):
+    pieces = list(RequisitesHTMLParser.requisite_prefixes) + [
+        '[br]', '[br', 'br]', ' ', '  ', '\n', '\t', '\xa0', '\r', '\x85', '"', 'x"y', 'MATH 1A03', 'Prerequisite(s)',
+    ]
+    return ''.join(rng.choice(pieces) for _ in range(rng.randint(0, 16)))
+
+
+def time_per_block(blocks, variants, repeat=20):
+    # Variants alternate, so they see the same load on the machine
+    best = [None] * len(variants)
+    for _ in range(repeat):
+        for i, (clean, split) in enumerate(variants):
+            t = time.process_time()
+            for block in blocks:
+                split(clean(block))
+            seconds = time.process_time() - t
+            best[i] = seconds if best[i] is None else min(best[i], seconds)
+    return [seconds / len(blocks) for seconds in best]
+
+
+if __name__ == '__main__':
+    rng = random.Random(0)
+    corpus = load_corpus()
+    blocks = [RequisitesHTMLParser(course_page(i, corpus[i % len(corpus)], rng), 0, html_backend='lxml').extract_block()[2]
+              for i in range(len(corpus) * 4)]
+    parser = RequisitesHTMLParser(None, 0)
+
+    texts = blocks + [random_text(rng) for _ in range(100000)]
+    for text in texts:
+        clean = parser.clean_text(text)
+        assert clean == clean_text_before(text), repr(text)
+        for t in (text, clean):
+            assert list(parser.split_on_requisites(t).items()) == list(split_on_requisites_before(t).items()), repr(t)
+    print('same clean text and sections for %d course blocks and %d random texts' % (len(blocks), len(texts) - len(blocks)))
+
+    before, after = time_per_block(blocks, [(clean_text_before, split_on_requisites_before),
+                                            (parser.clean_text, parser.split_on_requisites)])
+    print('%-12s %12s' % ('', 'us / block'))
+    print('%-12s %12.2f' % ('before', before * 1e6))
+    print('%-12s %12.2f' % ('normalizer', after * 1e6))
+    print('normalizer: %.1fx faster' % (before / after))
@@ -0,0 +1,155 @@
+"""
+Skipping unchanged course pages (CoursePageChanges) over repeated crawls.
+
+scrapy is not needed: each page, parsed by a parsel Selector as scrapy
+parses a response, goes through extract_course_page as in
+AcademicCalenderSpider.parse (with the parser's default options), and
+its items through the real CoursedependencygraphPipeline, writing to db/
+of a temporary directory. Pages are the generated course pages of
+common.course_page inside a full calendar page (common.page_template),
+one per course.
+
+- crawl 1: no hashes yet, every page is extracted and stored
+- crawl 2: a tenth of the pages changed, only those are extracted
+- crawl 3: the parse version changed, every page is extracted again
+- crawl 4: another tenth of the pages changed and are parsed with no time
+  budget: they time out and are stored without their hash (the pages
+  that fail to parse are left out of this crawl)
+- crawl 5: only the pages that timed out are extracted again
+
+Each crawl prints CoursePageChanges.report(). Every stored course must
+have the json_data of its latest page, and skipped courses must only
+have their last_seen time updated.
+
+    python -m benchmarks.bench_page_changes
+"""
+import io
+import os
+import json
+import time
+import random
+import sqlite3
+import tempfile
+import contextlib
+
+from parsel import Selector
+
+from CourseDependencyGraph.pipelines import CoursedependencygraphPipeline
+from CourseDependencyGraph.parsers.requisite_parser import RequisiteParseTree
+from CourseDependencyGraph.parsers.parse_html_archive import CourseHTMLArchive
+from CourseDependencyGraph.parsers.parse_page_changes import CoursePageChanges, extract_course_page
+from benchmarks.common import load_corpus, course_page, page_template
+
+
+class Spider():
+    settings = {'REQUISITE_HTML_ARCHIVE': 'db/course_html_archive.db'}
+
+    def __init__(self, version):
+        self.page_changes = CoursePageChanges.from_db('db/course_db_example.db', version)
+
+    def parse(self, course_id, page):
+        return extract_course_page(Selector(text=page), course_id, self.page_changes, keep_html=True)
+
+
+def crawl(pages, version):
+    spider = Spider(version)
+    pipeline = CoursedependencygraphPipeline()
+    pipeline.open_spider(spider)
+    t = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        for course_id, page in pages.items():
+            try:
+                item = spider.parse(course_id, page)
+            except Exception:
+                continue
+            pipeline.process_item(item, spider)
+    seconds = time.perf_counter() - t
+    pipeline.close_spider(spider)
+    return spider.page_changes, seconds
+
+
+def stored():
+    conn = sqlite3.connect('db/course_db_example.db')
+    courses = {str(course_id): json.loads(course_info_json)
+               for course_id, course_info_json in conn.execute('''SELECT course_id, coruse_info_json FROM courses_v3''')}
+    last_seen = dict(conn.execute('''SELECT course_id, last_seen FROM course_page_hashes'''))
+    conn.close()
+    return courses, last_seen
+
+
+def timed_out(courses):
+    return {course_id for course_id, json_data in courses.items()
+            if json_data['error_msg'].startswith('parse time budget exceeded')}
+
+
+if __name__ == '__main__':
+    rng = random.Random(0)
+    corpus = load_corpus()
+    pages = {str(170000 + i): page_template % course_page(i, corpus[i % len(corpus)], rng)
+             for i in range(len(corpus) * 5)}
+
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as directory:
+        os.chdir(directory)
+        try:
+            os.makedirs('db')
+            os.makedirs('samples/json')
+
+            page_changes, seconds = crawl(pages, 'v1')
+            assert page_changes.skipped == 0
+            extracted = page_changes.extracted
+            courses, first_seen = stored()
+            assert len(courses) == extracted == len(first_seen)
+            print('crawl 1 (%.2f s):\n%s' % (seconds, page_changes.report()))
+
+            revised = changed = [course_id for course_id in pages if course_id in courses][::10]
+            for course_id in changed:
+                pages[course_id] = pages[course_id].replace('Course &amp; Topics', 'Course &amp; Topics (revised)')
+            page_changes, seconds = crawl(pages, 'v1')
+            assert page_changes.extracted == len(changed), page_changes.report()
+            assert page_changes.skipped == extracted - len(changed)
+            courses, last_seen = stored()
+            for course_id in courses:
+                assert last_seen[course_id] > first_seen[course_id]
+                assert (course_id in changed) == ('(revised)' in courses[course_id]['course_name'])
+            print('crawl 2 (%.2f s):\n%s' % (seconds, page_changes.report()))
+
+            page_changes, seconds = crawl(pages, 'v2')
+            assert page_changes.extracted == extracted and page_changes.skipped == 0
+            print('crawl 3, new parse version (%.2f s):\n%s' % (seconds, page_changes.report()))
+
+            changed = [course_id for course_id in pages if course_id in courses][5::10]
+            for course_id in changed:
+                pages[course_id] = pages[course_id].replace('Course &amp; Topics', 'Course &amp; Topics (moved)')
+            time_budget = RequisiteParseTree.time_budget
+            RequisiteParseTree.time_budget = 0.0
+            try:
+                # Without the pages that fail to parse: with no time they would time out instead
+                page_changes, seconds = crawl({course_id: page for course_id, page in pages.items()
+                                               if course_id in courses}, 'v2')
+            finally:
+                RequisiteParseTree.time_budget = time_budget
+            assert page_changes.extracted == len(changed), page_changes.report()
+            courses, last_seen = stored()
+            degraded = timed_out(courses)
+            assert degraded and degraded <= set(changed)
+            # Stored, but without a hash, so not skipped by the next crawl
+            assert not degraded & set(last_seen)
+            assert all(not courses[course_id]['success'] for course_id in degraded)
+            print('crawl 4, out of parse time (%.2f s): %d pages timed out\n%s'
+                  % (seconds, len(degraded), page_changes.report()))
+
+            page_changes, seconds = crawl(pages, 'v2')
+            assert page_changes.extracted == len(degraded), page_changes.report()
+            assert page_changes.skipped == extracted - len(degraded)
+            courses, last_seen = stored()
+            assert not timed_out(courses) and len(last_seen) == extracted
+            assert all(courses[course_id]['success'] for course_id in degraded)
+            print('crawl 5, timed out pages again (%.2f s):\n%s' % (seconds, page_changes.report()))
+
+            archive = CourseHTMLArchive('db/course_html_archive.db')
+            courses_archived, versions, _, _ = archive.stats()
+            archive.close()
+            assert courses_archived == extracted and versions == extracted + len(revised) + len(changed)
+        finally:
+            os.chdir(cwd)
@@ -0,0 +1,39 @@
+"""
+parse_many throughput over a catalog-sized batch (the reference corpus
+repeated to ~3,000 requisites) for increasing worker counts. Results are
+checked against one-at-a-time parsing.
+
+    python -m benchmarks.bench_parse_many
+"""
+import io
+import os
+import time
+import contextlib
+
+from CourseDependencyGraph.parsers.parse_batch import parse_many, parse_one
+from CourseDependencyGraph.parsers.requisite_parser import RequisiteParseTree
+from benchmarks.common import load_corpus
+
+
+if __name__ == '__main__':
+    corpus = load_corpus()
+    copies = -(-3000 // len(corpus))
+    items = [('COURSE %d' % i, requisites, 'p') for i, requisites in enumerate(corpus * copies)]
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        expected = [parse_one(RequisiteParseTree, *item) for item in items]
+
+    worker_counts = sorted({1, 2, 4, os.cpu_count() or 1})
+    baseline = None
+    print('%8s %10s %8s %8s' % ('workers', 'seconds', 'speedup', 'failed'))
+    for workers in worker_counts:
+        t = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            results = list(parse_many(items, workers=workers))
+        seconds = time.perf_counter() - t
+        baseline = baseline or seconds
+
+        assert [(r.course_code, r.processed, r.error) for r in results] == \
+               [(r.course_code, r.processed, r.error) for r in expected]
+        failed = sum(1 for r in results if r.error is not None)
+        print('%8d %10.3f %8.2f %8d' % (workers, seconds, baseline / seconds, failed))
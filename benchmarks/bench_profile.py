@@ -0,0 +1,83 @@
+"""
+RequisiteParseProfiler over the reference corpus.
+
+Checks that profiling does not change what is parsed, that disabling it
+puts back the very same methods (so a disabled profiler costs nothing),
+and that parse_many with worker processes adds up to the same counts as
+parsing in this process. Prints the parse time without and with the
+profiler, then the report.
+
+    python -m benchmarks.bench_profile
+"""
+import io
+import time
+import contextlib
+
+from CourseDependencyGraph.parsers.requisite_parser import RequisiteParseTree
+from CourseDependencyGraph.parsers.requisite_rewriter import RequisiteRewriter
+from CourseDependencyGraph.parsers.requisite_patterns import PatternRegistry
+from CourseDependencyGraph.parsers.parse_profile import RequisiteParseProfiler
+from CourseDependencyGraph.parsers.parse_batch import parse_many
+from benchmarks.common import load_corpus
+
+tree_classes = (RequisiteParseTree,)
+
+
+def parse_all(corpus):
+    processed = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        for tree_class in tree_classes:
+            for requisites in corpus:
+                try:
+                    processed.append(tree_class(requisites).process())
+                except Exception as e:
+                    processed.append(type(e).__name__)
+    return processed
+
+
+def best_of(function, repeat=5):
+    best = None
+    for _ in range(repeat):
+        t = time.perf_counter()
+        function()
+        seconds = time.perf_counter() - t
+        best = seconds if best is None else min(best, seconds)
+    return best
+
+
+def methods():
+    return {(klass, name): function for klass in tree_classes + (PatternRegistry,)
+            for name, function in vars(klass).items()}
+
+
+if __name__ == '__main__':
+    corpus = load_corpus()
+    before = methods()
+    expected = parse_all(corpus)
+
+    profiler = RequisiteParseProfiler()
+    with profiler:
+        assert parse_all(corpus) == expected
+    assert methods() == before
+    assert RequisiteParseTree.replace_rewriter.rewrite.__func__ is RequisiteRewriter.rewrite
+    assert profiler.calls[('RequisiteParseTree', 'process')] == len(corpus)
+    assert profiler.pattern_lookups['period'] > 0
+    print('same results with the profiler; methods restored after it')
+
+    items = [('COURSE %d' % i, requisites, 'p') for i, requisites in enumerate(corpus)]
+    single = RequisiteParseProfiler()
+    pooled = RequisiteParseProfiler()
+    with contextlib.redirect_stdout(io.StringIO()):
+        list(parse_many(items, workers=1, chunk_size=8, profiler=single))
+        list(parse_many(items, workers=2, chunk_size=8, profiler=pooled))
+    assert single.calls == pooled.calls and single.rules == pooled.rules and single.lengths == pooled.lengths
+    assert single.pattern_lookups == pooled.pattern_lookups
+    print('parse_many profiles add up the same in this process and in workers')
+
+    disabled = best_of(lambda: parse_all(corpus))
+    with RequisiteParseProfiler():
+        enabled = best_of(lambda: parse_all(corpus))
+    print('%d requisites: %.1f ms without the profiler, %.1f ms with it (%.1fx)'
+          % (len(corpus), disabled * 1e3, enabled * 1e3, enabled / disabled))
+    print()
+    print(profiler.report())
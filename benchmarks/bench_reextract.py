@@ -0,0 +1,82 @@
+"""
+CourseHTMLArchive and reextract.py on a catalog-sized archive: the
+generated course pages of common.course_page (with the reference corpus
+as prerequisites), one per course.
+
+Every page is archived twice (the second time unchanged, so only
+last_seen moves) and a tenth of them once more with a change, which must
+be the version latest() returns. The archive size is printed. Then the
+whole archive is extracted and parsed again into a new courses_v3, with
+1 worker and with all CPUs (at least 2): every course must have the
+json_data the parser gives for its latest page in this process, or fail
+with the same error.
+
+    python -m benchmarks.bench_reextract
+"""
+import io
+import os
+import json
+import random
+import sqlite3
+import tempfile
+import contextlib
+
+from reextract import run
+from CourseDependencyGraph.parsers.Parsers import RequisitesHTMLParser
+from CourseDependencyGraph.parsers.parse_html_archive import CourseHTMLArchive
+from benchmarks.common import load_corpus, course_page
+
+
+def json_data(course_id, html):
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            return RequisitesHTMLParser(html, course_id, html_backend='lxml').extract_info()['json_data']
+    except Exception as e:
+        return '%s: %s' % (type(e).__name__, e)
+
+
+if __name__ == '__main__':
+    rng = random.Random(0)
+    corpus = load_corpus()
+    pages = {str(170000 + i): course_page(i, corpus[i % len(corpus)], rng) for i in range(len(corpus) * 5)}
+
+    with tempfile.TemporaryDirectory() as directory:
+        archive_path = os.path.join(directory, 'archive.db')
+        archive = CourseHTMLArchive(archive_path)
+        for seen in (1.0, 2.0):
+            for course_id, html in pages.items():
+                archive.put(course_id, html, seen=seen)
+        changed = list(pages)[::10]
+        for course_id in changed:
+            pages[course_id] = pages[course_id].replace('Course &amp; Topics', 'Course &amp; Topics (revised)')
+            archive.put(course_id, pages[course_id], seen=3.0)
+        courses, versions, size, stored = archive.stats()
+        assert courses == len(pages) and versions == len(pages) + len(changed)
+        latest = {course_id: html for course_id, _, html in archive.latest()}
+        assert latest == pages
+        course_id = list(pages)[0]
+        assert archive.get(course_id) == pages[course_id]
+        assert archive.get(course_id, CourseHTMLArchive.content_hash(pages[course_id])) == pages[course_id]
+        archive.close()
+        print('archive: %d courses, %d versions, %d KB of HTML in %d KB (%.1fx)'
+              % (courses, versions, size // 1024, stored // 1024, size / stored))
+
+        expected = {course_id: json_data(course_id, html) for course_id, html in pages.items()}
+        failing = {course_id: error for course_id, error in expected.items() if isinstance(error, str)}
+        for workers in sorted({1, max(2, os.cpu_count() or 1)}):
+            db_path = os.path.join(directory, 'courses_%d.db' % workers)
+            written, errors, seconds = run(archive_path, db_path, workers=workers, lazy=False, subject_db=None)
+            # Courses whose requisites do not parse fail as they do in a crawl
+            assert errors == failing, errors
+            conn = sqlite3.connect(db_path)
+            rows = conn.execute('''SELECT course_id, coruse_info_json FROM courses_v3''').fetchall()
+            conn.close()
+            assert written == len(rows) == len(pages) - len(failing)
+            for course_id, course_info_json in rows:
+                # courses_v3.course_id is a STRING column, so numeric affinity
+                course_id = str(course_id)
+                stored_json = json.loads(course_info_json)
+                assert stored_json == json.loads(json.dumps(expected[course_id])), course_id
+                assert 'requisites_dict_processed' in stored_json
+            print('reextract, %2d workers: %d courses written, %d failed, in %.2f s (%.0f courses/s)'
+                  % (workers, written, len(errors), seconds, (written + len(errors)) / seconds))
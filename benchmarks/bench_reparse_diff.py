@@ -0,0 +1,70 @@
+"""
+reparse_diff.py on a courses_v3 database made from the reference corpus
+(each requisite the prerequisites of one course, repeated to catalog
+size, with the course codes of assets/graph.js).
+
+HEAD against the working tree must give no changes. Then the working tree is compared with itself
+parsing against the subjects of the database (only the first courses of
+graph.js, so subjects after them are unknown) and with the first commit
+of the repository, and the timings of every run are printed. diff_graphs
+is checked on a few hand-written graphs first.
+
+    python -m benchmarks.bench_reparse_diff
+"""
+import io
+import os
+import json
+import sqlite3
+import tempfile
+import contextlib
+import subprocess
+
+from reparse_diff import run, diff_graphs
+from benchmarks.common import load_corpus, load_graph_js
+
+
+def make_db(db_path, corpus, course_codes, copies):
+    conn = sqlite3.connect(db_path)
+    conn.execute('''CREATE TABLE courses_v3 (course_id STRING PRIMARY KEY, course_info BLOB, coruse_info_json TEXT)''')
+    for i, requisites in enumerate(corpus * copies):
+        json_data = {'course_id': str(170000 + i), 'course_code': course_codes[i % len(course_codes)],
+                     'requisites_dict_raw': {'Prerequisite(s):': requisites}}
+        conn.execute('''INSERT INTO courses_v3 VALUES (?, ?, ?)''', (json_data['course_id'], b'', json.dumps(json_data)))
+    conn.commit()
+    conn.close()
+
+
+def quiet_run(*args, **kwargs):
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        changed, totals = run(*args, **kwargs)
+    return changed, totals, output.getvalue()
+
+
+if __name__ == '__main__':
+    old = {'t': 'AND', 'c': ['MATH 1A03', 'MATH 1B03'], 's': [{'t': 'OR', 'c': ['PHYSICS 1D03', 'PHYSICS 1E03']}]}
+    new = {'t': 'AND', 'c': ['MATH 1B03', 'MATH 1ZA3'], 's': [{'t': 'AND', 'c': ['PHYSICS 1D03', 'PHYSICS 1E03']}],
+           'rc': 1}
+    assert diff_graphs(old, new) == [
+        'p.c: removed MATH 1A03', 'p.c: added MATH 1ZA3', 'p.rc: added 1', 'p.s[0].t: "OR" -> "AND"'
+    ], diff_graphs(old, new)
+    assert diff_graphs('MATH 1A03', {}) == ['p: "MATH 1A03" -> {}']
+    assert diff_graphs(old, old) == []
+
+    first_commit = subprocess.run(['git', 'rev-list', '--max-parents=0', 'HEAD'], stdout=subprocess.PIPE,
+                                  universal_newlines=True).stdout.split()[0]
+    with tempfile.TemporaryDirectory() as directory:
+        db_path = os.path.join(directory, 'courses.db')
+        make_db(db_path, load_corpus(), sorted(load_graph_js()), copies=20)
+
+        for old_spec, new_spec, expect_same in (('HEAD', '.', True), ('.', '.:subjects', False),
+                                                (first_commit[:10], '.', False)):
+            changed, totals, output = quiet_run(old_spec, new_spec, db_path=db_path, workers=2)
+            if expect_same:
+                assert not changed, output
+            print('%s vs %s: %d sections changed' % (old_spec, new_spec, len(changed)))
+            for total in totals:
+                print('    %-20s parse %6.2f s   wall %6.2f s   failed %d'
+                      % (total['version'], total['parse_seconds'], total['wall_seconds'], total['failed']))
+            for course in changed[:3]:
+                print('    %s: %s' % (course['course_code'], '; '.join(course['changes'])))
@@ -0,0 +1,52 @@
+"""
+Cost of the replace_dict rewrite in RequisiteParseTree.preprocess as the
+rule table grows: one str.replace pass per rule vs. the compiled
+RequisiteRewriter. Importing the parser must not compile its rewriter.
+
+    python -m benchmarks.bench_replace_dict
+"""
+import time
+
+from CourseDependencyGraph.parsers.requisite_parser import RequisiteParseTree
+from CourseDependencyGraph.parsers.requisite_rewriter import RequisiteRewriter
+from benchmarks.common import load_corpus
+
+
+def grown_rules(n):
+    """
+    replace_dict plus n extra program-name style rules, which is how the
+    table usually grows.
+    """
+    replace_dict = dict(RequisiteParseTree.replace_dict)
+    for i in range(n):
+        replace_dict['Program %d and Stream %d' % (i, i)] = 'Program %d & Stream %d' % (i, i)
+    return replace_dict
+
+
+def time_rewrite(rewrite, corpus, repeat):
+    t = time.perf_counter()
+    for _ in range(repeat):
+        for requisites in corpus:
+            rewrite(requisites)
+    return (time.perf_counter() - t) / (repeat * len(corpus)) * 1e6
+
+
+if __name__ == '__main__':
+    # Nothing parsed yet in this process
+    assert RequisiteParseTree.replace_rewriter.pattern is None
+    corpus = load_corpus()
+    repeat = 20
+
+    print('%8s %10s %14s %14s' % ('rules', 'compile ms', 'replace us/str', 'compiled us/str'))
+    for extra in (0, 100, 300, 1000, 3000):
+        replace_dict = grown_rules(extra)
+        t = time.perf_counter()
+        rewriter = RequisiteRewriter(replace_dict).compile()
+        compile_ms = (time.perf_counter() - t) * 1e3
+
+        for requisites in corpus:
+            assert rewriter.rewrite(requisites) == rewriter.rewrite_sequential(requisites), requisites
+
+        sequential = time_rewrite(rewriter.rewrite_sequential, corpus, repeat)
+        compiled = time_rewrite(rewriter.rewrite, corpus, repeat)
+        print('%8d %10.1f %14.2f %14.2f' % (len(replace_dict), compile_ms, sequential, compiled))
@@ -0,0 +1,50 @@
+"""
+RequisiteParseTree.replace_keyword_both (single pass) against the old
+rescanning loop, replace_keyword_both_sequential: randomized equivalence
+first, then timings on long program-requirement strings.
+
+    python -m benchmarks.bench_replace_keyword_both
+"""
+import random
+import time
+
+from CourseDependencyGraph.parsers.requisite_parser import RequisiteParseTree
+
+# From the replace_keyword_both docstring
+mechanical_engineering = ('Both MATH 2M03 and 2MM3 (or 2M06), or both MATH 2Z03 and 2ZZ3, or both '
+                          'MATH 2P04 and 2Q04; and registration in any Mechanical Engineering program')
+
+# Whole words plus fragments that join into "both " / "and" once a
+# "both " between them is removed
+pieces = ['both ', 'Both ', 'BOTH ', 'and', 'AND', 'And ', 'bo', 'th ', 'b', 'oth ', 'an', 'd',
+          'nd', 'a', ' ', 'x', 'MATH 2M03 ', '[comma] ', 'h ', ', or ']
+
+
+def check_equivalence(rpt, samples=100000, seed=0):
+    rng = random.Random(seed)
+    for _ in range(samples):
+        requisite = ''.join(rng.choice(pieces) for _ in range(rng.randint(0, 12)))
+        assert rpt.replace_keyword_both(requisite) == rpt.replace_keyword_both_sequential(requisite), requisite
+
+
+def time_function(function, requisite, repeat):
+    t = time.perf_counter()
+    for _ in range(repeat):
+        function(requisite)
+    return (time.perf_counter() - t) / repeat * 1e3
+
+
+if __name__ == '__main__':
+    rpt = RequisiteParseTree(mechanical_engineering)
+    check_equivalence(rpt)
+    print('equivalent on random inputs')
+
+    print('%8s %8s %14s %14s' % ('copies', 'chars', 'sequential ms', 'single ms'))
+    for copies in (1, 4, 16, 64, 256):
+        requisite = '; or '.join([mechanical_engineering] * copies)
+        assert rpt.replace_keyword_both(requisite) == rpt.replace_keyword_both_sequential(requisite)
+
+        repeat = max(1, 256 // copies)
+        sequential = time_function(rpt.replace_keyword_both_sequential, requisite, repeat)
+        single = time_function(rpt.replace_keyword_both, requisite, repeat)
+        print('%8d %8d %14.3f %14.3f' % (copies, len(requisite), sequential, single))
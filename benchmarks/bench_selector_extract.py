@@ -0,0 +1,77 @@
+"""
+Course pages as the spider gets them: the whole page parsed once by a
+parsel Selector (scrapy's), then read by RequisitesHTMLParser.
+
+- html: the td.block_content HTML of the Selector (extract_first), parsed
+  again by the parser, as the spider used to do
+- selector: the Selector itself, read by the lxml backend without parsing
+  the page a second time
+
+Pages are the generated course pages of common.course_page inside a full
+calendar page, and random tag soup inside a table. Every page must give
+the same json_data with the Selector as with its HTML, on both backends.
+Then the CPU time per page of each path is compared, Selector parsing
+included.
+
+    python -m benchmarks.bench_selector_extract
+"""
+import io
+import time
+import random
+import contextlib
+
+from CourseDependencyGraph.parsers.Parsers import RequisitesHTMLParser
+from benchmarks.common import load_corpus, course_page, tag_soup, page_template, block_content
+
+def extract(block, backend):
+    parser = RequisitesHTMLParser(block, 0, lazy=True, html_backend=backend)
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            return parser.extract_info()['json_data']
+    except Exception as e:
+        return type(e).__name__
+
+
+def cpu_per_page(pages, path, repeat=3):
+    best = None
+    for _ in range(repeat):
+        t = time.process_time()
+        for page in pages:
+            block = block_content(page)
+            if path == 'html, soup':
+                RequisitesHTMLParser(block.get(), 0, html_backend='soup').extract_block()
+            elif path == 'html, lxml':
+                RequisitesHTMLParser(block.get(), 0, html_backend='lxml').extract_block()
+            else:
+                RequisitesHTMLParser(block, 0, html_backend='lxml').extract_block()
+        seconds = time.process_time() - t
+        best = seconds if best is None else min(best, seconds)
+    return best / len(pages)
+
+
+if __name__ == '__main__':
+    rng = random.Random(0)
+    corpus = load_corpus()
+    pages = [page_template % course_page(i, corpus[i % len(corpus)], rng) for i in range(len(corpus) * 4)]
+    pieces = [piece for requisites in corpus for piece in requisites.split(' ')]
+    soups = [page_template % tag_soup(rng, pieces) for _ in range(3000)]
+
+    compared = 0
+    for page in pages + soups:
+        block = block_content(page)
+        if block is None:
+            continue
+        expected = extract(block.get(), 'soup')
+        assert extract(block, 'lxml') == expected, page
+        assert extract(block, 'soup') == expected, page
+        assert extract(block.get(), 'lxml') == expected, page
+        compared += 1
+    print('same json_data from the Selector and from its HTML for %d pages' % compared)
+
+    print('%-16s %16s' % ('path', 'CPU us / page'))
+    results = {}
+    for path in ('html, soup', 'html, lxml', 'selector, lxml'):
+        results[path] = cpu_per_page(pages, path)
+        print('%-16s %16.0f' % (path, results[path] * 1e6))
+    print('selector, lxml: %.1fx less CPU per page than html, soup'
+          % (results['html, soup'] / results['selector, lxml']))
@@ -0,0 +1,109 @@
+"""
+RequisiteTreeSimplifier on random boolean trees and on the catalog in
+assets/graph.js.
+
+Random trees are checked to keep their truth table, and simplifying twice
+must change nothing. Branches flagged recommended must keep their flag
+and their children. The catalog's exported branches are turned back into
+node trees, simplified, and exported again to report what the export
+would save.
+
+    python -m benchmarks.bench_simplify
+"""
+import copy
+import json
+import time
+import random
+import itertools
+
+from CourseDependencyGraph.parsers.requisite_parser import (
+    RequisiteParseNodeAND, RequisiteParseNodeOR, RequisiteParseNodeCourse
+)
+from CourseDependencyGraph.parsers.parse_tree_simplify import RequisiteTreeSimplifier
+from CourseDependencyGraph.parsers.parse_tree_intern import RequisiteNodeTable
+from benchmarks.common import load_graph_js, branch_to_node
+
+courses = ['MATH %d' % i for i in range(6)]
+
+
+def random_tree(rng, depth=0):
+    if depth > 3 or rng.random() < 0.3:
+        return RequisiteParseNodeCourse(rng.choice(courses))
+    node = rng.choice([RequisiteParseNodeOR, RequisiteParseNodeAND])()
+    node.extend(random_tree(rng, depth + 1) for _ in range(rng.randint(2, 4)))
+    return node
+
+
+def evaluate(node, taken):
+    if isinstance(node, RequisiteParseNodeCourse):
+        return node.course in taken
+    if isinstance(node, RequisiteParseNodeOR):
+        return any(evaluate(child, taken) for child in node.children)
+    return all(evaluate(child, taken) for child in node.children)
+
+
+def truth_table(node):
+    return [evaluate(node, {course for course, bit in zip(courses, bits) if bit})
+            for bits in itertools.product((False, True), repeat=len(courses))]
+
+
+def check_random_trees(samples=5000, seed=0):
+    rng = random.Random(seed)
+    simplifier = RequisiteTreeSimplifier()
+    for _ in range(samples):
+        root = random_tree(rng)
+        simplified = simplifier.simplify(copy.deepcopy(root))
+        assert truth_table(simplified) == truth_table(root), root
+        assert str(RequisiteTreeSimplifier().simplify(copy.deepcopy(simplified))) == str(simplified), root
+    return simplifier
+
+
+def check_flagged_branches():
+    # AND[MATH 1A03, ANDREC[MATH 1B03, OR[MATH 1B03, MATH 1C03]]]: absorbing the
+    # OR inside the recommended AND left one child, and the flag went with it
+    recommended = RequisiteParseNodeAND()
+    recommended.recommended = True
+    recommended.extend([RequisiteParseNodeCourse('MATH 1B03'), RequisiteParseNodeOR()])
+    recommended.children[1].extend([RequisiteParseNodeCourse('MATH 1B03'), RequisiteParseNodeCourse('MATH 1C03')])
+    root = RequisiteParseNodeAND()
+    root.extend([RequisiteParseNodeCourse('MATH 1A03'), recommended])
+
+    simplified = RequisiteTreeSimplifier().simplify(root)
+    assert str(simplified) == 'AND:[MATH 1A03, ANDREC:[MATH 1B03, OR:[MATH 1B03, MATH 1C03]]]', str(simplified)
+
+    single = RequisiteParseNodeOR()
+    single.corequisite = True
+    single.extend([RequisiteParseNodeCourse('MATH 1B03')])
+    root = RequisiteParseNodeAND()
+    root.extend([RequisiteParseNodeCourse('MATH 1A03'), single])
+    simplified = RequisiteTreeSimplifier().simplify(root)
+    assert simplified.children[1].corequisite and len(simplified.children[1].children) == 1, str(simplified)
+
+
+def export(roots):
+    table = RequisiteNodeTable()
+    graph = {course_code: table.export(table.intern(root)) for course_code, root in roots.items()}
+    return len(json.dumps(graph)) + len(json.dumps(table.branches)), len(table.branches)
+
+
+if __name__ == '__main__':
+    simplifier = check_random_trees()
+    print('random trees keep their truth table:', simplifier.report())
+    check_flagged_branches()
+    print('flagged branches keep their flag and children')
+
+    master_course_graph = load_graph_js()
+    roots = {course_code: branch_to_node(course_graph['p'])
+             for course_code, course_graph in master_course_graph.items() if 'p' in course_graph}
+    size_before, branches_before = export(copy.deepcopy(roots))
+
+    simplifier = RequisiteTreeSimplifier()
+    t = time.perf_counter()
+    simplified = {course_code: simplifier.simplify(root) for course_code, root in roots.items()}
+    seconds = time.perf_counter() - t
+    size_after, branches_after = export(simplified)
+
+    print('catalog:', simplifier.report())
+    print('simplify time:   %.1f ms for %d trees' % (seconds * 1e3, len(roots)))
+    print('unique branches: %d -> %d' % (branches_before, branches_after))
+    print('graph.js bytes:  %d -> %d (with the branch table)' % (size_before, size_after))
@@ -0,0 +1,82 @@
+"""
+The reference corpus parsed with and without a SubjectIndex built from the
+course codes in assets/graph.js.
+
+Checks that an empty index changes nothing, and that join_subjects only joins pairs of
+words it should. A subject missing from the index must not lend the
+subject before it to the codes after it. Reports the requisites whose trees the index changes and
+the time spent joining subjects.
+
+    python -m benchmarks.bench_subject_index
+"""
+import io
+import time
+import contextlib
+
+from CourseDependencyGraph.parsers.requisite_parser import RequisiteParseTree
+from CourseDependencyGraph.parsers.requisite_patterns import requisite_patterns
+from CourseDependencyGraph.parsers.requisite_subjects import SubjectIndex
+from benchmarks.common import load_graph_js, load_corpus
+
+
+def parse(tree_class, requisites, subject_index=None):
+    rpt = tree_class(requisites, subject_index=subject_index)
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            return str(rpt.process()), rpt.generate_graph()
+    except Exception as e:
+        return type(e).__name__, str(e.args)
+
+
+def check_join_subjects():
+    subject_index = SubjectIndex.from_course_codes(['ELECENG 2EI5', 'MATH 1ZA3', 'PHYSICS 1D03', 'ISCI 1A24 A/B', 'Unknown'])
+    assert subject_index.subjects == {'ELECENG', 'MATH', 'PHYSICS', 'ISCI'}, subject_index.subjects
+    cases = {
+        'ELEC ENG 2EI5': 'ELECENG 2EI5',
+        'MATH ELEC ENG 2EI5': 'MATH ELECENG 2EI5',
+        'MATH PHYSICS 1D03': 'MATH PHYSICS 1D03',
+        # Unknown words are joined as without an index
+        'SFWR ENG 2S03': 'SFWRENG 2S03',
+        'ELEC ENG ENG': 'ELECENG ENG',
+    }
+    for text, expected in cases.items():
+        assert subject_index.join_subjects(text) == expected, (text, subject_index.join_subjects(text))
+        assert SubjectIndex().join_subjects(text) == requisite_patterns['joined_subject'].sub(r'\1\2', text), text
+
+
+def check_unknown_subject():
+    # PHYSICS is not in the index: 2D03 is not MATH 2D03
+    subject_index = SubjectIndex(['MATH', 'COMPSCI'])
+    for requisites in ('MATH 1A03; and one of PHYSICS 2B06, 2D03', 'One of MATH 1A03, PHYSICS 2B06 or 2D03',
+                       'MATH 1A03 and PHYSICS 2B06, 2D03'):
+        processed, graph = parse(RequisiteParseTree, requisites, subject_index)
+        assert 'MATH 2D03' not in processed, (requisites, processed)
+
+
+if __name__ == '__main__':
+    check_join_subjects()
+    print('join_subjects joins only unknown pairs and known subjects')
+    check_unknown_subject()
+    print('codes after an unknown subject do not take the subject before it')
+
+    corpus = load_corpus()
+    subject_index = SubjectIndex.from_course_codes(load_graph_js())
+    print('%r from graph.js: %s' % (subject_index, ' '.join(sorted(subject_index.subjects))))
+
+    without = [parse(RequisiteParseTree, requisites) for requisites in corpus]
+    empty = [parse(RequisiteParseTree, requisites, SubjectIndex()) for requisites in corpus]
+    assert empty == without
+    with_index = [parse(RequisiteParseTree, requisites, subject_index) for requisites in corpus]
+
+    changed = [(requisites, before, after) for requisites, before, after in zip(corpus, without, with_index) if before != after]
+    print('%d of %d requisites parse differently with the index' % (len(changed), len(corpus)))
+    for requisites, before, after in changed[:10]:
+        print('  %s\n    without: %s\n    with:    %s' % (requisites, before[0], after[0]))
+
+    for name, join in (('regex', lambda text: requisite_patterns['joined_subject'].sub(r'\1\2', text)),
+                       ('index', subject_index.join_subjects)):
+        t = time.perf_counter()
+        for _ in range(10):
+            for requisites in corpus:
+                join(requisites)
+        print('join subjects with %s: %.2f ms per corpus pass' % (name, (time.perf_counter() - t) * 1e2))
@@ -0,0 +1,208 @@
+"""
+Parser benchmark suite: process() and generate_graph() for every requisite
+of three corpora.
+
+- catalog: the checked-in catalog requisites, samples/requisites_corpus.txt
+- long: program-length requirements, chained operators and runs of
+  catalog requisites joined into one
+- adversarial: inputs that have been slow or fragile for the cascade
+  (nested and unbalanced brackets, runs of "both", long course lists,
+  stacked prefixes, decimals, characters whose lowercase is longer)
+  and requisites spliced from pieces of the catalog
+
+The synthetic corpora are generated from fixed seeds, so they are the
+same on every run. For each corpus the suite reports strings
+per second, p50 and p99 latency per string and the peak memory traced
+while parsing one string.
+
+Throughput is compared with benchmarks/bench_suite_baseline.json after
+scaling it by a fixed pure-Python calibration workload timed on both
+machines. The run fails (exit status 1) when a throughput falls more than
+--threshold below its baseline. After a deliberate change, refresh the
+baseline with --update-baseline.
+
+    python -m benchmarks.bench_suite
+    python -m benchmarks.bench_suite --update-baseline
+"""
+import io
+import sys
+import json
+import time
+import random
+import argparse
+import tracemalloc
+import contextlib
+
+from CourseDependencyGraph.parsers.requisite_parser import RequisiteParseTree
+from benchmarks.common import load_corpus
+
+baseline_path = 'benchmarks/bench_suite_baseline.json'
+
+
+def long_corpus(catalog, seed=0):
+    rng = random.Random(seed)
+    requisites = []
+    for operators in (25, 100, 400, 1600):
+        requisites.append('MATH 1A03' + ''.join(' %s %dA%02d' % ('and' if i % 2 else 'or', 1 + i % 4, i % 100)
+                                                for i in range(operators)))
+    for count in (5, 10, 20, 40):
+        for _ in range(4):
+            requisites.append('; '.join(rng.choice(catalog) for _ in range(count)))
+    requisites.append('One of ' + ', '.join('MATH %d%s%02d' % (1 + i % 4, 'ABCXZ'[i % 5], i % 100)
+                                            for i in range(500)))
+    return requisites
+
+
+def adversarial_corpus(catalog, seed=0):
+    rng = random.Random(seed)
+    requisites = [
+        '(' * 60 + 'MATH 1A03 or 1B03' + ')' * 60,
+        '(MATH 1A03 (or 1B03' * 40,
+        'MATH 1A03) or 1B03)' * 40,
+        'both MATH 1A03 and 1B03, ' * 40,
+        'Both both both MATH 1A03 and and and 1B03' * 10,
+        'one of ' * 80 + 'MATH 1A03',
+        'credit or registration in one of ' * 30 + 'MATH 1A03, 1B03',
+        'Registration in an Honours program and ' * 60 + 'MATH 1A03',
+        'a GPA of 3.5 or 3.75 in MATH 1A03. ' * 40,
+        '. ; , ' * 150,
+        'MATH 1A03 (or 1B03), ' * 80 + 'is strongly recommended',
+        'ENGINEERİNG 1A03 or KINESIOL 1B03 and ' * 40 + 'MATH 1A03',
+        'Aaaaaaaa' * 500,
+        'MATH1A03or1B03and' * 100,
+    ]
+    pieces = [piece for requisites in catalog for piece in requisites.split(' ')] + ['İ', 'K', '(', ')', ';']
+    requisites += [' '.join(rng.choice(pieces) for _ in range(rng.randint(5, 120))) for _ in range(200)]
+    return requisites
+
+
+def run_one(tree_class, requisites):
+    rpt = tree_class(requisites)
+    try:
+        rpt.process()
+        rpt.generate_graph()
+        return True
+    except Exception:
+        return False
+
+
+def timed_pass(tree_class, corpus):
+    latencies = []
+    failures = 0
+    with contextlib.redirect_stdout(io.StringIO()):
+        for requisites in corpus:
+            t = time.perf_counter()
+            ok = run_one(tree_class, requisites)
+            latencies.append(time.perf_counter() - t)
+            failures += not ok
+    return latencies, failures
+
+
+def peak_memory(tree_class, corpus):
+    peak = 0
+    tracemalloc.start()
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            for requisites in corpus:
+                tracemalloc.reset_peak()
+                start = tracemalloc.get_traced_memory()[0]
+                run_one(tree_class, requisites)
+                peak = max(peak, tracemalloc.get_traced_memory()[1] - start)
+    finally:
+        tracemalloc.stop()
+    return peak
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+def calibrate(repeat=5):
+    """
+    Seconds taken by a fixed mix of string, dict and list work, the unit
+    throughputs are scaled by to compare runs on different machines.
+    """
+    best = None
+    for _ in range(repeat):
+        t = time.perf_counter()
+        words = {}
+        for i in range(60000):
+            word = ('MATH %d' % (i % 997)).lower().replace('math', 'M').split(' ')[-1]
+            words[word] = words.get(word, 0) + 1
+        sorted(words.items())
+        seconds = time.perf_counter() - t
+        best = seconds if best is None else min(best, seconds)
+    return best
+
+
+def measure(corpora, repeat, tree_class=RequisiteParseTree):
+    results = {}
+    for name, corpus in corpora.items():
+        # Warm the pattern and course-code caches
+        timed_pass(tree_class, corpus)
+        best_total = None
+        best_latencies = None
+        for _ in range(repeat):
+            latencies, failures = timed_pass(tree_class, corpus)
+            best_latencies = latencies if best_latencies is None else \
+                [min(a, b) for a, b in zip(best_latencies, latencies)]
+            best_total = sum(latencies) if best_total is None else min(best_total, sum(latencies))
+        results[name] = {
+            'strings': len(corpus),
+            'strings_per_second': len(corpus) / best_total,
+            'p50_ms': percentile(best_latencies, 0.50) * 1e3,
+            'p99_ms': percentile(best_latencies, 0.99) * 1e3,
+            'peak_kb': peak_memory(tree_class, corpus) / 1024,
+            'failed': failures,
+        }
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Requisite parser benchmark suite')
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help='largest allowed drop in throughput from the baseline (default 0.25)')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--update-baseline', action='store_true')
+    args = parser.parse_args()
+
+    catalog = load_corpus()
+    corpora = {
+        'catalog': catalog,
+        'long': long_corpus(catalog),
+        'adversarial': adversarial_corpus(catalog),
+    }
+    calibration = calibrate()
+    results = measure(corpora, args.repeat)
+
+    try:
+        with open(baseline_path, 'r') as f:
+            baseline = json.load(f)
+    except FileNotFoundError:
+        baseline = None
+    # Baseline throughputs as they would be on this machine
+    scale = baseline['calibration_seconds'] / calibration if baseline else None
+
+    print('calibration: %.1f ms' % (calibration * 1e3))
+    print('%-12s %8s %12s %12s %10s %10s %10s %7s' % ('', 'strings', 'strings/s', 'baseline/s', 'p50 ms', 'p99 ms',
+                                                    'peak KB', 'failed'))
+    regressions = []
+    for key, result in results.items():
+        expected = None
+        if baseline and key in baseline['results']:
+            expected = baseline['results'][key]['strings_per_second'] * scale
+            if result['strings_per_second'] < expected * (1 - args.threshold):
+                regressions.append(key)
+        print('%-12s %8d %12.0f %12s %10.3f %10.3f %10.0f %7d' % (
+            key, result['strings'], result['strings_per_second'], '%.0f' % expected if expected else '-',
+            result['p50_ms'], result['p99_ms'], result['peak_kb'], result['failed']))
+
+    if args.update_baseline:
+        with open(baseline_path, 'w') as f:
+            json.dump({'calibration_seconds': calibration, 'results': results}, f, indent=2, sort_keys=True)
+            f.write('\n')
+        print('baseline written to', baseline_path)
+    elif regressions:
+        print('throughput fell more than %d%% below the baseline: %s' % (args.threshold * 100, ', '.join(regressions)))
+        sys.exit(1)
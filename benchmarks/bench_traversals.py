@@ -0,0 +1,211 @@
+"""
+The tree traversals (graph export, str, subject inference, UNKNOWN
+replacement) against the plain recursive methods, copied below as
+legacy_*. They recurse the same way down to
+RequisiteParseNode.max_recursion_depth levels and hand deeper subtrees to
+the explicit-stack visitors of requisite_visitor.
+
+Both give the same results on the catalog in assets/graph.js and on the
+reference corpus, also with every subtree below the root handed to the
+visitors, and the time each takes is reported. Then a program requirement
+long enough to nest thousands of levels is parsed, exported, pickled and
+written as graph.js would be, which the recursive methods could not do.
+
+    python -m benchmarks.bench_traversals
+"""
+import io
+import sys
+import copy
+import json
+import time
+import pickle
+import contextlib
+
+from CourseDependencyGraph.parsers.requisite_parser import (
+    RequisiteParseTree, RequisiteParseNode, RequisiteParseNodeAND, RequisiteParseNodeOR,
+    RequisiteParseNodeCourse, RequisiteParseNodeNote, RequisiteParseNodeUNKNOWN
+)
+from CourseDependencyGraph.parsers.parse_tree_intern import RequisiteNodeTable
+from CourseDependencyGraph.parsers.requisite_course_code import course_codes
+from benchmarks.common import load_graph_js, branch_to_node, load_corpus
+
+
+def legacy_generate_graph(node):
+    if isinstance(node, RequisiteParseNodeCourse):
+        return str(node.course)
+
+    branch_dict = {}
+    if node.corequisite:
+        branch_dict['cr'] = 1
+    if node.recommended:
+        branch_dict['rc'] = 1
+
+    courses = []
+    subbranches = []
+    for child in node.children:
+        subbranch_dict = legacy_generate_graph(child)
+        if isinstance(child, (RequisiteParseNodeOR, RequisiteParseNodeAND)):
+            if any(isinstance(subchild, (RequisiteParseNodeOR, RequisiteParseNodeAND, RequisiteParseNodeCourse))
+                   for subchild in child.children):
+                subbranches.append(subbranch_dict)
+        elif isinstance(child, RequisiteParseNodeCourse):
+            courses.append(subbranch_dict)
+
+    if courses:
+        branch_dict['c'] = courses
+    if subbranches:
+        branch_dict['s'] = subbranches
+
+    if isinstance(node, (RequisiteParseNodeOR, RequisiteParseNodeAND)):
+        if not branch_dict:
+            return {}
+        branch_dict['t'] = 'OR' if isinstance(node, RequisiteParseNodeOR) else 'AND'
+    return branch_dict
+
+
+def legacy_repr(node):
+    if isinstance(node, RequisiteParseNodeCourse):
+        return str(node.course)
+    if isinstance(node, RequisiteParseNodeNote):
+        return '"%s"' % str(node.note)
+    children = '[%s]' % ', '.join(legacy_repr(child) for child in node.children)
+    if isinstance(node, RequisiteParseNodeOR):
+        return 'OR:%s' % children
+    if isinstance(node, RequisiteParseNodeAND):
+        return 'AND%s:%s' % ('' if not node.recommended else 'REC', children)
+    if isinstance(node, RequisiteParseNodeUNKNOWN):
+        return 'UNKNOWN:%s' % children
+    return children
+
+
+def legacy_infer_subject(node, previous_subject=None):
+    if node.is_leaf() and isinstance(node, RequisiteParseNodeCourse):
+        node.course = node.course.strip()
+        subject = course_codes.subject(node.course)
+        if subject is not None:
+            if subject == 'ISCI':
+                return previous_subject
+            return subject
+        if previous_subject is not None:
+            node.insert_subject(previous_subject)
+        return previous_subject
+
+    if node.is_leaf() and isinstance(node, RequisiteParseNodeNote):
+        return previous_subject
+
+    subject = previous_subject
+    for child in node.children:
+        subject = legacy_infer_subject(child, subject)
+    return subject
+
+
+def legacy_replace_unknown(node, replacement_node_type):
+    if isinstance(node, RequisiteParseNodeUNKNOWN):
+        return replacement_node_type.from_unknown(node)
+    for i, child in enumerate(node.children):
+        node.children[i] = legacy_replace_unknown(child, replacement_node_type)
+    return node
+
+
+def with_unknowns(node):
+    """
+    A copy of node with every other AND node made an UNKNOWN node.
+    """
+    node = copy.deepcopy(node)
+    stack = [node]
+    flip = False
+    while stack:
+        current = stack.pop()
+        for i, child in enumerate(current.children):
+            if isinstance(child, RequisiteParseNodeAND):
+                flip = not flip
+                if flip:
+                    unknown = RequisiteParseNodeUNKNOWN()
+                    unknown.children = child.children
+                    current.children[i] = unknown
+            stack.append(current.children[i])
+    return node
+
+
+def timed(function, trees, repeat=5):
+    best = None
+    for _ in range(repeat):
+        copies = [copy.deepcopy(tree) for tree in trees]
+        t = time.perf_counter()
+        results = [function(tree) for tree in copies]
+        seconds = time.perf_counter() - t
+        best = seconds if best is None else min(best, seconds)
+    return results, best
+
+
+def compare(name, trees, legacy, current):
+    expected, legacy_seconds = timed(legacy, trees)
+    results, seconds = timed(current, trees)
+    assert [legacy_repr(result) if isinstance(result, RequisiteParseNode) else result for result in results] == \
+        [legacy_repr(result) if isinstance(result, RequisiteParseNode) else result for result in expected], name
+    print('%-26s %9.2f ms %9.2f ms' % (name, legacy_seconds * 1e3, seconds * 1e3))
+
+
+def unprocessed_corpus_trees(corpus):
+    trees = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        for requisites in corpus:
+            rpt = RequisiteParseTree(requisites)
+            try:
+                trees.append(rpt.preprocess(requisites))
+            except Exception:
+                pass
+    return trees
+
+
+def long_requirement(operators):
+    return 'MATH 1A03' + ''.join(' %s %dA%02d' % ('and' if i % 2 else 'or', 1 + i % 4, i % 100)
+                                 for i in range(operators))
+
+
+def infer_subject(node):
+    node.infer_subject()
+    return repr(node)
+
+
+def legacy_infer(node):
+    legacy_infer_subject(node)
+    return legacy_repr(node)
+
+
+if __name__ == '__main__':
+    catalog = [branch_to_node(course_graph['p']) for course_graph in load_graph_js().values() if 'p' in course_graph]
+    corpus_trees = unprocessed_corpus_trees(load_corpus())
+    print('%d catalog trees, %d corpus trees' % (len(catalog), len(corpus_trees)))
+    unknown_trees = [with_unknowns(tree) for tree in catalog]
+    rpt = RequisiteParseTree('')
+    default_depth = RequisiteParseNode.max_recursion_depth
+    for max_recursion_depth in (default_depth, 0):
+        RequisiteParseNode.max_recursion_depth = max_recursion_depth
+        print('%-26s %12s %12s' % ('max recursion depth %d' % max_recursion_depth, 'legacy', 'current'))
+        compare('catalog export', catalog, legacy_generate_graph, lambda node: node._generate_graph())
+        compare('catalog str', catalog, legacy_repr, repr)
+        compare('corpus subject inference', corpus_trees, legacy_infer, infer_subject)
+        compare('catalog UNKNOWN replace', unknown_trees,
+                lambda node: legacy_replace_unknown(node, RequisiteParseNodeOR),
+                lambda node: rpt.dfs_replace_unknown_identifier(node, RequisiteParseNodeOR, 'comma_identifier'))
+    RequisiteParseNode.max_recursion_depth = default_depth
+
+    operators = sys.getrecursionlimit() * 5
+    requisites = long_requirement(operators)
+    rpt = RequisiteParseTree(requisites, time_budget=60)
+    t = time.perf_counter()
+    processed = rpt.process()
+    node_table = RequisiteNodeTable()
+    graph = node_table.generate_graph(node_table.intern_tree(rpt))
+    written = len(json.dumps(graph)) + len(json.dumps(node_table.branches))
+    restored = pickle.loads(pickle.dumps(rpt, pickle.HIGHEST_PROTOCOL))
+    assert str(restored.root) == processed
+    print('%d operators: processed, exported (%d bytes) and pickled in %.2f s'
+          % (operators, written, time.perf_counter() - t))
+
+    try:
+        legacy_generate_graph(rpt.root)
+        print('recursive export did not fail')
+    except RecursionError:
+        print('recursive export: RecursionError')
@@ -0,0 +1,93 @@
+"""
+Sharing found by RequisiteNodeTable.
+
+Interns the processed trees of the reference corpus, checks that every
+tree prints and exports the same as before, and reports node counts,
+resident memory and the size of all trees pickled together. Then applies
+the branch table to the catalog in assets/graph.js and reports the size
+of the exported graph with and without it.
+
+    python -m benchmarks.bench_tree_intern
+"""
+import io
+import json
+import pickle
+import contextlib
+import tracemalloc
+
+from CourseDependencyGraph.parsers.requisite_parser import RequisiteParseTree, RequisiteParseNode
+from CourseDependencyGraph.parsers.parse_tree_intern import RequisiteNodeTable
+from benchmarks.common import load_corpus, load_graph_js
+
+
+def processed_trees(corpus):
+    trees = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        for requisites in corpus:
+            rpt = RequisiteParseTree(requisites)
+            try:
+                rpt.process()
+            except Exception:
+                continue
+            trees.append(rpt)
+    return trees
+
+
+def count_nodes(roots):
+    seen = set()
+    stack = list(roots)
+    while stack:
+        node = stack.pop()
+        if isinstance(node, RequisiteParseNode) and id(node) not in seen:
+            seen.add(id(node))
+            stack.extend(node.children)
+    return len(seen)
+
+
+if __name__ == '__main__':
+    trees = processed_trees(load_corpus())
+    expected = [(str(rpt.root), rpt.generate_graph()) for rpt in trees]
+    rows = [pickle.dumps(rpt.root, pickle.HIGHEST_PROTOCOL) for rpt in trees]
+
+    tracemalloc.start()
+    roots = [pickle.loads(row) for row in rows]
+    tree_bytes, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    tracemalloc.start()
+    table = RequisiteNodeTable()
+    interned_roots = [table.intern(pickle.loads(row)) for row in rows]
+    table_bytes, _ = tracemalloc.get_traced_memory()
+    del table
+    interned_bytes, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    table = RequisiteNodeTable()
+    for rpt in trees:
+        table.intern_tree(rpt)
+    for rpt, (string, graph) in zip(trees, expected):
+        assert str(rpt.root) == string
+        assert rpt.generate_graph() == graph
+        exported = table.generate_graph(rpt)
+        assert {requisite_type: table.expand(branch) for requisite_type, branch in exported.items()} == graph
+
+    print('trees:                %d' % len(trees))
+    print('nodes:                %d -> %d' % (count_nodes(roots), count_nodes(interned_roots)))
+    print('resident bytes:       %d -> %d (%d while the table is kept)' % (tree_bytes, interned_bytes, table_bytes))
+    print('pickled together:     %d -> %d' % (len(pickle.dumps(roots, pickle.HIGHEST_PROTOCOL)),
+                                             len(pickle.dumps(interned_roots, pickle.HIGHEST_PROTOCOL))))
+
+    master_course_graph = load_graph_js()
+    catalog_table = RequisiteNodeTable()
+    referenced = {}
+    for course_code, course_graph in master_course_graph.items():
+        referenced[course_code] = dict(course_graph)
+        if 'p' in course_graph:
+            referenced[course_code]['p'] = catalog_table.reference(course_graph['p'])
+            assert catalog_table.expand(referenced[course_code]['p']) == course_graph['p']
+
+    inline_size = len(json.dumps(master_course_graph))
+    shared_size = len(json.dumps(referenced)) + len(json.dumps(catalog_table.branches))
+    print('graph.js courses:     %d' % len(master_course_graph))
+    print('graph.js branches:    %d unique' % len(catalog_table.branches))
+    print('graph.js bytes:       %d -> %d' % (inline_size, shared_size))
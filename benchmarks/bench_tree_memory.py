@@ -0,0 +1,69 @@
+"""
+Memory held by the whole catalog's requisite trees once loaded, the way
+json_generator keeps them resident while building the export.
+
+Reads every courses_v3 row from db/course_db_example.db when it exists,
+otherwise pickles a catalog-sized stand-in (the reference corpus repeated
+to ~3,000 requisites) and loads that.
+
+    python -m benchmarks.bench_tree_memory
+"""
+import io
+import os
+import pickle
+import sqlite3
+import contextlib
+import tracemalloc
+
+from CourseDependencyGraph.parsers.requisite_parser import RequisiteParseTree, RequisiteParseNode
+from benchmarks.common import load_corpus
+
+
+def catalog_rows(db_filename='db/course_db_example.db', corpus_filename='samples/requisites_corpus.txt'):
+    if os.path.isfile(db_filename):
+        conn = sqlite3.connect(db_filename)
+        rows = [bytes(row[0]) for row in conn.execute('''SELECT course_info FROM courses_v3''')]
+        conn.close()
+        return db_filename, rows
+
+    corpus = load_corpus(corpus_filename)
+
+    rows = []
+    for requisites in corpus * -(-3000 // len(corpus)):
+        rpt = RequisiteParseTree(requisites)
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                rpt.process()
+        except Exception:
+            continue
+        rows.append(pickle.dumps({'rpts': {'Prerequisite(s):': rpt}}, pickle.HIGHEST_PROTOCOL))
+    return corpus_filename, rows
+
+
+def count_nodes(node):
+    count = 0
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, RequisiteParseNode):
+            count += 1
+            stack.extend(node.children)
+    return count
+
+
+if __name__ == '__main__':
+    source, rows = catalog_rows()
+
+    tracemalloc.start()
+    course_infos = [pickle.loads(row) for row in rows]
+    resident, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    nodes = sum(count_nodes(rpt.root) for course_info in course_infos
+                for rpt in course_info['rpts'].values() if hasattr(rpt, 'root'))
+    print('source:          %s' % source)
+    print('rows:            %d' % len(rows))
+    print('pickled bytes:   %d' % sum(len(row) for row in rows))
+    print('nodes:           %d' % nodes)
+    print('resident bytes:  %d (peak %d)' % (resident, peak))
+    print('bytes per node:  %.1f' % (resident / max(nodes, 1)))
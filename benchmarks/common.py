@@ -0,0 +1,97 @@
+"""
+Inputs shared by the benchmarks: the reference corpus, the catalog in
+assets/graph.js, and generated course pages.
+"""
+import json
+
+from parsel import Selector
+
+from CourseDependencyGraph.parsers.requisite_parser import (
+    RequisiteParseNode, RequisiteParseNodeAND, RequisiteParseNodeOR, RequisiteParseNodeCourse
+)
+
+navigation = ''.join('<li><a href="/content.php?catoid=32&amp;navoid=%d">Section %d</a></li>' % (i, i)
+                     for i in range(40))
+
+page_template = (
+    '<!DOCTYPE html><html><head><title>Course Preview</title><script src="/js/gateway.js"></script></head>'
+    '<body><div id="header"><a href="/">McMaster University</a> Undergraduate Calendar</div>'
+    '<table class="table_default"><tr><td class="block_header">Course</td></tr><tr>%s</tr></table>'
+    '<div id="footer">Powered by the Academic Management Suite</div></body></html>'
+)
+
+
+def load_corpus(filename='samples/requisites_corpus.txt'):
+    with open(filename, 'r') as f:
+        return [line.rstrip('\n') for line in f if line.strip()]
+
+
+def load_graph_js(filename='assets/graph.js'):
+    with open(filename, 'r') as f:
+        for line in f:
+            if line.startswith('var master_course_graph = '):
+                return json.loads(line[len('var master_course_graph = '):].rstrip().rstrip(';'))
+
+
+def branch_to_node(branch):
+    """
+    Inverse of RequisiteParseNode._generate_graph, for the branches in graph.js.
+    """
+    if isinstance(branch, str):
+        return RequisiteParseNodeCourse(branch)
+    node_class = {'AND': RequisiteParseNodeAND, 'OR': RequisiteParseNodeOR}.get(branch.get('t'), RequisiteParseNode)
+    node = node_class()
+    node.corequisite = 'cr' in branch
+    node.recommended = 'rc' in branch
+    node.extend(branch_to_node(course) for course in branch.get('c', []))
+    node.extend(branch_to_node(subbranch) for subbranch in branch.get('s', []))
+    return node
+
+
+def course_page(i, requisites, rng):
+    subject = rng.choice(['MATH', 'CHEM', 'ELECENG', 'PHYSICS', 'HTHSCI', 'SFWRENG'])
+    sections = ['<strong>Prerequisite(s):</strong> %s' % requisites]
+    if rng.random() < 0.5:
+        sections.append('<strong>Antirequisite(s):</strong> %s %d%s03' % (subject, 1 + i % 4, 'ABC'[i % 3]))
+    if rng.random() < 0.3:
+        sections.append('<strong>Cross-list(s):</strong> %s %dX03' % (subject, 1 + i % 4))
+    if rng.random() < 0.3:
+        sections.append('<em>Not open to students with credit or registration in %s 1Z03.</em>' % subject)
+    return (
+        '<td class="block_content" colspan="2">'
+        '<table class="table_default"><tr><td><a href="#" onclick="acalogPopup(); return false;">'
+        '<img src="/img/print.gif" alt="">Print-Friendly Page</a> [Add to Portfolio]</td></tr></table>\n'
+        '<h1 id="course_preview_title">%s %d%s03 - Course &amp; Topics %d</h1>\n'
+        '<hr>3 unit(s)<br><br>Lectures, tutorials &nbsp;(three hours)&lt;one term&gt;. '
+        '<em>This course is offered in %s.</em><br>\n  <br>\n%s<br>\n'
+        '<p><a href="#top">Back to Top</a></p><ul>%s</ul>'
+        '<!-- generated --><script>var coid = %d;</script></td>'
+    ) % (subject, 1 + i % 4, 'ABCDE'[i % 5], i, rng.choice(['Fall', 'Winter']), '<br>'.join(sections), navigation, i)
+
+
+def tag_soup(rng, pieces):
+    tokens = [
+        '<em>', '</em>', '<em class=" a  b " title=\'x"y\'>', '<b>', '</b>', '<p>', '</p>', '<pre>  \n ', '</pre>',
+        '<script>if (a < b && c) {}</script>', '<style>p > a {}</style>', '<template><i>t</i></template>',
+        '<ruby>x<rt>y</rt><rp>(</rp></ruby>', '<br>', '<br/>', '</br>', '<img src="a&b">', '<hr>', '<textarea> \t</textarea>',
+        '<h1 id="course_preview_title">', '</h1>', '<h1>', '<td class="block_content">', '<td class="x block_content y">',
+        '</td>', '<table><tr>', '</tr></table>', '<!-- c -->', '<!--   -->', '<?php echo 1 ?>', '&amp;', '&nbsp;',
+        '&lt;&gt;', '&quot;', '"', '\n', '   ', '\t', ' - ', '-', '[br]', 'Prerequisite(s):', 'Antirequisite(s):',
+        '<a href="x" rel=" r  s ">', '<a href=" x y\xe9" name="n m">', '</a>', '<input disabled>', '<input checked="x">',
+        '<span hidden>', '</span>', '<div>', '</div>',
+        '</nonexistent>', '<unknown-tag a=1>', 'é', '\xa0',
+    ]
+    parts = []
+    for _ in range(rng.randint(1, 60)):
+        if rng.random() < 0.6:
+            parts.append(rng.choice(tokens))
+        else:
+            parts.append(rng.choice(pieces))
+    if rng.random() < 0.8:
+        parts.insert(rng.randint(0, len(parts)), '<td class="block_content">')
+    return ''.join(parts)
+
+
+def block_content(page):
+    block = Selector(text=page).css('td.block_content')
+    return block[0] if block else None
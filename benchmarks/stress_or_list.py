@@ -0,0 +1,88 @@
+"""
+Adversarial inputs for the "one of ... or ..." list recognizer in
+RequisiteParseTree.preprocess. The legacy regex backtracks exponentially on
+the 'A 1B11' family below; the recognizer and the full parse have to stay
+under a fixed time bound however long the input gets.
+
+    python -m benchmarks.stress_or_list
+"""
+import os
+import re
+import time
+import tempfile
+
+from CourseDependencyGraph.parsers.parse_cache import RequisiteParseCache
+from CourseDependencyGraph.parsers.parse_lazy import LazyRequisiteTrees
+from CourseDependencyGraph.parsers.requisite_or_list import OrListRecognizer
+from CourseDependencyGraph.parsers.requisite_parser import RequisiteParseTree, RequisiteParseNodeNote
+
+# Seconds allowed for the recognizer on one input of any length below
+recognizer_bound = 0.5
+# Seconds allowed for a whole parse, on top of its time budget
+parse_margin = 1.0
+
+adversarial = {
+    'nested subjects': lambda k: 'one of ' + 'A 1B11' * k + ' or ',
+    'subjects only': lambda k: 'credit or registration in one of ' + 'MATH ' * k + 'x',
+    'split codes': lambda k: 'One of ' + '2A0312B3' * k + ' or x',
+    'long list': lambda k: 'one of ' + 'MATH 2A03, ' * k + '2B03 or',
+    'long digits': lambda k: 'one of 2A0' + '3' * k + ' or ',
+}
+
+
+def time_call(function, *args):
+    t = time.perf_counter()
+    result = function(*args)
+    return time.perf_counter() - t, result
+
+
+if __name__ == '__main__':
+    legacy = re.compile(OrListRecognizer.legacy_pattern)
+
+    # Small inputs: the recognizer must agree with the regex it replaces
+    for name, make in adversarial.items():
+        for k in range(0, 12):
+            text = make(k)
+            found = legacy.findall(text)
+            expected = (found[0][0], found[0][8]) if found else None
+            assert OrListRecognizer.find(text) == expected, (name, k)
+
+    print('%-16s %8s %12s %12s' % ('input', 'chars', 'recognize s', 'parse s'))
+    for name, make in adversarial.items():
+        for k in (10, 100, 1000, 10000):
+            text = make(k)
+            seconds, _ = time_call(OrListRecognizer.find, text)
+            assert seconds < recognizer_bound, (name, k, seconds)
+
+            rpt = RequisiteParseTree(text, time_budget=0.5)
+            parse_seconds, _ = time_call(rpt.process)
+            assert parse_seconds < rpt.time_budget + parse_margin, (name, k, parse_seconds)
+            print('%-16s %8d %12.4f %12.4f%s' % (name, len(text), seconds, parse_seconds,
+                  ' (note)' if isinstance(rpt.root, RequisiteParseNodeNote) else ''))
+
+    # The time budget itself: a zero budget always falls back to a note
+    # and is flagged, so the note is not taken for a parsed one
+    rpt = RequisiteParseTree('One of MATH 2A03, 2MM3, 2Q04, or 2ZZ3', time_budget=0)
+    rpt.process()
+    assert isinstance(rpt.root, RequisiteParseNodeNote) and rpt.timed_out
+    rpt = RequisiteParseTree('One of MATH 2A03, 2MM3, 2Q04, or 2ZZ3')
+    rpt.process()
+    assert not rpt.timed_out
+
+    # A tree that ran out of time is not cached, in memory or on disk
+    class NoTimeParseTree(RequisiteParseTree):
+        time_budget = 0
+
+    with tempfile.TemporaryDirectory() as directory:
+        db_path = os.path.join(directory, 'parse_cache.db')
+        for _ in range(2):
+            cache = RequisiteParseCache(db_path=db_path)
+            for _ in range(2):
+                rpt, _ = cache.process(NoTimeParseTree, 'One of MATH 2A03, 2MM3 or 2ZZ3')
+                assert rpt.timed_out
+            assert cache.hits == 0 and cache.misses == 2
+            cache.close()
+    rpts = LazyRequisiteTrees({'Prerequisite(s):': 'MATH 1A03', 'Antirequisite(s):': 'MATH 1B03'}, NoTimeParseTree)
+    rpts['Antirequisite(s):']
+    assert rpts.timed_out() == ['Antirequisite(s):']
+    print('ok')
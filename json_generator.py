@@ -3,7 +3,10 @@ import sqlite3
 import pickle
 from pathlib import Path
 
-from CourseDependencyGraph.parsers.requisite_parser import RequisiteParseTree
+from CourseDependencyGraph.parsers.parse_tree_intern import RequisiteNodeTable
+from CourseDependencyGraph.parsers.parse_tree_simplify import RequisiteTreeSimplifier
+from CourseDependencyGraph.parsers.parse_lazy import LazyRequisiteTrees
+from CourseDependencyGraph.parsers.requisite_subjects import SubjectIndex
 
 
 def generate_json_file(js_file='assets/graph.js'):
@@ -19,11 +22,18 @@ def generate_json_file(js_file='assets/graph.js'):
     )
 
     course_data = c.fetchall()
+    # Sections stored unparsed are parsed against the subjects of every course
+    subject_index = SubjectIndex.from_db('db/course_db_example.db')
 
     master_course_graph = {}
+    # Branches shared between courses are written once, to master_branch_table
+    node_table = RequisiteNodeTable()
+    simplifier = RequisiteTreeSimplifier()
 
     for course_id, course_info, course_info_json in course_data:
         course_info = pickle.loads(course_info)
+        if isinstance(course_info['rpts'], LazyRequisiteTrees):
+            course_info['rpts'].attach(subject_index)
         course_code = course_info['json_data']['course_code']
         course_graph = {
             'cid': course_id,
@@ -32,8 +42,9 @@ def generate_json_file(js_file='assets/graph.js'):
         # print(course_info['json_data']['course_code'], course_id, type(prereq_rpt), prereq_rpt)
 
         try:
-            prereq_rpt = course_info['rpts']['Prerequisite(s):']
-            prereq_graph = prereq_rpt.generate_graph()
+            prereq_rpt = simplifier.simplify_tree(course_info['rpts']['Prerequisite(s):'])
+            prereq_rpt = node_table.intern_tree(prereq_rpt)
+            prereq_graph = node_table.generate_graph(prereq_rpt)
             if prereq_graph: # Merge
                 course_graph = {**course_graph, **prereq_graph}
             print(course_graph)
@@ -42,10 +53,20 @@ def generate_json_file(js_file='assets/graph.js'):
         except KeyError as ke:
             # print('KeyError for:', course_id, ke)
             pass
+        except Exception as e:
+            # Sections stored unparsed are parsed here, and may fail here
+            print('Error parsing prerequisites of:', course_code, course_id, e)
+
+    print(simplifier.report())
+    print('Unique nodes:', len(node_table), 'of', node_table.visited, '- unique branches:', len(node_table.branches))
 
     master_course_graph = json.dumps(master_course_graph)
+    master_branch_table = json.dumps(node_table.branches)
     with open(js_file, 'w') as f:
         f.write("var naming = 'compact';\n")
+        f.write("var master_branch_table = ")
+        f.write(master_branch_table)
+        f.write(";\n")
         f.write("var master_course_graph = ")
         f.write(master_course_graph)
         f.write(';')
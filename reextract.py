@@ -0,0 +1,137 @@
+import io
+import os
+import time
+import sqlite3
+import argparse
+import contextlib
+from concurrent.futures import ProcessPoolExecutor
+
+from CourseDependencyGraph import settings
+from CourseDependencyGraph.pipelines import create_courses_table, course_row, store_courses
+from CourseDependencyGraph.parsers.Parsers import RequisitesHTMLParser
+from CourseDependencyGraph.parsers.parse_batch import chunked, submit_bounded
+from CourseDependencyGraph.parsers.parse_cache import RequisiteParseCache
+from CourseDependencyGraph.parsers.parse_html_archive import CourseHTMLArchive
+from CourseDependencyGraph.parsers.requisite_subjects import SubjectIndex
+
+# Set in each worker process by init_worker
+parser_options = None
+parse_cache = None
+
+
+def init_worker(options):
+    global parser_options, parse_cache
+    parser_options = options
+    # In memory: courses of a chunk that share a requisite parse it once
+    parse_cache = RequisiteParseCache(db_path=None)
+
+
+def extract_chunk(pages):
+    """
+    (course_id, courses_v3 row or None, error or None) for every archived
+    (course_id, compressed HTML), as the spider and the pipeline make them.
+    """
+    results = []
+    for course_id, data in pages:
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                acp = RequisitesHTMLParser(CourseHTMLArchive.decompress(data), course_id, parse_cache=parse_cache,
+                                           **parser_options)
+                course_info = acp.extract_info()
+                course_info['course_id'] = course_id
+                row = course_row(course_info)
+            results.append((course_id, row, None))
+        except Exception as e:
+            results.append((course_id, None, '%s: %s' % (type(e).__name__, e)))
+    return results
+
+
+def extract_many(pages, options, workers, chunk_size):
+    """
+    Yields the results of extract_chunk for pages, chunk by chunk in order.
+    """
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(options,)) as executor:
+        for results in submit_bounded(lambda chunk: executor.submit(extract_chunk, chunk),
+                                      chunked(pages, chunk_size), workers * 2):
+            yield results
+
+
+def run(archive_path=settings.REQUISITE_HTML_ARCHIVE, db_path='db/course_db_example.db', workers=None, chunk_size=16,
+        batch_size=256, html_backend=settings.REQUISITE_HTML_BACKEND, lazy=settings.REQUISITE_LAZY_PARSING,
+        subject_db=settings.REQUISITE_SUBJECT_INDEX):
+    """
+    Extracts and parses the latest archived page of every course again and
+    writes the results to courses_v3 of db_path, batch_size courses per
+    transaction. Returns (courses written, {course_id: error}, seconds).
+    """
+    if not os.path.isfile(archive_path):
+        raise FileNotFoundError('No HTML archive at %s' % archive_path)
+    if workers is None:
+        workers = os.cpu_count() or 1
+
+    t = time.perf_counter()
+    # Built once before anything is written, as the spider does
+    subject_index = SubjectIndex.from_db(subject_db) if subject_db is not None else None
+    options = {
+        'html_backend': html_backend,
+        'lazy': lazy,
+        'subject_index': subject_index,
+    }
+
+    archive = CourseHTMLArchive(archive_path)
+    directory = os.path.dirname(db_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    conn = sqlite3.connect(db_path)
+    written = 0
+    errors = {}
+    try:
+        c = conn.cursor()
+        create_courses_table(c)
+        pages = ((course_id, data) for course_id, _, data in archive.latest(compressed=True))
+        batch = []
+        for results in extract_many(pages, options, workers, chunk_size):
+            for course_id, row, error in results:
+                if row is None:
+                    errors[course_id] = error
+                else:
+                    batch.append(row)
+            if len(batch) >= batch_size:
+                store_courses(c, batch)
+                conn.commit()
+                written += len(batch)
+                batch = []
+        store_courses(c, batch)
+        conn.commit()
+        written += len(batch)
+    finally:
+        conn.close()
+        archive.close()
+    return written, errors, time.perf_counter() - t
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Extract and parse every course page of the HTML archive again (the latest version of each), '
+                    'without crawling, and write the results to courses_v3 as the pipeline does.')
+    parser.add_argument('--archive', default=settings.REQUISITE_HTML_ARCHIVE)
+    parser.add_argument('--db', default='db/course_db_example.db')
+    parser.add_argument('--workers', type=int, help='worker processes (default: the number of CPUs)')
+    parser.add_argument('--chunk-size', type=int, default=16, help='pages per task sent to a worker')
+    parser.add_argument('--batch-size', type=int, default=256, help='courses written per transaction')
+    parser.add_argument('--html-backend', default=settings.REQUISITE_HTML_BACKEND,
+                        choices=RequisitesHTMLParser.html_backends)
+    parser.add_argument('--lazy', dest='lazy', action='store_true', help='store the raw sections, parse them on first use')
+    parser.add_argument('--eager', dest='lazy', action='store_false', help='parse every section now')
+    parser.set_defaults(lazy=settings.REQUISITE_LAZY_PARSING)
+    parser.add_argument('--subject-index', default=settings.REQUISITE_SUBJECT_INDEX,
+                        help='database to take the known subjects from')
+    args = parser.parse_args()
+
+    written, errors, seconds = run(args.archive, args.db, workers=args.workers, chunk_size=args.chunk_size,
+                                   batch_size=args.batch_size, html_backend=args.html_backend, lazy=args.lazy,
+                                   subject_db=args.subject_index)
+    for course_id, error in sorted(errors.items()):
+        print('%s: %s' % (course_id, error))
+    print('%d courses written, %d failed, in %.2f s (%.0f courses/s)'
+          % (written, len(errors), seconds, (written + len(errors)) / seconds if seconds else 0))
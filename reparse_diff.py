@@ -0,0 +1,282 @@
+import io
+import os
+import sys
+import json
+import time
+import sqlite3
+import tarfile
+import argparse
+import tempfile
+import importlib
+import contextlib
+import subprocess
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+# Nothing from CourseDependencyGraph is imported here: worker processes
+# import the parser of the version they run (see init_worker)
+
+
+
+class ParserVersion():
+    """
+    A parser to reparse with, given as REV[:subjects]:
+
+    - REV: a git revision, or . for the working tree
+    - subjects: parse against the SubjectIndex of the courses in the
+      database instead of none
+
+    e.g. HEAD~1, .:subjects
+    """
+    def __init__(self, spec):
+        self.spec = spec
+        parts = spec.split(':')
+        if len(parts) > 2 or (len(parts) == 2 and parts[1] != 'subjects'):
+            raise ValueError('Invalid parser version: %s (expected REV[:subjects])' % spec)
+        self.revision = parts[0] or '.'
+        self.subjects = len(parts) == 2
+        # Directory holding the CourseDependencyGraph package to import
+        self.path = None
+
+    def __repr__(self):
+        return self.spec
+
+    def checkout(self, directory):
+        """
+        Extracts the parsers of the revision under directory.
+        """
+        if self.revision == '.':
+            # The tree of this script, wherever it is run from
+            root = self.path = os.path.dirname(os.path.abspath(__file__))
+        else:
+            archive = subprocess.run(['git', 'archive', '--format=tar', self.revision,
+                                      'CourseDependencyGraph/__init__.py', 'CourseDependencyGraph/parsers'],
+                                     stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+            if archive.returncode != 0:
+                raise ValueError('Cannot read the parsers of %s: %s' % (self.revision, archive.stderr.decode().strip()))
+            root = self.path = tempfile.mkdtemp(prefix='reparse_', dir=directory)
+            with tarfile.open(fileobj=io.BytesIO(archive.stdout)) as tar:
+                tar.extractall(root)
+
+        if not os.path.exists(os.path.join(root, 'CourseDependencyGraph/parsers/requisite_parser.py')):
+            raise ValueError('%s has no requisite parser' % self.revision)
+        if self.subjects and not os.path.exists(os.path.join(root, 'CourseDependencyGraph/parsers/requisite_subjects.py')):
+            raise ValueError('%s has no subject index' % self.revision)
+
+
+def load_requisites(db_path='db/course_db_example.db'):
+    """
+    (course_id, course_code, requisite_type, requisites) for every section
+    stored by the pipeline in courses_v3.
+    """
+    if not os.path.isfile(db_path):
+        raise FileNotFoundError('No course database at %s' % db_path)
+    conn = sqlite3.connect(db_path)
+    try:
+        rows = conn.execute('''SELECT course_id, coruse_info_json FROM courses_v3''').fetchall()
+    finally:
+        conn.close()
+
+    requisites = []
+    for course_id, course_info_json in rows:
+        json_data = json.loads(course_info_json)
+        for requisite_type, requisite in (json_data.get('requisites_dict_raw') or {}).items():
+            requisites.append((course_id, json_data.get('course_code'), requisite_type, requisite))
+    return requisites
+
+
+# Set in each worker process by init_worker
+tree_class = None
+subject_index = None
+
+
+def init_worker(path, subject_db):
+    global tree_class, subject_index
+    sys.path.insert(0, path)
+    tree_class = importlib.import_module('CourseDependencyGraph.parsers.requisite_parser').RequisiteParseTree
+    if subject_db is not None:
+        subject_index = importlib.import_module('CourseDependencyGraph.parsers.requisite_subjects').SubjectIndex.from_db(subject_db)
+
+
+def reparse_chunk(texts):
+    """
+    (graph as JSON or None, error or None, seconds) for every requisite text.
+    """
+    results = []
+    kwargs = {} if subject_index is None else {'subject_index': subject_index}
+    for requisites in texts:
+        t = time.perf_counter()
+        try:
+            # preprocess prints the requisites it cleans, whatever verbose is
+            with contextlib.redirect_stdout(io.StringIO()):
+                rpt = tree_class(requisites, verbose=False, **kwargs)
+                rpt.process()
+                graph = json.dumps(rpt.generate_graph()['p'], sort_keys=True)
+            error = None
+        except Exception as e:
+            graph = None
+            error = '%s: %s' % (type(e).__name__, e)
+        results.append((graph, error, time.perf_counter() - t))
+    return results
+
+
+def describe(value):
+    return json.dumps(value, sort_keys=True)
+
+
+def diff_graphs(old, new, path='p'):
+    """
+    Changes from graph old to graph new (as generate_graph writes them), as
+    lines naming the branch that changed: subbranches are paired by
+    position and course lists compared as sets.
+    """
+    changes = []
+    stack = [(path, old, new)]
+    while stack:
+        path, a, b = stack.pop()
+        if a == b:
+            continue
+        if not (isinstance(a, dict) and isinstance(b, dict)):
+            changes.append('%s: %s -> %s' % (path, describe(a), describe(b)))
+            continue
+
+        for key in sorted(set(a) | set(b)):
+            if key not in b:
+                changes.append('%s.%s: removed %s' % (path, key, describe(a[key])))
+            elif key not in a:
+                changes.append('%s.%s: added %s' % (path, key, describe(b[key])))
+            elif key == 'c' and isinstance(a[key], list) and isinstance(b[key], list):
+                removed = [course for course in a[key] if course not in b[key]]
+                added = [course for course in b[key] if course not in a[key]]
+                if removed:
+                    changes.append('%s.c: removed %s' % (path, ', '.join(removed)))
+                if added:
+                    changes.append('%s.c: added %s' % (path, ', '.join(added)))
+                if not removed and not added and a[key] != b[key]:
+                    changes.append('%s.c: reordered %s' % (path, ', '.join(b[key])))
+            elif key == 's' and isinstance(a[key], list) and isinstance(b[key], list):
+                for i in reversed(range(max(len(a[key]), len(b[key])))):
+                    if i >= len(b[key]):
+                        changes.append('%s.s[%d]: removed %s' % (path, i, describe(a[key][i])))
+                    elif i >= len(a[key]):
+                        changes.append('%s.s[%d]: added %s' % (path, i, describe(b[key][i])))
+                    else:
+                        stack.append(('%s.s[%d]' % (path, i), a[key][i], b[key][i]))
+            elif a[key] != b[key]:
+                changes.append('%s.%s: %s -> %s' % (path, key, describe(a[key]), describe(b[key])))
+    return changes
+
+
+def reparse(versions, texts, workers, chunk_size, db_path):
+    """
+    Parses texts with every version at once, each in its own pool of
+    workers processes with a bounded number of chunks in flight. Returns
+    per version {text: (graph, error, seconds)} and the wall time it took.
+    """
+    # Here and not at the top: spawned workers import this module again
+    # before init_worker puts their version of the parser on sys.path
+    from CourseDependencyGraph.parsers.parse_batch import chunked, submit_bounded
+
+    # Fresh interpreters, so each imports its own version of the parser
+    context = multiprocessing.get_context('spawn')
+    chunks = list(chunked(texts, chunk_size))
+    executors = []
+    streams = []
+    t = time.perf_counter()
+    try:
+        for version in versions:
+            executor = ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=init_worker,
+                                           initargs=(version.path, db_path if version.subjects else None))
+            executors.append(executor)
+            streams.append(submit_bounded(lambda chunk, executor=executor: executor.submit(reparse_chunk, chunk),
+                                          chunks, workers * 2))
+
+        results = [{} for _ in versions]
+        wall = [0.0 for _ in versions]
+        # Chunk by chunk from every version in turn, so every pool stays busy
+        for chunk in chunks:
+            for i, stream in enumerate(streams):
+                results[i].update(zip(chunk, next(stream)))
+                wall[i] = time.perf_counter() - t
+    finally:
+        for executor in executors:
+            executor.shutdown()
+    return results, wall
+
+
+def compare(requisites, old_parsed, new_parsed):
+    """
+    The courses whose trees differ, with their changes.
+    """
+    changed = []
+    for course_id, course_code, requisite_type, text in requisites:
+        (old_graph, old_error, _), (new_graph, new_error, _) = old_parsed[text], new_parsed[text]
+        if old_graph == new_graph and old_error == new_error:
+            continue
+        if old_graph is not None and new_graph is not None:
+            changes = diff_graphs(json.loads(old_graph), json.loads(new_graph))
+        else:
+            changes = ['%s -> %s' % (old_error or old_graph, new_error or new_graph)]
+        changed.append({
+            'course_id': course_id,
+            'course_code': course_code,
+            'requisite_type': requisite_type,
+            'requisites': text,
+            'changes': changes,
+        })
+    return changed
+
+
+def run(old_spec, new_spec, db_path='db/course_db_example.db', workers=None, chunk_size=32, json_path=None):
+    versions = [ParserVersion(old_spec), ParserVersion(new_spec)]
+    requisites = load_requisites(db_path)
+    texts = sorted({text for _, _, _, text in requisites})
+    if workers is None:
+        workers = max(1, (os.cpu_count() or 2) // 2)
+
+    with tempfile.TemporaryDirectory() as directory:
+        for version in versions:
+            version.checkout(directory)
+        (old_parsed, new_parsed), wall = reparse(versions, texts, workers, chunk_size, db_path)
+
+    changed = compare(requisites, old_parsed, new_parsed)
+    for course in changed:
+        print('%s (%s) %s' % (course['course_code'], course['course_id'], course['requisite_type']))
+        print('    %s' % course['requisites'])
+        for change in course['changes']:
+            print('    %s' % change)
+
+    print()
+    print('%d sections (%d distinct texts) of %d courses, %d sections changed'
+          % (len(requisites), len(texts), len({course_id for course_id, _, _, _ in requisites}), len(changed)))
+    totals = []
+    for version, parsed, seconds in zip(versions, (old_parsed, new_parsed), wall):
+        total = {
+            'version': version.spec,
+            'parse_seconds': sum(result[2] for result in parsed.values()),
+            'wall_seconds': seconds,
+            'failed': sum(1 for result in parsed.values() if result[1] is not None),
+        }
+        totals.append(total)
+        print('%-30s parse %8.2f s   wall %8.2f s   failed %d'
+              % (version.spec, total['parse_seconds'], total['wall_seconds'], total['failed']))
+
+    if json_path is not None:
+        with open(json_path, 'w') as f:
+            json.dump({'versions': totals, 'changed': changed}, f, indent=4)
+    return changed, totals
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Reparse every requisite stored in courses_v3 with two parser versions and show which courses '
+                    'changed. A version is REV[:subjects], e.g. HEAD~1 or .:subjects (. is the working tree).')
+    parser.add_argument('old')
+    parser.add_argument('new', nargs='?', default='.')
+    parser.add_argument('--db', default='db/course_db_example.db')
+    parser.add_argument('--workers', type=int, help='worker processes per version (default: half the CPUs)')
+    parser.add_argument('--chunk-size', type=int, default=32)
+    parser.add_argument('--json', help='also write the changes and timings to this file')
+    args = parser.parse_args()
+
+    run(args.old, args.new, db_path=args.db, workers=args.workers, chunk_size=args.chunk_size, json_path=args.json)